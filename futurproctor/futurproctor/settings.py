@@ -161,6 +161,55 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 TIME_ZONE = 'UTC'
 USE_TZ = True
 
+# Cache (used for high-rate counters such as tab switches, and for the exam
+# paper snapshots and dashboard pages, which are invalidated through it)
+# LocMemCache is per-process; with several workers point this at Redis, e.g.
+# 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Generated PDF reports (kept out of MEDIA_ROOT; served by download_report)
+REPORT_CACHE_DIR = os.path.join(BASE_DIR, 'report_cache')
+
+# Uploaded files are kept under MEDIA_ROOT. Set MEDIA_STORAGE=s3 to keep them
+# in an S3-compatible bucket instead (needs django-storages and boto3); a
+# local MinIO works as a stand-in, e.g. MEDIA_S3_ENDPOINT_URL=http://127.0.0.1:9000.
+# Bucket URLs are presigned and expire, so a link is only usable by whoever
+# was shown the page.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+if os.environ.get('MEDIA_STORAGE') == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('MEDIA_S3_BUCKET', 'futurproctor-media'),
+            'endpoint_url': os.environ.get('MEDIA_S3_ENDPOINT_URL'),
+            'access_key': os.environ.get('MEDIA_S3_ACCESS_KEY'),
+            'secret_key': os.environ.get('MEDIA_S3_SECRET_KEY'),
+            'default_acl': 'private',
+            'querystring_auth': True,
+            'querystring_expire': 3600,
+            'file_overwrite': False,
+        },
+    }
+
+# Media is served by proctoring.media_views after a permission check. To let
+# the web server send the files, set MEDIA_ACCEL to 'nginx' (X-Accel-Redirect;
+# add an `internal` location for MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or
+# 'sendfile' (X-Sendfile for Apache mod_xsendfile). Both need the file system
+# storage.
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
 # Groq API Configuration
 GROQ_API_KEY = ''
 
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Student, CheatingEvent, Exam, CheatingImage,CheatingAudio
+from .thumbnails import thumbnail_url
+from .models import Student, CheatingEvent, Exam, CheatingImage,CheatingAudio, TelemetryEvent, ProctoringEvent, AttemptTimeline
 import base64
 
 @admin.register(Student)
@@ -11,7 +12,7 @@ class StudentAdmin(admin.ModelAdmin):
 
     def photo_tag(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" style="max-height: 100px; max-width: 100px;" alt="Photo">', obj.photo.url)
+            return format_html('<img src="{}" style="max-height: 100px; max-width: 100px;" alt="Photo" loading="lazy">', thumbnail_url(obj.photo, 'small'))
         return "No Photo"
 
     photo_tag.short_description = 'Photo'
@@ -21,3 +22,6 @@ admin.site.register(CheatingEvent)
 admin.site.register(Exam)
 admin.site.register(CheatingImage)
 admin.site.register(CheatingAudio)
+admin.site.register(TelemetryEvent)
+admin.site.register(ProctoringEvent)
+admin.site.register(AttemptTimeline)
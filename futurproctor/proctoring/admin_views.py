@@ -2,16 +2,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import (
     Student, ExamPaper, Question, StudentExamAttempt, 
-    StudentAnswer, Result, CheatingEvent
+    StudentAnswer, Result, CheatingEvent, CheatingImage
 )
 from django.contrib.auth.models import User
+from . import bulk_onboarding, bulk_reports, contact_sheets, dashboard_stats, overlays, reports, timeline
+from .review_queue import format_cursor, parse_cursor, review_queue
 import json
 from groq import Groq
 
@@ -32,18 +34,8 @@ except TypeError as e:
 def admin_dashboard_enhanced(request):
     """Enhanced admin dashboard with comprehensive analytics"""
     
-    # Get counts
-    total_students = Student.objects.count()
-    approved_students = Student.objects.filter(approval_status='approved').count()
-    pending_approvals = Student.objects.filter(approval_status='pending').count()
-    rejected_students = Student.objects.filter(approval_status='rejected').count()
-    
-    total_exams = ExamPaper.objects.count()
-    active_exams = ExamPaper.objects.filter(is_active=True).count()
-    
-    total_attempts = StudentExamAttempt.objects.count()
-    pending_evaluations = StudentExamAttempt.objects.filter(status='submitted').count()
-    evaluated_attempts = StudentExamAttempt.objects.filter(status='evaluated').count()
+    # Counters come from the cached stats snapshot (two grouped queries when stale)
+    stats = dashboard_stats.snapshot()
     
     # Upcoming exams
     upcoming_exams = ExamPaper.objects.filter(
@@ -56,29 +48,110 @@ def admin_dashboard_enhanced(request):
         status='submitted'
     ).select_related('student', 'exam_paper').order_by('-submitted_at')[:10]
     
+    # Attempts with the highest proctoring risk (served by the risk_score index)
+    high_risk_attempts = StudentExamAttempt.objects.filter(
+        risk_score__gt=0
+    ).select_related('student', 'exam_paper').order_by('-risk_score')[:10]
+    
     # Students pending approval
     pending_students = Student.objects.filter(
         approval_status='pending'
     ).order_by('-timestamp')[:10]
     
     context = {
-        'total_students': total_students,
-        'approved_students': approved_students,
-        'pending_approvals': pending_approvals,
-        'rejected_students': rejected_students,
-        'total_exams': total_exams,
-        'active_exams': active_exams,
-        'total_attempts': total_attempts,
-        'pending_evaluations': pending_evaluations,
-        'evaluated_attempts': evaluated_attempts,
+        **stats,
         'upcoming_exams': upcoming_exams,
         'pending_subjective': pending_subjective,
+        'high_risk_attempts': high_risk_attempts,
         'pending_students': pending_students,
     }
     
     return render(request, 'admin/dashboard_enhanced.html', context)
 
 
+@staff_member_required(login_url='/admin/login/')
+def admin_dashboard_stats(request):
+    """Dashboard counters as JSON, polled by the enhanced dashboard"""
+    return JsonResponse(dashboard_stats.snapshot())
+
+
+def review_queue_page(request, limit=25):
+    """One page of the review queue with the attempts loaded in a single query."""
+    items, next_cursor = review_queue.page(limit=limit, after=parse_cursor(request.GET.get('after')))
+    attempts = StudentExamAttempt.objects.select_related('student', 'exam_paper').in_bulk(
+        [attempt_id for attempt_id, _ in items]
+    )
+    rows = [
+        {'attempt': attempts[attempt_id], 'risk': risk}
+        for attempt_id, risk in items if attempt_id in attempts
+    ]
+    return rows, format_cursor(next_cursor)
+
+
+@staff_member_required(login_url='/admin/login/')
+def proctor_review_queue(request):
+    """Ongoing attempts and those submitted within review_queue.RECENT_WINDOW, riskiest first"""
+    rows, next_cursor = review_queue_page(request)
+    context = {
+        'rows': rows,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
+        'queue_size': len(review_queue),
+    }
+    return render(request, 'admin/review_queue.html', context)
+
+
+@staff_member_required(login_url='/admin/login/')
+def proctor_review_queue_data(request):
+    """JSON version of a review queue page, polled by the queue page for live updates"""
+    rows, next_cursor = review_queue_page(request)
+    return JsonResponse({
+        'attempts': [
+            {
+                'id': row['attempt'].id,
+                'student': row['attempt'].student.name,
+                'student_id': row['attempt'].student_id,
+                'exam': row['attempt'].exam_paper.title,
+                'status': row['attempt'].get_status_display(),
+                'risk': round(row['risk'], 1),
+            }
+            for row in rows
+        ],
+        'next': next_cursor,
+        'queue_size': len(review_queue),
+    })
+
+
+@staff_member_required(login_url='/admin/login/')
+def attempt_evidence(request, attempt_id):
+    """Scrub through all evidence images of an attempt, loaded as contact sheets"""
+    attempt = get_object_or_404(StudentExamAttempt.objects.select_related('student', 'exam_paper'), id=attempt_id)
+    
+    context = {
+        'attempt': attempt,
+    }
+    
+    return render(request, 'admin/attempt_evidence.html', context)
+
+
+@staff_member_required(login_url='/admin/login/')
+def attempt_evidence_index(request, attempt_id):
+    """JSON index of an attempt's contact sheets, brought up to date first"""
+    attempt = get_object_or_404(StudentExamAttempt, id=attempt_id)
+    index = contact_sheets.load_index(attempt.id)
+    # Normally done in the background as evidence arrives; this covers the rest
+    if index is None or contact_sheets.is_stale(attempt.id, index):
+        index = contact_sheets.update(attempt.id)
+    return JsonResponse(contact_sheets.index_with_urls(index))
+
+
+@staff_member_required(login_url='/admin/login/')
+def evidence_overlay(request, image_id):
+    """Evidence image with its detection boxes and landmarks drawn (rendered once, then cached)"""
+    cheating_image = get_object_or_404(CheatingImage, id=image_id)
+    return redirect(overlays.overlay_url(cheating_image))
+
+
 @staff_member_required(login_url='/admin/login/')
 def student_approval_list(request):
     """List all students with approval actions"""
@@ -119,6 +192,44 @@ def reject_student(request, student_id):
     return redirect('student_approval_list')
 
 
+@staff_member_required(login_url='/admin/login/')
+def bulk_student_import(request):
+    """Register students in bulk from a CSV and a zip archive of photos, in the background"""
+    if request.method == 'POST':
+        csv_file = request.FILES.get('csv_file')
+        photo_archive = request.FILES.get('photo_archive')
+        
+        if not csv_file or not photo_archive:
+            messages.error(request, "Please upload both the CSV file and the photo archive.")
+        elif bulk_onboarding.start_import(
+            csv_file,
+            photo_archive,
+            auto_approve=request.POST.get('auto_approve') == 'on',
+            approved_by=request.user,
+        ):
+            messages.success(request, "Import started. This page shows its progress.")
+        else:
+            messages.warning(request, "Another import is still running. Start this one once it has finished.")
+        return redirect('bulk_student_import')
+    
+    status = bulk_onboarding.get_status()
+    context = {
+        'import': status,
+        'running': bulk_onboarding.is_running(status),
+    }
+    
+    return render(request, 'admin/bulk_student_import.html', context)
+
+
+@staff_member_required(login_url='/admin/login/')
+def bulk_student_import_status(request):
+    """JSON progress of the running bulk import"""
+    status = bulk_onboarding.get_status() or {'status': None}
+    status['running'] = bulk_onboarding.is_running(status)
+    status.pop('failures', None)
+    return JsonResponse(status)
+
+
 @staff_member_required(login_url='/admin/login/')
 def exam_paper_list(request):
     """List all exam papers"""
@@ -143,6 +254,9 @@ def exam_paper_create(request):
         instructions = request.POST.get('instructions')
         total_marks = request.POST.get('total_marks', 0)
         passing_marks = request.POST.get('passing_marks', 0)
+        evidence_retention_days = request.POST.get('evidence_retention_days') or None
+        shuffle_questions = request.POST.get('shuffle_questions') == 'on'
+        shuffle_options = request.POST.get('shuffle_options') == 'on'
         
         exam_paper = ExamPaper.objects.create(
             title=title,
@@ -153,6 +267,9 @@ def exam_paper_create(request):
             instructions=instructions,
             total_marks=total_marks,
             passing_marks=passing_marks,
+            evidence_retention_days=evidence_retention_days,
+            shuffle_questions=shuffle_questions,
+            shuffle_options=shuffle_options,
             created_by=request.user
         )
         
@@ -176,7 +293,10 @@ def exam_paper_edit(request, exam_id):
         exam_paper.instructions = request.POST.get('instructions')
         exam_paper.total_marks = request.POST.get('total_marks', 0)
         exam_paper.passing_marks = request.POST.get('passing_marks', 0)
+        exam_paper.evidence_retention_days = request.POST.get('evidence_retention_days') or None
         exam_paper.is_active = request.POST.get('is_active') == 'on'
+        exam_paper.shuffle_questions = request.POST.get('shuffle_questions') == 'on'
+        exam_paper.shuffle_options = request.POST.get('shuffle_options') == 'on'
         exam_paper.save()
         
         messages.success(request, f"Exam paper '{exam_paper.title}' updated successfully!")
@@ -203,6 +323,50 @@ def exam_paper_detail(request, exam_id):
     return render(request, 'admin/exam_paper_detail.html', context)
 
 
+@staff_member_required(login_url='/admin/login/')
+def exam_paper_export_reports(request, exam_id):
+    """Start (or resume) the export of every attempt report of an exam paper and show its progress"""
+    exam_paper = get_object_or_404(ExamPaper, id=exam_id)
+    
+    if request.method == 'POST':
+        if not reports.PDF_AVAILABLE:
+            messages.error(request, "PDF generation is not available on this server.")
+        else:
+            bulk_reports.start_export(exam_paper.id)
+        return redirect('exam_paper_export_reports', exam_id=exam_paper.id)
+    
+    export = bulk_reports.get_status(exam_paper.id)
+    context = {
+        'exam_paper': exam_paper,
+        'export': export,
+        'running': bulk_reports.is_running(export),
+    }
+    
+    return render(request, 'admin/report_export.html', context)
+
+
+@staff_member_required(login_url='/admin/login/')
+def exam_paper_export_status(request, exam_id):
+    """JSON progress of an exam paper's report export, including reports/min"""
+    status = bulk_reports.get_status(exam_id) or {'status': None}
+    status['running'] = bulk_reports.is_running(status)
+    return JsonResponse(status)
+
+
+@staff_member_required(login_url='/admin/login/')
+def exam_paper_export_download(request, exam_id):
+    """Stream the zip of an exam paper's rendered reports"""
+    exam_paper = get_object_or_404(ExamPaper, id=exam_id)
+    
+    if bulk_reports.is_running(bulk_reports.get_status(exam_paper.id)):
+        messages.warning(request, "The export is still running. Download it once it has finished.")
+        return redirect('exam_paper_export_reports', exam_id=exam_paper.id)
+    
+    response = StreamingHttpResponse(bulk_reports.stream_zip(exam_paper.id), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{bulk_reports.export_filename(exam_paper)}"'
+    return response
+
+
 @staff_member_required(login_url='/admin/login/')
 def question_create(request, exam_id):
     """Create a new question for an exam"""
@@ -311,13 +475,25 @@ def question_delete(request, question_id):
 
 @staff_member_required(login_url='/admin/login/')
 def pending_evaluations_list(request):
-    """List all pending subjective evaluations"""
+    """List all pending subjective evaluations (?sort=risk and ?min_risk= to triage by proctoring risk)"""
     pending_attempts = StudentExamAttempt.objects.filter(
         status='submitted'
-    ).select_related('student', 'exam_paper').order_by('-submitted_at')
+    ).select_related('student', 'exam_paper')
+    
+    min_risk = request.GET.get('min_risk')
+    if min_risk:
+        try:
+            pending_attempts = pending_attempts.filter(risk_score__gte=float(min_risk))
+        except ValueError:
+            messages.error(request, "Invalid minimum risk score.")
+    
+    sort = request.GET.get('sort')
+    pending_attempts = pending_attempts.order_by('-risk_score' if sort == 'risk' else '-submitted_at')
     
     context = {
         'pending_attempts': pending_attempts,
+        'sort': sort,
+        'min_risk': min_risk or '',
     }
     
     return render(request, 'admin/pending_evaluations_list.html', context)
@@ -502,6 +678,7 @@ def publish_result(request, attempt_id):
     context = {
         'attempt': attempt,
         'all_answers': all_answers,
+        'timeline_summary': timeline.summary(timeline.load(attempt.id)),
     }
     
     return render(request, 'admin/publish_result.html', context)
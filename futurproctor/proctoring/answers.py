@@ -0,0 +1,145 @@
+# answers.py - Autosaved exam answers
+#
+# The exam page sends the answers changed since its last save every few
+# seconds. Each batch is coalesced to one value per question, graded against
+# the paper snapshot (MCQs) and written with a single bulk upsert on
+# (attempt, question), so a crashed browser loses at most a few seconds and
+# the writes are spread over the whole exam. Submitting then only saves
+# whatever the page had not sent yet and finalizes: the MCQs are graded again
+# against the current questions in one UPDATE (the snapshot may predate an
+# edited answer key) and the marks are one aggregate over rows that are
+# already there.
+from django.db.models import Case, Exists, FloatField, OuterRef, Subquery, Sum, Value, When
+
+from .models import Question, StudentAnswer
+
+# Longest subjective answer accepted
+MAX_ANSWER_LENGTH = 20000
+
+MCQ_OPTIONS = {'A', 'B', 'C', 'D'}
+
+# Columns an autosave may change; evaluation fields are left alone
+SAVED_FIELDS = ['selected_option', 'answer_text', 'is_correct', 'marks_obtained']
+
+
+class AnswerError(ValueError):
+    """Raised when an autosave batch is malformed as a whole"""
+
+
+def _questions(snapshot):
+    return {question['id']: question for question in snapshot['questions']}
+
+
+def _clean(question, value):
+    """The stored form of one answer; None clears an MCQ choice."""
+    if question['type'] == 'mcq':
+        value = (value or '').strip().upper()
+        if value and value not in MCQ_OPTIONS:
+            raise ValueError(value)
+        return value or None
+    return str(value or '')[:MAX_ANSWER_LENGTH]
+
+
+def parse_batch(payload, snapshot):
+    """
+    Validate an autosave batch: {"answers": [{"question": <id>, "answer": <letter or text>}]}.
+    Returns ({question_id: answer}, rejected_count), later entries for a
+    question replacing earlier ones.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('answers'), list):
+        raise AnswerError("Expected an object with an 'answers' list.")
+    questions = _questions(snapshot)
+    if len(payload['answers']) > max(len(questions), 1) * 2:
+        raise AnswerError("Too many answers in one batch.")
+
+    answers = {}
+    rejected = 0
+    for raw in payload['answers']:
+        try:
+            question = questions[int(raw['question'])]
+            answers[question['id']] = _clean(question, raw.get('answer'))
+        except (KeyError, TypeError, ValueError):
+            rejected += 1
+    return answers, rejected
+
+
+def answers_from_post(post, snapshot):
+    """Answers posted as answer_<question id> form fields (the submit form and pages without JavaScript)."""
+    answers = {}
+    for question in snapshot['questions']:
+        field = f"answer_{question['id']}"
+        if field in post:
+            try:
+                answers[question['id']] = _clean(question, post.get(field).strip())
+            except ValueError:
+                continue
+    return answers
+
+
+def _row(attempt_id, question, value):
+    if question['type'] == 'mcq':
+        correct = bool(value) and value == (question['correct_answer'] or '').upper()
+        return StudentAnswer(
+            attempt_id=attempt_id,
+            question_id=question['id'],
+            selected_option=value,
+            is_correct=correct,
+            marks_obtained=question['marks'] if correct else 0,
+        )
+    return StudentAnswer(
+        attempt_id=attempt_id,
+        question_id=question['id'],
+        answer_text=value,
+        marks_obtained=0,  # Evaluated after submission
+    )
+
+
+def save_answers(attempt_id, answers, snapshot):
+    """Upsert the answers of one attempt in a single query. Returns how many were written."""
+    if not answers:
+        return 0
+    questions = _questions(snapshot)
+    rows = [_row(attempt_id, questions[question_id], value) for question_id, value in answers.items()]
+    StudentAnswer.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['attempt', 'question'],
+        update_fields=SAVED_FIELDS,
+    )
+    return len(rows)
+
+
+def saved_answers(attempt_id):
+    """{question_id: answer} saved so far, to restore the exam page after a reload."""
+    return {
+        question_id: option if option is not None else text
+        for question_id, option, text in StudentAnswer.objects.filter(attempt_id=attempt_id)
+        .values_list('question_id', 'selected_option', 'answer_text')
+    }
+
+
+def finalize(attempt_id, snapshot):
+    """
+    Complete the saved answers for submission and return the MCQ marks.
+    Subjective questions left blank get an empty answer, as the evaluation
+    pages expect one row per subjective question. MCQs are graded from the
+    Question rows as they are now, not from the snapshot they were saved with.
+    """
+    blanks = [
+        _row(attempt_id, question, '')
+        for question in snapshot['questions'] if question['type'] != 'mcq'
+    ]
+    StudentAnswer.objects.bulk_create(blanks, ignore_conflicts=True)
+
+    question = Question.objects.filter(id=OuterRef('question_id'))
+    correct = Exists(question.filter(correct_answer__iexact=OuterRef('selected_option')))
+    StudentAnswer.objects.filter(attempt_id=attempt_id, question__question_type='mcq').update(
+        is_correct=correct,
+        marks_obtained=Case(
+            When(correct, then=Subquery(question.values('marks')[:1])),
+            default=Value(0),
+            output_field=FloatField(),
+        ),
+    )
+    total = StudentAnswer.objects.filter(attempt_id=attempt_id, is_correct=True).aggregate(Sum('marks_obtained'))
+    return total['marks_obtained__sum'] or 0
@@ -0,0 +1,320 @@
+# bulk_onboarding.py - Bulk student registration from a CSV plus a zip of photos
+#
+# The admin page runs an import in a background thread (start_import) and
+# polls its status, kept in the cache; the import_students command runs it
+# in the foreground.
+import csv
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import dashboard_stats, examinee_list
+from .process_pools import process_pool
+from .thumbnails import thumbnail_queue
+from .models import Student
+
+# Columns expected in the CSV (address and password are optional)
+REQUIRED_COLUMNS = ('name', 'email', 'photo')
+
+logger = logging.getLogger(__name__)
+
+# Records are encoded and inserted in batches so memory stays bounded
+# regardless of the intake size
+BATCH_SIZE = 200
+
+RUNNING, FINISHED, FAILED = 'running', 'finished', 'failed'
+
+# How long the status of a background import is remembered
+STATUS_TIMEOUT = 24 * 60 * 60
+
+# A running import that has not reported progress for this long was
+# interrupted (e.g. the server restarted) and another may be started
+STALE_AFTER = 10 * 60  # seconds
+
+# Failed rows kept in the status for display
+MAX_FAILURES = 500
+
+_STATUS_KEY = "bulk_student_import"
+
+
+@dataclass
+class ImportFailure:
+    """A single CSV row that could not be imported"""
+    row: int
+    email: str
+    reason: str
+
+
+@dataclass
+class ImportReport:
+    """Summary returned by import_students"""
+    created: int = 0
+    failures: list = field(default_factory=list)
+
+    def fail(self, row, email, reason):
+        self.failures.append(ImportFailure(row=row, email=email or '', reason=reason))
+
+
+def _prepare_record(photo_bytes, password):
+    """
+    Runs in a worker process: compute the face encoding for one photo and hash
+    the password. Both are CPU-bound, which is why they are kept off the main process.
+    Returns (encoding_list or None, password_hash, error or None).
+    """
+    # Imported here so the parent process does not pay for dlib unless it has to
+    import cv2
+    import numpy as np
+    import face_recognition
+
+    try:
+        nparr = np.frombuffer(photo_bytes, np.uint8)
+        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if image is None:
+            return None, None, "Photo could not be decoded"
+        # Same input as views.get_face_encoding so encodings match at login
+        face_locations = face_recognition.face_locations(image)
+        if not face_locations:
+            return None, None, "No face detected in photo"
+        encoding = face_recognition.face_encodings(image, face_locations)[0]
+    except Exception as e:
+        return None, None, f"Error processing photo: {e}"
+
+    # Students without a password in the CSV get an unusable one
+    password_hash = make_password(password or None)
+    return encoding.tolist(), password_hash, None
+
+
+def _read_rows(csv_file):
+    """Yield (row_number, row_dict) from an uploaded or on-disk CSV file"""
+    if isinstance(csv_file, (str, os.PathLike)):
+        with open(csv_file, 'rb') as f:
+            yield from _read_rows(f)
+        return
+    # Django's UploadedFile wraps the real file object in `.file`
+    text = io.TextIOWrapper(getattr(csv_file, 'file', csv_file), encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+    # Row 1 is the header
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, {key: (value or '').strip() for key, value in row.items() if key}
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _filter_batch(batch, archive, seen_emails, report):
+    """Drop rows with missing data, duplicate emails or missing photos"""
+    emails = [row['email'].lower() for _, row in batch if row.get('email')]
+    existing = set(User.objects.filter(username__in=emails).values_list('username', flat=True))
+    existing |= set(Student.objects.filter(email__in=emails).values_list('email', flat=True))
+    existing = {email.lower() for email in existing}
+
+    valid = []
+    for row_number, row in batch:
+        email = row.get('email', '').lower()
+        if not row.get('name') or not email or not row.get('photo'):
+            report.fail(row_number, email, "Missing name, email or photo")
+            continue
+        if email in seen_emails:
+            report.fail(row_number, email, "Duplicate email in CSV")
+            continue
+        seen_emails.add(email)
+        if email in existing:
+            report.fail(row_number, email, "Email already exists")
+            continue
+        try:
+            # Members are read one at a time straight out of the archive,
+            # nothing is extracted to disk
+            photo_bytes = archive.read(row['photo'])
+        except KeyError:
+            report.fail(row_number, email, f"Photo '{row['photo']}' not found in archive")
+            continue
+        valid.append((row_number, row, email, photo_bytes))
+    return valid
+
+
+def _create_batch(prepared, auto_approve, approved_by):
+    """Insert Users and Students for one batch with bulk_create"""
+    users = []
+    for _, row, email, _, _, password_hash in prepared:
+        name = row['name']
+        users.append(User(
+            username=email,
+            email=email,
+            first_name=name.split(' ')[0],
+            last_name=' '.join(name.split(' ')[1:]) if ' ' in name else '',
+            password=password_hash,
+        ))
+
+    now = timezone.now()
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        students = []
+        for user, (_, row, email, photo_bytes, encoding, _) in zip(users, prepared):
+            student = Student(
+                user=user,
+                name=row['name'],
+                address=row.get('address') or None,
+                email=email,
+                photo=ContentFile(photo_bytes, name=f"{row['name']}_photo.jpg"),
+                face_encoding=encoding,
+                timestamp=now,
+            )
+            if auto_approve:
+                student.approval_status = 'approved'
+                student.approved_by = approved_by
+                student.approved_at = now
+            students.append(student)
+        try:
+            Student.objects.bulk_create(students)
+        except Exception:
+            # The photos were written by pre_save before the insert failed
+            for student in students:
+                if student.photo and student.photo._committed:
+                    student.photo.storage.delete(student.photo.name)
+            raise
+
+    # bulk_create sends no signals: refresh the cached dashboards and queue thumbnails explicitly
+    dashboard_stats.invalidate()
+    examinee_list.invalidate()
+    for student in students:
+        thumbnail_queue.submit(student.photo)
+    return len(students)
+
+
+def import_students(csv_file, archive_file, auto_approve=False, approved_by=None,
+                    workers=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Register students in bulk from a CSV (name, email, photo, [address], [password])
+    and a zip archive containing the photos referenced in the `photo` column.
+
+    Face encodings and password hashes are computed on a process pool; rows are
+    inserted batch by batch with bulk_create. Rows that fail are reported in the
+    returned ImportReport instead of aborting the whole import.
+    """
+    report = ImportReport()
+    seen_emails = set()
+
+    with zipfile.ZipFile(archive_file) as archive, \
+            process_pool(workers) as pool:
+        for batch in _batched(_read_rows(csv_file), batch_size):
+            valid = _filter_batch(batch, archive, seen_emails, report)
+            if not valid:
+                continue
+
+            results = pool.map(
+                _prepare_record,
+                [photo_bytes for _, _, _, photo_bytes in valid],
+                [row.get('password') for _, row, _, _ in valid],
+            )
+
+            prepared = []
+            for (row_number, row, email, photo_bytes), (encoding, password_hash, error) in zip(valid, results):
+                if error:
+                    report.fail(row_number, email, error)
+                    continue
+                prepared.append((row_number, row, email, photo_bytes, encoding, password_hash))
+
+            if prepared:
+                try:
+                    report.created += _create_batch(prepared, auto_approve, approved_by)
+                except Exception as e:
+                    for row_number, _, email, _, _, _ in prepared:
+                        report.fail(row_number, email, f"Error creating user: {e}")
+
+            if progress:
+                progress(report)
+
+    report.failures.sort(key=lambda failure: failure.row)
+    return report
+
+
+# Background imports (admin page)
+
+def get_status():
+    """The status of the last background import, or None."""
+    return cache.get(_STATUS_KEY)
+
+
+def is_running(status):
+    return bool(status) and status['status'] == RUNNING and time.time() - status['updated_at'] < STALE_AFTER
+
+
+def _save_status(status, report):
+    status.update({
+        'created': report.created,
+        'failed': len(report.failures),
+        'failures': [vars(failure) for failure in sorted(report.failures, key=lambda f: f.row)[:MAX_FAILURES]],
+        'updated_at': time.time(),
+    })
+    cache.set(_STATUS_KEY, status, timeout=STATUS_TIMEOUT)
+
+
+def _copy_upload(upload, directory, name):
+    """Uploaded files are deleted when the request ends: keep a copy for the background thread."""
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return path
+
+
+_start_lock = threading.Lock()
+
+
+def start_import(csv_file, archive_file, auto_approve=False, approved_by=None):
+    """
+    Run import_students on uploaded files in a background thread. Returns
+    False (and starts nothing) while another import is running.
+    """
+    with _start_lock:
+        if is_running(get_status()):
+            return False
+        status = {'status': RUNNING, 'started_at': time.time(), 'error': None}
+        _save_status(status, ImportReport())
+
+    directory = tempfile.mkdtemp(prefix='student_import_')
+    csv_path = _copy_upload(csv_file, directory, 'students.csv')
+    archive_path = _copy_upload(archive_file, directory, 'photos.zip')
+
+    def run():
+        report = ImportReport()
+        try:
+            report = import_students(
+                csv_path, archive_path, auto_approve=auto_approve, approved_by=approved_by,
+                progress=lambda current: _save_status(status, current),
+            )
+            status['status'] = FINISHED
+        except Exception as e:
+            logger.error(f"Bulk student import failed: {e}")
+            status.update({'status': FAILED, 'error': str(e)})
+        finally:
+            _save_status(status, report)
+            shutil.rmtree(directory, ignore_errors=True)
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
@@ -0,0 +1,248 @@
+# bulk_reports.py - Export every attempt report of an exam paper as one zip
+#
+# Reports are rendered on a process pool (xhtml2pdf is CPU-bound, see
+# process_pools.py) into the same on-disk cache as single downloads (see
+# reports.py). An attempt whose current report version is already on disk is
+# skipped, so an export that was interrupted resumes where it stopped. The zip is never built in memory or on
+# disk: the download streams it from the cached PDFs one chunk at a time.
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import as_completed
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connections
+from django.utils.text import slugify
+
+from . import reports
+from .process_pools import process_pool
+from .models import StudentExamAttempt
+from .timeline import FINISHED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Rendering processes (None: one per CPU)
+EXPORT_WORKERS = None
+
+# How long the status of an export is remembered
+STATUS_TIMEOUT = 24 * 60 * 60
+
+# A running export that has not reported progress for this long was
+# interrupted (e.g. the server restarted) and may be started again
+STALE_AFTER = 5 * 60  # seconds
+
+# Attempts whose report versions are computed together (four queries per batch)
+VERSION_BATCH = 500
+
+# Bytes read from a cached PDF per streamed chunk
+CHUNK_SIZE = 64 * 1024
+
+RUNNING, READY, FAILED = reports.RUNNING, reports.READY, reports.FAILED
+
+# Errors kept in the status for display
+MAX_ERRORS = 20
+
+
+def _status_key(exam_paper_id):
+    return f"bulk_report_export:{exam_paper_id}"
+
+
+def export_attempts(exam_paper_id):
+    """Finished attempts of the exam paper, in a stable order."""
+    return (
+        StudentExamAttempt.objects.filter(exam_paper_id=exam_paper_id, status__in=FINISHED_STATUSES)
+        .select_related('student')
+        .order_by('id')
+    )
+
+
+def entry_name(attempt):
+    """File name of an attempt's report inside the zip."""
+    return f"{slugify(attempt.student.name) or 'student'}_{attempt.student_id}_attempt_{attempt.id}.pdf"
+
+
+def _report_paths(attempts):
+    """(attempt, current report version, its path, whether it is rendered) for each attempt."""
+    attempts = iter(attempts)
+    while batch := list(islice(attempts, VERSION_BATCH)):
+        versions = reports.report_versions(batch)
+        for attempt in batch:
+            version = versions[attempt.id]
+            path = reports.report_path(attempt.student_id, attempt.id, version)
+            yield attempt, version, path, os.path.exists(path)
+
+
+def _render_report(student_id, attempt_id, version):
+    """Runs in a worker process: render one report into the cache. Returns an error message or None."""
+    try:
+        reports.render_pdf(student_id, attempt_id, version)
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+    return None
+
+
+def get_status(exam_paper_id):
+    """The last known status of the exam paper's export, or None if it never ran."""
+    return cache.get(_status_key(exam_paper_id))
+
+
+def is_running(status):
+    return bool(status) and status['status'] == RUNNING and time.time() - status['updated_at'] < STALE_AFTER
+
+
+def _save(exam_paper_id, status):
+    status['updated_at'] = time.time()
+    elapsed = status['updated_at'] - status['started_at']
+    if status['rendered'] and elapsed > 0:
+        rate = status['rendered'] / (elapsed / 60)
+        status['reports_per_minute'] = round(rate, 1)
+        remaining = status['total'] - status['done'] - status['failed']
+        status['eta_seconds'] = int(remaining / rate * 60)
+    cache.set(_status_key(exam_paper_id), status, timeout=STATUS_TIMEOUT)
+
+
+def run_export(exam_paper_id, workers=EXPORT_WORKERS, progress=None):
+    """
+    Render every report of the exam paper that is not in the cache yet, on a
+    process pool. Progress and throughput are stored in the cache after each
+    report (see get_status). Returns the final status.
+    """
+    rendered, missing = 0, []
+    attempts = list(export_attempts(exam_paper_id))
+    for attempt, version, path, exists in _report_paths(attempts):
+        if exists:
+            rendered += 1
+        else:
+            missing.append((attempt.student_id, attempt.id, version))
+
+    status = {
+        'status': RUNNING,
+        'total': len(attempts),
+        'done': rendered,
+        'resumed_from': rendered,
+        'rendered': 0,
+        'failed': 0,
+        'errors': [],
+        'reports_per_minute': None,
+        'eta_seconds': None,
+        'started_at': time.time(),
+    }
+    _save(exam_paper_id, status)
+
+    if missing:
+        with process_pool(workers) as pool:
+            futures = {pool.submit(_render_report, *job): job for job in missing}
+            for future in as_completed(futures):
+                student_id, attempt_id, _ = futures[future]
+                try:
+                    error = future.result()
+                except Exception as e:
+                    error = str(e) or e.__class__.__name__
+                if error:
+                    logger.error(f"Error rendering report of attempt {attempt_id}: {error}")
+                    status['failed'] += 1
+                    if len(status['errors']) < MAX_ERRORS:
+                        status['errors'].append({'attempt_id': attempt_id, 'error': error})
+                else:
+                    status['done'] += 1
+                    status['rendered'] += 1
+                _save(exam_paper_id, status)
+                if progress:
+                    progress(status)
+
+    status['status'] = FAILED if status['failed'] else READY
+    status['eta_seconds'] = 0
+    _save(exam_paper_id, status)
+    return status
+
+
+_start_lock = threading.Lock()
+_running = set()
+
+
+def start_export(exam_paper_id, workers=EXPORT_WORKERS):
+    """Run the export in a background thread unless it is already running. Returns the current status."""
+    with _start_lock:
+        if exam_paper_id in _running or is_running(get_status(exam_paper_id)):
+            return get_status(exam_paper_id)
+        _running.add(exam_paper_id)
+
+    def run():
+        try:
+            run_export(exam_paper_id, workers=workers)
+        except Exception as e:
+            logger.error(f"Error exporting reports of exam paper {exam_paper_id}: {e}")
+            status = get_status(exam_paper_id) or {'started_at': time.time(), 'rendered': 0}
+            status.update({'status': FAILED, 'errors': [{'attempt_id': None, 'error': str(e)}]})
+            _save(exam_paper_id, status)
+        finally:
+            connections.close_all()
+            with _start_lock:
+                _running.discard(exam_paper_id)
+
+    # Visible to status polls before the thread has counted anything
+    _save(exam_paper_id, {
+        'status': RUNNING, 'total': None, 'done': 0, 'resumed_from': 0, 'rendered': 0, 'failed': 0,
+        'errors': [], 'reports_per_minute': None, 'eta_seconds': None, 'started_at': time.time(),
+    })
+    threading.Thread(target=run, daemon=True).start()
+    return get_status(exam_paper_id)
+
+
+class _StreamBuffer:
+    """Write-only file object for ZipFile; the streamer empties it after every write."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(exam_paper_id):
+    """
+    Yield a zip of the exam paper's rendered reports chunk by chunk. Reports
+    that are not rendered (or failed) are left out. PDFs are already
+    compressed, so they are stored as they are.
+    """
+    buffer = _StreamBuffer()
+    # The buffer cannot seek, so ZipFile writes sizes after each entry
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for attempt, _, path, exists in _report_paths(export_attempts(exam_paper_id).iterator()):
+            if not exists:
+                continue
+            try:
+                pdf = open(path, 'rb')
+            except FileNotFoundError:
+                continue  # Replaced by a newer version since it was checked
+            with pdf, archive.open(entry_name(attempt), 'w') as entry:
+                while chunk := pdf.read(CHUNK_SIZE):
+                    entry.write(chunk)
+                    if data := buffer.drain():
+                        yield data
+            if data := buffer.drain():
+                yield data
+    # Central directory
+    yield buffer.drain()
+
+
+def write_zip(exam_paper_id, fileobj):
+    """Write the zip of rendered reports to an open binary file."""
+    for chunk in stream_zip(exam_paper_id):
+        fileobj.write(chunk)
+
+
+def export_filename(exam_paper):
+    return f"reports_{slugify(exam_paper.title) or 'exam'}_{exam_paper.id}.zip"
@@ -0,0 +1,263 @@
+# contact_sheets.py - Per-attempt sprite sheets of evidence thumbnails
+#
+# All evidence images of an attempt are packed as small tiles into a few
+# JPEG sheets, with a JSON index of each tile's position, timestamp and event
+# type. The evidence review page loads one sheet instead of one request per
+# image and scrubs through the attempt by moving a background position.
+#
+# Sheets are built incrementally: when evidence is added only the new tiles
+# are pasted onto the last sheet. Tiles are 16-pixel aligned, so re-encoding
+# a sheet at the same JPEG quality leaves the existing tiles (nearly) intact.
+import io
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .models import CheatingImage
+from .worker_threads import WorkerQueue
+
+logger = logging.getLogger(__name__)
+
+TILE_WIDTH = 128
+TILE_HEIGHT = 96
+COLUMNS = 10
+# A new sheet is started after this many rows (keeps each sheet well below
+# the JPEG dimension limit and the re-encoded file small)
+ROWS_PER_SHEET = 40
+TILES_PER_SHEET = COLUMNS * ROWS_PER_SHEET
+
+JPEG_QUALITY = 80
+BACKGROUND = (33, 37, 41)
+
+SHEET_DIR = 'contact_sheets'
+
+
+def sheet_name(attempt_id, sheet):
+    return f"{SHEET_DIR}/attempt_{attempt_id}_{sheet}.jpg"
+
+
+def index_name(attempt_id):
+    return f"{SHEET_DIR}/attempt_{attempt_id}.json"
+
+
+def _new_index(attempt_id):
+    return {
+        'attempt_id': attempt_id,
+        'tile_width': TILE_WIDTH,
+        'tile_height': TILE_HEIGHT,
+        'columns': COLUMNS,
+        'tiles_per_sheet': TILES_PER_SHEET,
+        'last_image_id': 0,
+        'sheets': [],
+        'frames': [],
+    }
+
+
+def load_index(attempt_id, storage=default_storage):
+    """The stored index of an attempt, or None if no sheet was built yet."""
+    try:
+        with storage.open(index_name(attempt_id), 'rb') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _replace(storage, name, data):
+    """Overwrite a stored file; on local storage readers see the old or the new file, never a missing or partial one."""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Object stores: the media storage does not overwrite (see STORAGES in
+        # settings.py), so the old object goes first and the sheet may be
+        # missing for the length of one upload
+        if storage.exists(name):
+            storage.delete(name)
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:
+            logger.warning(f"Contact sheet file {name} was stored as {saved}")
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    if storage.file_permissions_mode is not None:
+        os.chmod(tmp_path, storage.file_permissions_mode)
+    os.replace(tmp_path, path)
+
+
+# One update of an attempt's sheets at a time per process: the background
+# thread and the review views may touch the same attempt. Other attempts are
+# not held up. {attempt_id: (lock, users)}, dropped when nobody uses it.
+_update_locks = {}
+_update_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _attempt_lock(attempt_id):
+    with _update_locks_guard:
+        lock, users = _update_locks.get(attempt_id, (None, 0))
+        lock = lock or threading.Lock()
+        _update_locks[attempt_id] = (lock, users + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _update_locks_guard:
+            lock, users = _update_locks.pop(attempt_id)
+            if users > 1:
+                _update_locks[attempt_id] = (lock, users - 1)
+
+
+def _tile(image_field):
+    """The image scaled to fit one tile, centred on the background colour."""
+    with image_field.open('rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((TILE_WIDTH, TILE_HEIGHT))
+    tile = Image.new('RGB', (TILE_WIDTH, TILE_HEIGHT), BACKGROUND)
+    tile.paste(image, ((TILE_WIDTH - image.width) // 2, (TILE_HEIGHT - image.height) // 2))
+    return tile
+
+
+def _open_sheet(storage, attempt_id, index, sheet):
+    if sheet < len(index['sheets']):
+        with storage.open(sheet_name(attempt_id, sheet), 'rb') as f:
+            image = Image.open(f)
+            image.load()
+        return image.convert('RGB')
+    index['sheets'].append({'count': 0})
+    return Image.new('RGB', (COLUMNS * TILE_WIDTH, TILE_HEIGHT), BACKGROUND)
+
+
+def update(attempt_id, storage=default_storage):
+    """
+    Add the attempt's evidence images that are not in its sheets yet. Only the
+    sheets receiving tiles are rewritten. Returns the index.
+    """
+    with _attempt_lock(attempt_id):
+        index = load_index(attempt_id, storage) or _new_index(attempt_id)
+        last_image_id = index['last_image_id']
+        images = (
+            CheatingImage.objects.filter(attempt_id=attempt_id, id__gt=index['last_image_id'])
+            .select_related('event')
+            .only('id', 'image', 'timestamp', 'overlays', 'event__event_code')
+            .order_by('id')
+        )
+
+        sheets = {}
+        for img in images:
+            index['last_image_id'] = img.id
+            try:
+                tile = _tile(img.image)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable evidence image {img.id}: {e}")
+                continue
+
+            sheet, position = divmod(len(index['frames']), TILES_PER_SHEET)
+            row, column = divmod(position, COLUMNS)
+            if sheet not in sheets:
+                sheets[sheet] = _open_sheet(storage, attempt_id, index, sheet)
+            image = sheets[sheet]
+            if image.height < (row + 1) * TILE_HEIGHT:
+                grown = Image.new('RGB', (image.width, (row + 1) * TILE_HEIGHT), BACKGROUND)
+                grown.paste(image, (0, 0))
+                image = sheets[sheet] = grown
+            image.paste(tile, (column * TILE_WIDTH, row * TILE_HEIGHT))
+
+            index['sheets'][sheet]['count'] = position + 1
+            index['frames'].append({
+                'id': img.id,
+                'sheet': sheet,
+                'x': column * TILE_WIDTH,
+                'y': row * TILE_HEIGHT,
+                'timestamp': img.timestamp.isoformat() if img.timestamp else None,
+                'event_type': img.event.get_event_code_display() if img.event else None,
+                'image': img.image.name,
+                'has_overlays': bool(img.overlays),
+            })
+
+        if index['last_image_id'] == last_image_id:
+            return index  # Nothing new
+
+        for sheet, image in sheets.items():
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+            _replace(storage, sheet_name(attempt_id, sheet), buffer.getvalue())
+        # Written last: readers never see frames whose tiles are not on a sheet yet
+        _replace(storage, index_name(attempt_id), json.dumps(index).encode())
+        return index
+
+
+def reset(attempt_id, storage=default_storage):
+    """Delete an attempt's sheets and index (rebuilt on next use), e.g. after its images moved."""
+    with _attempt_lock(attempt_id):
+        index = load_index(attempt_id, storage)
+        if index is None:
+            return
+        # The index goes first so a reader never finds it pointing at missing sheets
+        storage.delete(index_name(attempt_id))
+        for number in range(len(index['sheets'])):
+            storage.delete(sheet_name(attempt_id, number))
+
+
+def _versioned(url, version):
+    # Presigned bucket URLs already carry a query string
+    return f"{url}{'&' if '?' in url else '?'}v={version}"
+
+
+def index_with_urls(index, storage=default_storage):
+    """The index as served to the review page: sheet, original image and overlay URLs added."""
+    attempt_id = index['attempt_id']
+    sheets = [
+        # The count busts browser caches when a sheet has grown
+        {**sheet, 'url': _versioned(storage.url(sheet_name(attempt_id, number)), sheet['count'])}
+        for number, sheet in enumerate(index['sheets'])
+    ]
+    frames = [
+        {
+            **frame,
+            'url': storage.url(frame['image']),
+            # Drawn on demand (see overlays.py)
+            'overlay_url': reverse('evidence_overlay', args=[frame['id']]) if frame.get('has_overlays') else None,
+        }
+        for frame in index['frames']
+    ]
+    return {**index, 'sheets': sheets, 'frames': frames}
+
+
+def is_stale(attempt_id, index):
+    """True when the attempt has evidence newer than the index."""
+    last_image_id = index['last_image_id'] if index else 0
+    return CheatingImage.objects.filter(attempt_id=attempt_id, id__gt=last_image_id).exists()
+
+
+
+
+def _update_job(attempt_id):
+    try:
+        update(attempt_id)
+    except Exception as e:
+        logger.error(f"Error updating contact sheet of attempt {attempt_id}: {e}")
+
+
+class ContactSheetQueue(WorkerQueue):
+    """Attempts whose sheets need new tiles, processed by one daemon thread."""
+
+    def __init__(self):
+        super().__init__(_update_job, 'contact sheet queue', key=lambda attempt_id: attempt_id)
+
+    def submit(self, attempt_id):
+        """Queue an attempt (several new images of one attempt are added in one update)."""
+        if attempt_id is None:
+            return False
+        return super().submit(attempt_id)
+
+
+contact_sheet_queue = ContactSheetQueue()
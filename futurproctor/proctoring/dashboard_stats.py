@@ -0,0 +1,91 @@
+# dashboard_stats.py - Counters for the enhanced admin dashboard
+#
+# All counters come from two grouped aggregate queries and are cached as one
+# cache key per counter for a short TTL. Between refreshes the model signals
+# (see signals.py) adjust the cached counters with atomic incr/decr, so an
+# approval or a submission shows up at once without recounting anything.
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import ExamPaper, Student
+
+# Seconds a computed snapshot is trusted before it is recomputed
+SNAPSHOT_TTL = 60
+
+COUNTERS = [
+    'total_students',
+    'approved_students',
+    'pending_approvals',
+    'rejected_students',
+    'total_exams',
+    'active_exams',
+    'total_attempts',
+    'pending_evaluations',
+    'evaluated_attempts',
+]
+
+# Which counter each status value feeds
+APPROVAL_COUNTERS = {
+    'approved': 'approved_students',
+    'pending': 'pending_approvals',
+    'rejected': 'rejected_students',
+}
+ATTEMPT_STATUS_COUNTERS = {
+    'submitted': 'pending_evaluations',
+    'evaluated': 'evaluated_attempts',
+}
+
+
+def _key(name):
+    return f"dashboard_stats:{name}"
+
+
+def compute():
+    """Recount every counter: one query for students, one for exams and attempts."""
+    students = Student.objects.aggregate(
+        total_students=Count('id'),
+        approved_students=Count('id', filter=Q(approval_status='approved')),
+        pending_approvals=Count('id', filter=Q(approval_status='pending')),
+        rejected_students=Count('id', filter=Q(approval_status='rejected')),
+    )
+    # Exam papers LEFT JOIN attempts: papers are counted distinct, attempts by row
+    exams = ExamPaper.objects.aggregate(
+        total_exams=Count('id', distinct=True),
+        active_exams=Count('id', filter=Q(is_active=True), distinct=True),
+        total_attempts=Count('attempts'),
+        pending_evaluations=Count('attempts', filter=Q(attempts__status='submitted')),
+        evaluated_attempts=Count('attempts', filter=Q(attempts__status='evaluated')),
+    )
+    return {**students, **exams}
+
+
+def snapshot():
+    """Current counters, from the cache when every counter is still there."""
+    cached = cache.get_many([_key(name) for name in COUNTERS])
+    if len(cached) == len(COUNTERS):
+        return {name: cached[_key(name)] for name in COUNTERS}
+
+    counters = compute()
+    cache.set_many({_key(name): value for name, value in counters.items()}, timeout=SNAPSHOT_TTL)
+    return counters
+
+
+def adjust(name, delta):
+    """Add `delta` to a cached counter; a counter that is not cached is recomputed on the next read."""
+    if not name or not delta:
+        return
+    try:
+        cache.incr(_key(name), delta)
+    except ValueError:
+        # Not cached (expired or never computed): drop the rest so they are recounted together
+        invalidate()
+
+
+def attempt_status_changed(old, new):
+    """Move one attempt from the counter of status `old` to that of `new`."""
+    adjust(ATTEMPT_STATUS_COUNTERS.get(old), -1)
+    adjust(ATTEMPT_STATUS_COUNTERS.get(new), 1)
+
+
+def invalidate():
+    cache.delete_many([_key(name) for name in COUNTERS])
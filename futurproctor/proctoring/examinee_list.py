@@ -0,0 +1,91 @@
+# examinee_list.py - Cached examinee list for the admin dashboard
+#
+# Every value on the page (first exam, its score, trust score) is computed in
+# one aggregate query, one page at a time. Pages are cached under a version
+# number that signals.py bumps whenever a student or exam is written or a
+# cheating event is created or deleted, so the list never shows stale data
+# for long.
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Round
+
+from .models import CheatingEvent, Exam, Student
+
+PAGE_SIZE = 50
+
+# Pages are also dropped after this long, as a safety net for writes made
+# with update() (which send no signals)
+CACHE_TIMEOUT = 300
+
+_VERSION_KEY = "admin_dashboard:version"
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, 1, timeout=None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Drop every cached dashboard page (called from the model signals)."""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.add(_VERSION_KEY, 1, timeout=None)
+
+
+def examinee_rows(search=''):
+    """Students with their first exam, its score and their trust score, computed in SQL."""
+    # The template used to show student.exams.first(), i.e. the exam with the lowest id
+    first_exam = Exam.objects.filter(student=OuterRef('pk')).order_by('pk')
+    # Scores that were never stored are computed on the fly instead of saved on read
+    exam_score = Case(
+        When(total_questions__gt=0, then=Round(
+            F('correct_answers') * 100.0 / F('total_questions'), 2, output_field=FloatField()
+        )),
+        default=Value(None),
+        output_field=FloatField(),
+    )
+    event_count = (
+        CheatingEvent.objects.filter(student=OuterRef('pk'))
+        .order_by().values('student').annotate(n=Count('id')).values('n')
+    )
+
+    students = Student.objects.order_by('pk')
+    if search:
+        students = students.filter(Q(name__icontains=search) | Q(email__icontains=search))
+
+    return students.annotate(
+        first_exam_name=Subquery(first_exam.values('exam_name')[:1]),
+        first_exam_score=Subquery(
+            first_exam.annotate(score=Coalesce('percentage_score', exam_score)).values('score')[:1]
+        ),
+        cheating_event_count=Coalesce(Subquery(event_count, output_field=IntegerField()), 0),
+    ).annotate(
+        # Trust score decreases 10 points per cheating event (with a floor of 0)
+        trust_score=Greatest(Value(0), Value(100) - F('cheating_event_count') * 10),
+    ).values('id', 'name', 'email', 'first_exam_name', 'first_exam_score', 'trust_score')
+
+
+def examinee_page(page_number, search=''):
+    """One page of examinees as a dict; unfiltered pages come from the cache."""
+    key = f"admin_dashboard:{_version()}:{page_number}"
+    if not search:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    paginator = Paginator(examinee_rows(search), PAGE_SIZE)
+    page = paginator.get_page(page_number)
+    result = {
+        'students': list(page.object_list),
+        'number': page.number,
+        'num_pages': paginator.num_pages,
+        'count': paginator.count,
+    }
+    if not search:
+        cache.set(key, result, timeout=CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from proctoring.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = "Delete proctoring evidence older than the retention period of its exam paper"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Delete the evidence of at most this many attempts")
+
+    def handle(self, *args, **options):
+        purged, failed = apply_retention(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted the evidence of {purged} attempts, {failed} failed"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from proctoring.retention import archive_published
+
+
+class Command(BaseCommand):
+    help = "Pack the evidence of attempts with published results into one archive per attempt"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after-days', type=int, default=30, help="Days after publication to archive evidence")
+        parser.add_argument('--limit', type=int, default=None, help="Archive at most this many attempts")
+
+    def handle(self, *args, **options):
+        archived, failed = archive_published(options['after_days'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Archived the evidence of {archived} attempts, {failed} failed"))
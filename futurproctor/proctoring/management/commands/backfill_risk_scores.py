@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from proctoring.models import StudentExamAttempt
+from proctoring.risk import backfill
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored risk score of exam attempts from their proctoring events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam-paper', type=int, help="Only attempts of this exam paper")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        attempts = StudentExamAttempt.objects.order_by('id')
+        if options['exam_paper']:
+            attempts = attempts.filter(exam_paper_id=options['exam_paper'])
+
+        def progress(updated):
+            self.stdout.write(f"Updated {updated} attempts so far")
+
+        updated = backfill(attempts, progress=progress, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated the risk score of {updated} attempts"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from proctoring.timeline import compact_finished
+
+
+class Command(BaseCommand):
+    help = "Fold the raw proctoring events of finished attempts into per-attempt timelines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Compact at most this many attempts")
+
+    def handle(self, *args, **options):
+        compacted = compact_finished(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} attempt timelines"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from proctoring import bulk_reports, reports
+from proctoring.models import ExamPaper
+
+
+class Command(BaseCommand):
+    help = "Render the PDF report of every finished attempt of an exam paper and write them to one zip"
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_paper_id', type=int)
+        parser.add_argument('--output', help="Zip file to write (default: reports_<title>_<id>.zip)")
+        parser.add_argument('--workers', type=int, default=None, help="Number of rendering processes")
+
+    def handle(self, *args, **options):
+        if not reports.PDF_AVAILABLE:
+            raise CommandError("xhtml2pdf is not installed")
+        try:
+            exam_paper = ExamPaper.objects.get(id=options['exam_paper_id'])
+        except ExamPaper.DoesNotExist:
+            raise CommandError(f"Exam paper {options['exam_paper_id']} does not exist")
+
+        def progress(status):
+            self.stdout.write(
+                f"{status['done']}/{status['total']} reports, {status['failed']} failed, "
+                f"{status['reports_per_minute']} reports/min"
+            )
+
+        # Rerunning after an interruption only renders the reports that are still missing
+        status = bulk_reports.run_export(exam_paper.id, workers=options['workers'], progress=progress)
+        if status['resumed_from']:
+            self.stdout.write(f"Reused {status['resumed_from']} reports rendered earlier")
+        for error in status['errors']:
+            self.stderr.write(f"Attempt {error['attempt_id']}: {error['error']}")
+
+        output = options['output'] or bulk_reports.export_filename(exam_paper)
+        with open(output, 'wb') as f:
+            bulk_reports.write_zip(exam_paper.id, f)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {status['done']} reports to {output}, {status['failed']} failed"
+        ))
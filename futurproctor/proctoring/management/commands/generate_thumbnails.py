@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from proctoring.models import CheatingImage, Student
+from proctoring.thumbnails import generate, mark_generated
+
+
+class Command(BaseCommand):
+    help = "Create the missing thumbnails of student photos and evidence images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recreate thumbnails that already exist")
+
+    def handle(self, *args, **options):
+        sources = [
+            ('student photos', Student, 'photo'),
+            ('evidence images', CheatingImage, 'image'),
+        ]
+        for label, model, field in sources:
+            storage = model._meta.get_field(field).storage
+            names = model.objects.exclude(**{field: ''}).values_list(field, flat=True)
+            written = failed = 0
+            for name in names.iterator():
+                try:
+                    written += generate(storage, name, force=options['force'])
+                    mark_generated(name)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{name}: {e}")
+            self.stdout.write(self.style.SUCCESS(f"{label}: wrote {written} thumbnails, {failed} failed"))
@@ -0,0 +1,57 @@
+import csv
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from proctoring.bulk_onboarding import BATCH_SIZE, import_students
+
+
+class Command(BaseCommand):
+    help = "Bulk register students from a CSV file and a zip archive of their photos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help="CSV with columns: name, email, photo, [address], [password]")
+        parser.add_argument('archive_path', help="Zip archive containing the photos named in the CSV")
+        parser.add_argument('--auto-approve', action='store_true', help="Mark imported students as approved")
+        parser.add_argument('--approved-by', help="Username of the staff member recorded as approver")
+        parser.add_argument('--workers', type=int, default=None, help="Number of face-encoding processes")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--failures', help="Write per-record failures to this CSV file")
+
+    def handle(self, *args, **options):
+        approved_by = None
+        if options['approved_by']:
+            try:
+                approved_by = User.objects.get(username=options['approved_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['approved_by']}' does not exist")
+
+        def progress(report):
+            self.stdout.write(f"Created {report.created} students, {len(report.failures)} failures so far")
+
+        try:
+            report = import_students(
+                options['csv_path'],
+                options['archive_path'],
+                auto_approve=options['auto_approve'],
+                approved_by=approved_by,
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['failures']:
+            with open(options['failures'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['row', 'email', 'reason'])
+                for failure in report.failures:
+                    writer.writerow([failure.row, failure.email, failure.reason])
+        else:
+            for failure in report.failures:
+                self.stderr.write(f"Row {failure.row} ({failure.email}): {failure.reason}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} students, {len(report.failures)} failed"
+        ))
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from proctoring import contact_sheets
+from proctoring.media_layout import SHARDED
+from proctoring.models import CheatingAudio, CheatingImage, Student
+from proctoring.retention import delete_stored, derived_names
+
+SOURCES = [
+    ('student photos', Student, 'photo', ('id', 'photo', 'thumbnail_source', 'timestamp')),
+    ('evidence images', CheatingImage, 'image', ('id', 'image', 'thumbnail_source', 'timestamp', 'attempt_id')),
+    ('evidence audio', CheatingAudio, 'audio', ('id', 'audio', 'timestamp', 'attempt_id')),
+]
+
+
+def _copy(storage, old, new):
+    """Copy a stored file to `new` and return the name it was stored under."""
+    try:
+        source, target = storage.path(old), storage.path(new)
+    except NotImplementedError:
+        source = None
+    if source is not None:
+        # Same file system: a hard link moves no data
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.link(source, target)
+            return new
+        except OSError:
+            pass
+    with storage.open(old, 'rb') as f:
+        return storage.save(new, File(f))
+
+
+def _returning_errors(function):
+    # For pool.map: one bad file must not stop the batch
+    def call(argument):
+        try:
+            return function(argument)
+        except Exception as e:
+            return e
+    return call
+
+
+class Command(BaseCommand):
+    help = "Move uploaded files stored under the old flat layout into the sharded layout (see media_layout.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Files copied at the same time")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows updated per database write")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the files that would move")
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for label, model, field, columns in SOURCES:
+                rows = (
+                    model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                    .exclude(**{f'{field}__regex': SHARDED.pattern})
+                )
+                if options['dry_run']:
+                    self.stdout.write(f"{label}: {rows.count()} files to move")
+                    continue
+
+                moved = failed = 0
+                last_id = 0
+                while True:
+                    # Keyset pages: rows that fail to move are not picked up again
+                    batch = list(rows.filter(id__gt=last_id).only(*columns).order_by('id')[:options['batch_size']])
+                    if not batch:
+                        break
+                    last_id = batch[-1].id
+                    done, errors = self._relocate(pool, model, field, columns, batch)
+                    moved, failed = moved + done, failed + errors
+                    self.stdout.write(f"{label}: {moved} moved, {failed} failed")
+                self.stdout.write(self.style.SUCCESS(f"{label}: moved {moved} files, {failed} failed"))
+
+    def _relocate(self, pool, model, field, columns, batch):
+        """
+        Move one batch: copy the files, point the rows at the copies, then
+        delete the originals. An interrupted run leaves at most unreferenced
+        copies or originals behind, never a row pointing at a missing file,
+        and a rerun picks up the rows not moved yet.
+        """
+        storage = model._meta.get_field(field).storage
+
+        def copy(instance):
+            old = getattr(instance, field).name
+            new = _copy(storage, old, model._meta.get_field(field).generate_filename(instance, os.path.basename(old)))
+            for old_derived, new_derived in zip(derived_names(old), derived_names(new)):
+                if storage.exists(old_derived):
+                    _copy(storage, old_derived, new_derived)
+            return instance, old, new
+
+        copied, failed = [], 0
+        for instance, result in zip(batch, pool.map(_returning_errors(copy), batch)):
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(f"{model.__name__} {instance.id}: {result}")
+            else:
+                copied.append(result)
+        if not copied:
+            return 0, failed
+
+        # The thumbnails were copied along, so the row's record of them follows
+        fields = [field, 'thumbnail_source'] if 'thumbnail_source' in columns else [field]
+        for instance, old, new in copied:
+            getattr(instance, field).name = new
+            if 'thumbnail_source' in columns and instance.thumbnail_source == old:
+                instance.thumbnail_source = new
+        model.objects.bulk_update([instance for instance, _, _ in copied], fields)
+
+        list(pool.map(_returning_errors(lambda old: delete_stored(storage, old)), [old for _, old, _ in copied]))
+
+        # Contact sheet indexes list image names; rebuilt the next time they are used
+        if model is CheatingImage:
+            for attempt_id in {instance.attempt_id for instance, _, _ in copied if instance.attempt_id}:
+                contact_sheets.reset(attempt_id)
+        return len(copied), failed
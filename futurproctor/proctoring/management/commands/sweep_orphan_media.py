@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from proctoring.retention import sweep_orphans
+
+
+class Command(BaseCommand):
+    help = "Delete uploaded files that no student, evidence or attempt row refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=24, help="Leave files younger than this alone")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the orphaned files")
+
+    def handle(self, *args, **options):
+        totals = sweep_orphans(min_age=timedelta(hours=options['min_age_hours']), dry_run=options['dry_run'])
+        verb = "found" if options['dry_run'] else "deleted"
+        for directory, (scanned, orphaned) in totals.items():
+            self.stdout.write(self.style.SUCCESS(f"{directory}: scanned {scanned} files, {verb} {orphaned} orphans"))
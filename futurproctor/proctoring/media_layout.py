@@ -0,0 +1,49 @@
+# media_layout.py - Where uploaded files are stored
+#
+# Uploads used to land flat in cheating_images/, cheating_audios/ and
+# student_photos/, named after the upload time or the student. After a few
+# exam seasons those directories hold millions of entries, and two saves in
+# the same instant could pick the same name. New files get a random name in
+# a directory sharded by date (and attempt, for evidence):
+#
+#   cheating_images/2026/10/19/attempt_42/3f2a9c...c1.jpg
+#   cheating_audios/2026/10/19/attempt_42/9b1e04...07.wav
+#   student_photos/2026/10/19/5e0d7b...aa.jpg
+#
+# The top-level directories are unchanged, media_views decides access by
+# them. Files stored under the old layout are moved by `manage.py
+# relocate_media`.
+import os
+import re
+import uuid
+
+from django.utils import timezone
+
+# Names already in the sharded layout
+SHARDED = re.compile(r'^(cheating_images|cheating_audios|student_photos)/\d{4}/\d{2}/\d{2}/')
+
+
+def is_sharded(name):
+    return bool(SHARDED.match(name or ''))
+
+
+def _sharded_name(prefix, when, filename, *directories):
+    extension = os.path.splitext(filename)[1].lower()
+    day = (when or timezone.now()).strftime('%Y/%m/%d')
+    return '/'.join([prefix, day, *directories, uuid.uuid4().hex + extension])
+
+
+def _attempt_directory(instance):
+    return f"attempt_{instance.attempt_id}" if instance.attempt_id else 'no_attempt'
+
+
+def student_photo_path(instance, filename):
+    return _sharded_name('student_photos', instance.timestamp, filename)
+
+
+def evidence_image_path(instance, filename):
+    return _sharded_name('cheating_images', instance.timestamp, filename, _attempt_directory(instance))
+
+
+def evidence_audio_path(instance, filename):
+    return _sharded_name('cheating_audios', instance.timestamp, filename, _attempt_directory(instance))
@@ -0,0 +1,176 @@
+# media_views.py - Serving uploaded media (student photos and evidence)
+#
+# Replaces django.conf.urls.static for MEDIA_URL. Every file is checked
+# against its owner: staff may see everything, a student only their own photo
+# and evidence. Responses carry an ETag and Cache-Control (evidence never
+# changes once written, so it is cached for a year) and honour single byte
+# ranges, so seeking in an evidence clip only fetches the part played.
+#
+# In production the file transfer can be handed to the web server with
+# MEDIA_ACCEL = 'nginx' (X-Accel-Redirect to MEDIA_ACCEL_PREFIX, mapped by an
+# `internal` location onto MEDIA_ROOT) or 'sendfile' (X-Sendfile, Apache).
+import mimetypes
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import CheatingAudio, CheatingImage, Student
+
+# Optional web server offload: None, 'nginx' or 'sendfile'
+MEDIA_ACCEL = getattr(settings, 'MEDIA_ACCEL', None)
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Files that are rewritten under the same name (revalidated on every use)
+MUTABLE_PREFIXES = ('contact_sheets/',)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+CHUNK_SIZE = 64 * 1024
+
+# Derived files (thumbnails, overlays) are named <original root>_<suffix>
+DERIVED_SUFFIX = re.compile(r'_(\d+\.webp|overlay\.jpg)$')
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _clean_path(path):
+    """Normalized storage name, or None if it leaves the media directory."""
+    name = posixpath.normpath(path).lstrip('/')
+    if name.startswith('..') or name in ('', '.'):
+        return None
+    return name
+
+
+def _file_filter(field, name):
+    """Lookup on `field` for the stored file `name`, or for the original a derived file was made from."""
+    match = DERIVED_SUFFIX.search(name)
+    if match:
+        return {f'{field}__startswith': name[:match.start()] + '.'}
+    return {field: name}
+
+
+def can_view(user, name):
+    """Staff see every file; a student only their own photo and evidence."""
+    if user.is_staff:
+        return True
+    if not user.is_authenticated:
+        return False
+
+    if name.startswith('student_photos/'):
+        return Student.objects.filter(user=user, **_file_filter('photo', name)).exists()
+    if name.startswith('cheating_images/'):
+        return CheatingImage.objects.filter(event__student__user=user, **_file_filter('image', name)).exists()
+    if name.startswith('cheating_audios/'):
+        return CheatingAudio.objects.filter(event__student__user=user, **_file_filter('audio', name)).exists()
+    # Contact sheets and anything else: staff only
+    return False
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable byte range, None to send the whole file, False if unsatisfiable."""
+    match = RANGE_HEADER.match(header.strip())
+    if not match:
+        return None  # Several ranges or another unit: the whole file is a valid answer
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # An empty file has no byte a range could select
+        return False
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _file_chunks(f, remaining):
+    try:
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+@require_safe
+def serve_media(request, path, storage=default_storage):
+    """Serve one media file to its owner or staff, honouring conditional and Range requests"""
+    name = _clean_path(path)
+    if name is None:
+        raise Http404("File not found")
+    if not can_view(request.user, name):
+        return HttpResponseForbidden("You do not have access to this file.")
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except (FileNotFoundError, NotImplementedError, OSError):
+        raise Http404("File not found")
+
+    last_modified = int(modified.timestamp())
+    etag = quote_etag(f"{size:x}-{last_modified:x}")
+    cache_control = (
+        'private, no-cache' if name.startswith(MUTABLE_PREFIXES)
+        else f'private, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    )
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = cache_control
+        return response
+
+    # 304 when the browser's copy is still current
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return with_headers(response)
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    if MEDIA_ACCEL:
+        # The web server sends the file and handles ranges itself
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_ACCEL == 'nginx':
+            response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name
+        else:
+            response['X-Sendfile'] = storage.path(name)
+        return with_headers(response)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    # If-Range: only honour the range when the client's copy is the current version
+    if range_header and request.headers.get('If-Range', etag) in (etag, http_date(last_modified)):
+        byte_range = _parse_range(range_header, size)
+    if byte_range is False:
+        response = with_headers(HttpResponse(status=416))
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    f = storage.open(name, 'rb')
+    if byte_range is None:
+        response = StreamingHttpResponse(_file_chunks(f, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = StreamingHttpResponse(_file_chunks(f, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return with_headers(response)
+
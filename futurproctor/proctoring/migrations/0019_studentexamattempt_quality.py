@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0018_student_approval_status_student_approved_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentexamattempt",
+            name="quality_level",
+            field=models.CharField(
+                default="full",
+                help_text="Current proctoring quality level",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentexamattempt",
+            name="quality_log",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Every quality level change with the load that caused it",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0019_studentexamattempt_quality"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentexamattempt",
+            name="tab_switch_count",
+            field=models.IntegerField(default=0),
+        ),
+    ]
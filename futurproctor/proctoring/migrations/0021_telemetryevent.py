@@ -0,0 +1,71 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0020_studentexamattempt_tab_switch_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TelemetryEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_type",
+                    models.CharField(
+                        choices=[
+                            ("visibility_hidden", "Page Hidden"),
+                            ("visibility_visible", "Page Visible"),
+                            ("blur", "Window Blur"),
+                            ("focus", "Window Focus"),
+                            ("fullscreen_exit", "Fullscreen Exit"),
+                            ("copy", "Copy"),
+                            ("cut", "Cut"),
+                            ("paste", "Paste"),
+                            ("context_menu", "Context Menu"),
+                            ("devtools_open", "Developer Tools Opened"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "client_timestamp",
+                    models.DateTimeField(
+                        help_text="When the browser observed the event"
+                    ),
+                ),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("detail", models.CharField(blank=True, default="", max_length=200)),
+                (
+                    "attempt",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="telemetry_events",
+                        to="proctoring.studentexamattempt",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["client_timestamp"],
+                "indexes": [
+                    models.Index(
+                        fields=["attempt", "client_timestamp"],
+                        name="proctoring__attempt_868b18_idx",
+                    )
+                ],
+            },
+        ),
+    ]
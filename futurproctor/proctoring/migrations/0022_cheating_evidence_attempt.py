@@ -0,0 +1,72 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0021_telemetryevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cheatingaudio",
+            name="attempt",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="cheating_audios",
+                to="proctoring.studentexamattempt",
+            ),
+        ),
+        migrations.AddField(
+            model_name="cheatingevent",
+            name="attempt",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="cheating_events",
+                to="proctoring.studentexamattempt",
+            ),
+        ),
+        migrations.AddField(
+            model_name="cheatingevent",
+            name="exam_paper",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="cheating_events",
+                to="proctoring.exampaper",
+            ),
+        ),
+        migrations.AddField(
+            model_name="cheatingimage",
+            name="attempt",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="cheating_images",
+                to="proctoring.studentexamattempt",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cheatingevent",
+            index=models.Index(
+                fields=["attempt", "event_type", "timestamp"],
+                name="proctoring__attempt_f38e12_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cheatingevent",
+            index=models.Index(
+                fields=["exam_paper", "timestamp"],
+                name="proctoring__exam_pa_a19533_idx",
+            ),
+        ),
+    ]
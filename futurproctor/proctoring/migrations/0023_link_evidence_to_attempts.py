@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Q, Subquery
+
+
+def link_evidence_to_attempts(apps, schema_editor):
+    """
+    Attach existing events to the attempt that was running when they happened,
+    then copy the attempt onto the event's images and audio. Events with no
+    running attempt, or with more than one (overlapping attempts), are left
+    without an attempt rather than guessed.
+    """
+    CheatingEvent = apps.get_model("proctoring", "CheatingEvent")
+    CheatingImage = apps.get_model("proctoring", "CheatingImage")
+    CheatingAudio = apps.get_model("proctoring", "CheatingAudio")
+    StudentExamAttempt = apps.get_model("proctoring", "StudentExamAttempt")
+
+    attempts = StudentExamAttempt.objects.filter(student_id=OuterRef("student_id"))
+    running = attempts.filter(started_at__lte=OuterRef("timestamp")).filter(
+        Q(submitted_at__isnull=True) | Q(submitted_at__gte=OuterRef("timestamp"))
+    )
+    running_count = (
+        running.order_by().values("student_id").annotate(n=Count("id")).values("n")
+    )
+
+    CheatingEvent.objects.filter(attempt__isnull=True, student__isnull=False).annotate(
+        running_attempts=Subquery(running_count[:1])
+    ).filter(running_attempts=1).update(attempt_id=Subquery(running.values("id")[:1]))
+
+    CheatingEvent.objects.filter(attempt__isnull=False, exam_paper__isnull=True).update(
+        exam_paper_id=Subquery(
+            StudentExamAttempt.objects.filter(id=OuterRef("attempt_id")).values(
+                "exam_paper_id"
+            )[:1]
+        )
+    )
+
+    event_attempt = Subquery(
+        CheatingEvent.objects.filter(id=OuterRef("event_id")).values("attempt_id")[:1]
+    )
+    CheatingImage.objects.filter(attempt__isnull=True).update(attempt_id=event_attempt)
+    CheatingAudio.objects.filter(attempt__isnull=True).update(attempt_id=event_attempt)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0022_cheating_evidence_attempt"),
+    ]
+
+    operations = [
+        migrations.RunPython(link_evidence_to_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0023_link_evidence_to_attempts"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cheatingaudio",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="cheatingevent",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="cheatingimage",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="exam",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="student",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name="AttemptTimeline",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "data",
+                    models.BinaryField(
+                        help_text="np.savez_compressed arrays: time, code, confidence"
+                    ),
+                ),
+                ("event_count", models.IntegerField(default=0)),
+                ("first_event_at", models.DateTimeField(blank=True, null=True)),
+                ("last_event_at", models.DateTimeField(blank=True, null=True)),
+                ("compacted_at", models.DateTimeField(auto_now=True)),
+                (
+                    "attempt",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to="proctoring.studentexamattempt",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProctoringEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("event_type", models.CharField(max_length=50)),
+                ("timestamp", models.DateTimeField(default=django.utils.timezone.now)),
+                ("confidence", models.FloatField(default=1.0)),
+                (
+                    "attempt",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="proctoring_events",
+                        to="proctoring.studentexamattempt",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["attempt", "timestamp"],
+                        name="proctoring__attempt_d1937b_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0024_event_timeline"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cheatingevent",
+            name="event_code",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (0, "Other"),
+                    (1, "Object Detected"),
+                    (2, "Multiple Persons"),
+                    (3, "Gaze Away"),
+                    (4, "Identity Mismatch"),
+                    (5, "Suspicious Audio"),
+                    (6, "Tab Switch"),
+                ],
+                default=0,
+            ),
+        ),
+        migrations.AddField(
+            model_name="cheatingevent",
+            name="objects_mask",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="proctoringevent",
+            name="event_code",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (0, "Other"),
+                    (1, "Object Detected"),
+                    (2, "Multiple Persons"),
+                    (3, "Gaze Away"),
+                    (4, "Identity Mismatch"),
+                    (5, "Suspicious Audio"),
+                    (6, "Tab Switch"),
+                ],
+                default=0,
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+import json
+
+from django.db import migrations
+
+# Frozen copies of EventCode / ObjectClass at the time of this migration
+EVENT_CODES = {
+    "object_detected": 1,
+    "multiple_persons": 2,
+    "gaze_detected": 3,
+    "identity_mismatch": 4,
+    "audio_detected": 5,
+    "tab_switch": 6,
+}
+OBJECT_BITS = {"person": 1, "cell phone": 2, "book": 4}
+
+
+def populate_event_codes(apps, schema_editor):
+    """Convert event_type strings to codes and detected_objects lists to bitmasks."""
+    CheatingEvent = apps.get_model("proctoring", "CheatingEvent")
+    ProctoringEvent = apps.get_model("proctoring", "ProctoringEvent")
+
+    for model in (CheatingEvent, ProctoringEvent):
+        for event_type, code in EVENT_CODES.items():
+            model.objects.filter(event_type=event_type).update(event_code=code)
+
+    # Only events that actually listed objects need a per-row update
+    events = CheatingEvent.objects.exclude(detected_objects=[]).only("detected_objects")
+    for event in events.iterator():
+        objects = event.detected_objects
+        if isinstance(objects, str):
+            try:
+                objects = json.loads(objects)
+            except json.JSONDecodeError:
+                objects = []
+        mask = 0
+        for label in objects if isinstance(objects, list) else []:
+            mask |= OBJECT_BITS.get(label, 0)
+        CheatingEvent.objects.filter(id=event.id).update(objects_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0025_event_codes"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_event_codes, migrations.RunPython.noop),
+    ]
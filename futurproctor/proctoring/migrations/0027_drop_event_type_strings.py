@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0026_populate_event_codes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="cheatingevent",
+            name="proctoring__attempt_f38e12_idx",
+        ),
+        migrations.RemoveField(
+            model_name="cheatingevent",
+            name="detected_objects",
+        ),
+        migrations.RemoveField(
+            model_name="cheatingevent",
+            name="event_type",
+        ),
+        migrations.RemoveField(
+            model_name="proctoringevent",
+            name="event_type",
+        ),
+        migrations.AddIndex(
+            model_name="cheatingevent",
+            index=models.Index(
+                fields=["attempt", "event_code", "timestamp"],
+                name="proctoring__attempt_f6d6c4_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cheatingevent",
+            index=models.Index(
+                fields=["exam_paper", "event_code"],
+                name="proctoring__exam_pa_89a32b_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0027_drop_event_type_strings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentexamattempt",
+            name="risk_score",
+            field=models.FloatField(
+                default=0.0, help_text="Weighted proctoring risk score"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentexamattempt",
+            index=models.Index(
+                fields=["-risk_score"], name="proctoring__risk_sc_3e94a1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentexamattempt",
+            index=models.Index(
+                fields=["exam_paper", "-risk_score"],
+                name="proctoring__exam_pa_064048_idx",
+            ),
+        ),
+    ]
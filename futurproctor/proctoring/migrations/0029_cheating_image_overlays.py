@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0028_attempt_risk_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cheatingimage",
+            name="overlays",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:44
+
+import proctoring.media_layout
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0029_cheating_image_overlays"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cheatingaudio",
+            name="audio",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                upload_to=proctoring.media_layout.evidence_audio_path,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cheatingimage",
+            name="image",
+            field=models.ImageField(
+                upload_to=proctoring.media_layout.evidence_image_path
+            ),
+        ),
+        migrations.AlterField(
+            model_name="student",
+            name="photo",
+            field=models.ImageField(
+                upload_to=proctoring.media_layout.student_photo_path
+            ),
+        ),
+    ]
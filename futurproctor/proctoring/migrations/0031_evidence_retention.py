@@ -0,0 +1,59 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:47
+
+import proctoring.media_layout
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0030_sharded_media_paths"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exampaper",
+            name="evidence_retention_days",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Days after results are published to keep proctoring evidence (empty: keep it forever)",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentexamattempt",
+            name="evidence_archive",
+            field=models.FileField(
+                blank=True, db_index=True, upload_to="evidence_archives/"
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentexamattempt",
+            name="evidence_purged_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="cheatingaudio",
+            name="audio",
+            field=models.FileField(
+                blank=True,
+                db_index=True,
+                null=True,
+                upload_to=proctoring.media_layout.evidence_audio_path,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cheatingimage",
+            name="image",
+            field=models.ImageField(
+                db_index=True, upload_to=proctoring.media_layout.evidence_image_path
+            ),
+        ),
+        migrations.AlterField(
+            model_name="student",
+            name="photo",
+            field=models.ImageField(
+                db_index=True, upload_to=proctoring.media_layout.student_photo_path
+            ),
+        ),
+    ]
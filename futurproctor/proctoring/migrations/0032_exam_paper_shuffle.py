@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0031_evidence_retention"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exampaper",
+            name="shuffle_options",
+            field=models.BooleanField(
+                default=False,
+                help_text="Show the MCQ options in a different order to each student",
+            ),
+        ),
+        migrations.AddField(
+            model_name="exampaper",
+            name="shuffle_questions",
+            field=models.BooleanField(
+                default=False,
+                help_text="Show the questions in a different order to each student",
+            ),
+        ),
+    ]
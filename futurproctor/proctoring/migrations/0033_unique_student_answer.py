@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    """Keep the latest answer per (attempt, question); a resubmitted form used to add a second set."""
+    StudentAnswer = apps.get_model("proctoring", "StudentAnswer")
+    duplicates = (
+        StudentAnswer.objects.values("attempt_id", "question_id")
+        .annotate(n=Count("id"), keep=Max("id"))
+        .filter(n__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        StudentAnswer.objects.filter(
+            attempt_id=duplicate["attempt_id"], question_id=duplicate["question_id"]
+        ).exclude(id=duplicate["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0032_exam_paper_shuffle"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="studentanswer",
+            constraint=models.UniqueConstraint(
+                fields=("attempt", "question"), name="unique_answer_per_question"
+            ),
+        ),
+    ]
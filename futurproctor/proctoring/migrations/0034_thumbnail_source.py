@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-19 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proctoring", "0033_unique_student_answer"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cheatingimage",
+            name="thumbnail_source",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="student",
+            name="thumbnail_source",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+import mediapipe as mp
+
+mp_face_detection = mp.solutions.face_detection
+mp_face_mesh = mp.solutions.face_mesh
+
+# Width the frame is downscaled to before running the face detector
+DETECT_WIDTH = 320
+
+# How much the tracked face box is grown (on each side, relative to its size)
+# before cropping, so head movement between frames stays inside the crop
+ROI_EXPAND = 0.35
+
+
+class FaceROICascade:
+    """
+    Two-stage face pipeline: a fast short-range face detector on a downscaled
+    frame finds the face, and FaceMesh only runs on an expanded crop around it.
+
+    Once a face is found its box is tracked from the mesh landmarks of the
+    previous frame, so the detector only runs again when tracking is lost.
+    """
+
+    def __init__(self, detect_width=DETECT_WIDTH, expand=ROI_EXPAND, refine_landmarks=True):
+        self.detect_width = detect_width
+        self.expand = expand
+        self.face_detection = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+        self.face_mesh = mp_face_mesh.FaceMesh(
+            static_image_mode=False, max_num_faces=1, refine_landmarks=refine_landmarks, min_detection_confidence=0.5
+        )
+        self.box = None  # Last face box (x0, y0, x1, y1) in full-frame pixels
+
+    def _detect(self, frame):
+        """Run the face detector on a downscaled copy; return a full-frame pixel box or None."""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.detect_width / width)
+        small = cv2.resize(frame, (int(width * scale), int(height * scale))) if scale < 1.0 else frame
+        results = self.face_detection.process(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        if not results.detections:
+            return None
+
+        best = max(results.detections, key=lambda d: d.score[0])
+        rel = best.location_data.relative_bounding_box
+        x0, y0 = rel.xmin * width, rel.ymin * height
+        return x0, y0, x0 + rel.width * width, y0 + rel.height * height
+
+    def _crop_bounds(self, box, frame_shape):
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        pad_x, pad_y = (x1 - x0) * self.expand, (y1 - y0) * self.expand
+        return (
+            max(0, int(x0 - pad_x)), max(0, int(y0 - pad_y)),
+            min(width, int(x1 + pad_x)), min(height, int(y1 + pad_y)),
+        )
+
+    def _mesh_in_crop(self, frame, box):
+        """Run FaceMesh on the crop around `box`; return full-frame normalized points or None."""
+        height, width = frame.shape[:2]
+        cx0, cy0, cx1, cy1 = self._crop_bounds(box, frame.shape)
+        if cx1 - cx0 < 2 or cy1 - cy0 < 2:
+            return None
+
+        crop = cv2.cvtColor(frame[cy0:cy1, cx0:cx1], cv2.COLOR_BGR2RGB)
+        results = self.face_mesh.process(crop)
+        if not results.multi_face_landmarks:
+            return None
+
+        points = np.array([(p.x, p.y) for p in results.multi_face_landmarks[0].landmark])
+        # Map crop-relative coordinates back to the full frame
+        points[:, 0] = (cx0 + points[:, 0] * (cx1 - cx0)) / width
+        points[:, 1] = (cy0 + points[:, 1] * (cy1 - cy0)) / height
+        return points
+
+    def process(self, frame):
+        """
+        Return face landmarks as an (N, 2) array of full-frame normalized
+        coordinates, or None when no face is found.
+        """
+        points = self._mesh_in_crop(frame, self.box) if self.box is not None else None
+
+        if points is None:
+            # Tracking lost (or first frame): fall back to full-frame detection
+            self.box = self._detect(frame)
+            if self.box is None:
+                return None
+            points = self._mesh_in_crop(frame, self.box)
+            if points is None:
+                self.box = None
+                return None
+
+        # Track the face box from this frame's landmarks
+        height, width = frame.shape[:2]
+        x0, y0 = np.clip(points.min(axis=0), 0, 1) * (width, height)
+        x1, y1 = np.clip(points.max(axis=0), 0, 1) * (width, height)
+        self.box = (x0, y0, x1, y1)
+        return points
@@ -11,44 +11,57 @@ mp_face_mesh = mp.solutions.face_mesh
 face_detection = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
 face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1, refine_landmarks=True, min_detection_confidence=0.5)
 
-def detectFace(frame):
+def detectFace(frame, annotate=False):
     """
     Detects faces, landmarks, and alerts on suspicious activities (e.g., multiple faces or suspicious gaze).
-    Returns: faceCount, annotated frame
+    Boxes and landmarks are returned as data (normalized 0-1 coordinates); they are only
+    drawn on the frame when `annotate` is set, as drawing the full mesh is costly.
+    Returns: faceCount, frame (annotated if requested), faces [{'box', 'score', 'landmarks'}]
     """
     # Convert the frame to RGB as required by MediaPipe
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     faceCount = 0
+    faces = []
 
     # Detect faces in the frame
     detection_results = face_detection.process(rgb_frame)
-    annotated_frame = frame.copy()
+    annotated_frame = frame.copy() if annotate else frame
 
     if detection_results.detections:
         faceCount = len(detection_results.detections)
 
-        # Draw bounding boxes and landmarks
         for detection in detection_results.detections:
-            mp_drawing.draw_detection(annotated_frame, detection)
+            rel = detection.location_data.relative_bounding_box
+            faces.append({
+                'box': [rel.xmin, rel.ymin, rel.xmin + rel.width, rel.ymin + rel.height],
+                'score': float(detection.score[0]),
+                'landmarks': None,
+            })
+            if annotate:
+                mp_drawing.draw_detection(annotated_frame, detection)
 
     # Alert for multiple faces
-    if faceCount > 1:
+    if annotate and faceCount > 1:
         cv2.putText(annotated_frame, 'Alert: Multiple Faces Detected!', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
 
     # Detect facial landmarks using Face Mesh
     mesh_results = face_mesh.process(rgb_frame)
     if mesh_results.multi_face_landmarks:
-        for face_landmarks in mesh_results.multi_face_landmarks:
-            # Draw the facial landmarks on the frame
-            mp_drawing.draw_landmarks(
-                image=annotated_frame,
-                landmark_list=face_landmarks,
-                connections=mp_face_mesh.FACEMESH_TESSELATION,
-                landmark_drawing_spec=None,
-                connection_drawing_spec=mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=1, circle_radius=1)
-            )
+        for i, face_landmarks in enumerate(mesh_results.multi_face_landmarks):
+            points = np.array([(lm.x, lm.y) for lm in face_landmarks.landmark])
+            if i < len(faces):
+                faces[i]['landmarks'] = points
+            if annotate:
+                # Draw the facial landmarks on the frame
+                mp_drawing.draw_landmarks(
+                    image=annotated_frame,
+                    landmark_list=face_landmarks,
+                    connections=mp_face_mesh.FACEMESH_TESSELATION,
+                    landmark_drawing_spec=None,
+                    connection_drawing_spec=mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=1, circle_radius=1)
+                )
 
-    return faceCount, annotated_frame
+    return faceCount, annotated_frame, faces
 
 
 # if __name__ == "__main__":
@@ -64,7 +77,7 @@ def detectFace(frame):
 #             print("Error: Unable to fetch frame.")
 #             break
 
-#         faceCount, annotated_frame = detectFace(frame)
+#         faceCount, annotated_frame, _ = detectFace(frame, annotate=True)
 #         cv2.imshow('Facial Detection and Monitoring', annotated_frame)
 
 #         # Quit the application on pressing 'q'
@@ -1,32 +1,59 @@
-import cv2
 import numpy as np
-import mediapipe as mp
 
-# Initialize MediaPipe Face Mesh
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(refine_landmarks=True)
+from .face_roi import FaceROICascade
 
-def gaze_tracking(frame):
-    """Detect gaze direction (left, right, center)."""
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(frame_rgb)
 
-    if results.multi_face_landmarks:
-        for landmarks in results.multi_face_landmarks:
-            # Get left and right eye landmarks
-            left_eye = [landmarks.landmark[33], landmarks.landmark[159]]  # Left eye corners
-            right_eye = [landmarks.landmark[362], landmarks.landmark[386]]  # Right eye corners
+class FaceCascades:
+    """
+    The face cascades of one proctoring session. A cascade tracks the face
+    box from frame to frame and owns its MediaPipe graphs, so sessions
+    (threads) never share one. The variant without iris refinement, used
+    when the node is under load, is built the first time it is needed.
+    """
 
-            # Calculate horizontal gaze direction
-            left_eye_center = np.mean([(p.x, p.y) for p in left_eye], axis=0)
-            right_eye_center = np.mean([(p.x, p.y) for p in right_eye], axis=0)
+    def __init__(self):
+        self.cascades = {}
 
-            gaze_direction = "center"
-            if left_eye_center[0] < 0.4:  # Left threshold
-                gaze_direction = "left"
-            elif right_eye_center[0] > 0.6:  # Right threshold
-                gaze_direction = "right"
+    def get(self, refine_landmarks=True):
+        if refine_landmarks not in self.cascades:
+            self.cascades[refine_landmarks] = FaceROICascade(refine_landmarks=refine_landmarks)
+        return self.cascades[refine_landmarks]
 
-            return {"gaze": gaze_direction}
 
-    return {"gaze": "center"}
\ No newline at end of file
+def landmarks_to_box(points, frame_shape):
+    """Convert normalized face landmarks to a (top, right, bottom, left) pixel box."""
+    height, width = frame_shape[:2]
+    left, top = np.clip(points.min(axis=0), 0, 1) * (width, height)
+    right, bottom = np.clip(points.max(axis=0), 0, 1) * (width, height)
+    return int(top), int(right), int(bottom), int(left)
+
+def gaze_tracking(frame, cascade=None, refine_landmarks=True):
+    """
+    Detect gaze direction (left, right, center).
+    Also returns the face box and landmarks found by the mesh so later
+    stages (identity verification, evidence overlays) don't have to detect
+    the face again.
+    """
+    if cascade is None:
+        # One-off frame: nothing to track from
+        cascade = FaceROICascade(refine_landmarks=refine_landmarks)
+    points = cascade.process(frame)
+
+    if points is not None:
+        # Get left and right eye landmarks
+        left_eye = points[[33, 159]]  # Left eye corners
+        right_eye = points[[362, 386]]  # Right eye corners
+
+        # Calculate horizontal gaze direction
+        left_eye_center = left_eye.mean(axis=0)
+        right_eye_center = right_eye.mean(axis=0)
+
+        gaze_direction = "center"
+        if left_eye_center[0] < 0.4:  # Left threshold
+            gaze_direction = "left"
+        elif right_eye_center[0] > 0.6:  # Right threshold
+            gaze_direction = "right"
+
+        return {"gaze": gaze_direction, "face_box": landmarks_to_box(points, frame.shape), "landmarks": points}
+
+    return {"gaze": "center", "face_box": None, "landmarks": None}
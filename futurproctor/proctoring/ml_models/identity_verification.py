@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+import face_recognition
+
+# Re-verification interval bounds (seconds). The interval grows while checks
+# keep passing and drops back to the minimum as soon as one fails.
+MIN_CHECK_INTERVAL = 5
+MAX_CHECK_INTERVAL = 60
+INTERVAL_BACKOFF = 2
+
+# Consecutive failed checks needed before an identity_mismatch is raised
+MISMATCH_THRESHOLD = 3
+
+# Same tolerance face_recognition.compare_faces uses at login
+MATCH_TOLERANCE = 0.6
+
+
+class IdentityVerifier:
+    """
+    Periodically re-checks that the face in front of the camera belongs to the
+    student who logged in.
+
+    The face box comes from the landmark stage (gaze_tracking), so the costly
+    full-frame HOG detection done at login is skipped; only the encoding of
+    the known face location is computed, and only every few seconds.
+    """
+
+    def __init__(self, stored_encoding):
+        self.stored_encoding = np.asarray(stored_encoding, dtype=np.float64)
+        self.interval = MIN_CHECK_INTERVAL
+        self.next_check = 0.0
+        self.consecutive_failures = 0
+
+    def due(self, now=None):
+        """True when the next check should run"""
+        return (now or time.time()) >= self.next_check
+
+    def check(self, frame, face_box, now=None):
+        """
+        Verify the face inside `face_box` (top, right, bottom, left in pixels).
+        Returns True when the identity_mismatch threshold has just been reached,
+        False otherwise (including when the check was skipped).
+        """
+        now = now or time.time()
+        if face_box is None or not self.due(now):
+            return False
+
+        # The frame is passed as-is, like views.get_face_encoding does at
+        # registration, so both encodings are computed from the same input
+        encodings = face_recognition.face_encodings(frame, known_face_locations=[face_box])
+        if not encodings:
+            # Nothing usable in the box, try again on the next frame
+            return False
+
+        distance = face_recognition.face_distance([self.stored_encoding], encodings[0])[0]
+        if distance <= MATCH_TOLERANCE:
+            self.consecutive_failures = 0
+            self.interval = min(self.interval * INTERVAL_BACKOFF, MAX_CHECK_INTERVAL)
+            self.next_check = now + self.interval
+            return False
+
+        self.consecutive_failures += 1
+        self.interval = MIN_CHECK_INTERVAL
+        self.next_check = now + self.interval
+        return self.consecutive_failures == MISMATCH_THRESHOLD
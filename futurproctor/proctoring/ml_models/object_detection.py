@@ -7,12 +7,22 @@ import logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Initialize the YOLO model
-model = YOLO("yolo11s.pt")  # Replace with your YOLO model file
+MODEL_NAME = "yolo11s.pt"  # Replace with your YOLO model file
+model = YOLO(MODEL_NAME)
+
+# Other model sizes (used by the quality ladder under load) are loaded on first use
+models = {MODEL_NAME: model}
+
+def get_model(model_name):
+    if model_name not in models:
+        models[model_name] = YOLO(model_name)
+    return models[model_name]
 
 # Confidence threshold
 CONFIDENCE_THRESHOLD = 0.5
 
-def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=640):
+def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=640, model_name=MODEL_NAME,
+                 annotate=False):
     """
     Perform object detection on a single frame, focusing on 'cell phone', 'book', and 'person'.
     
@@ -20,14 +30,20 @@ def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=
         frame (ndarray): Input image frame in BGR format.
         confidence_threshold (float): Confidence threshold for object detection.
         resize_width (int): Width to resize the frame for faster processing. Aspect ratio is maintained.
+        model_name (str): YOLO weights to use (smaller models are faster but less accurate).
+        annotate (bool): Draw boxes and labels on the returned frame (for debugging; the
+            proctoring pipeline keeps boxes as data and draws them only for reviewers).
     
     Returns:
         labels_this_frame (list): List of detected labels with their confidence scores.
-        processed_frame (ndarray): Frame with detection results (bounding boxes and labels).
+        processed_frame (ndarray): The resized frame (with boxes and labels if `annotate`).
         person_count (int): Number of detected persons.
         detected_objects (list): List of detected objects ("cell phone", "book", "person").
+        detections (list): (label, score, (x1, y1, x2, y2)) for each detection in pixels of
+            the input frame, for the object tracker and the evidence overlays.
     """
     labels_this_frame = []
+    detections = []
     detected_objects = []  # Track objects of interest (cell phone, book, person)
     person_count = 0
 
@@ -37,21 +53,25 @@ def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=
 
     # Resize the frame to improve processing speed
     height, width = frame.shape[:2]
+    scale = 1.0
     if width > resize_width:
+        scale = width / resize_width
         aspect_ratio = height / width
         frame = cv2.resize(frame, (resize_width, int(resize_width * aspect_ratio)))
 
     try:
         # Perform object detection
-        results = model(frame)
+        yolo = get_model(model_name)
+        results = yolo(frame, imgsz=resize_width)
 
         for result in results:
             for box in result.boxes.data.cpu().numpy():
                 x1, y1, x2, y2, score, class_id = box
 
                 if score > confidence_threshold:  # Apply confidence threshold
-                    label = model.names[int(class_id)]
+                    label = yolo.names[int(class_id)]
                     labels_this_frame.append((label, float(score)))
+                    detections.append((label, float(score), tuple(float(v) * scale for v in (x1, y1, x2, y2))))
 
                     # Check for specific objects (cell phone, book, and person)
                     if label.lower() == "person":
@@ -62,11 +82,12 @@ def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=
                     elif label.lower() == "book":
                         detected_objects.append("book")
 
-                    # Draw bounding box in blue
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
-                    # Draw label and confidence value in red
-                    cv2.putText(frame, f"{label} {score:.2f}", (int(x1), int(y1) - 10), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+                    if annotate:
+                        # Draw bounding box in blue
+                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
+                        # Draw label and confidence value in red
+                        cv2.putText(frame, f"{label} {score:.2f}", (int(x1), int(y1) - 10), 
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
 
         logging.info(f"Detected objects: {labels_this_frame}")
 
@@ -74,7 +95,7 @@ def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=
         logging.error(f"Error during object detection: {e}")
         raise e
 
-    return labels_this_frame, frame, person_count, detected_objects
+    return labels_this_frame, frame, person_count, detected_objects, detections
 
 # # Test the object detection function
 # if __name__ == "__main__":
@@ -94,7 +115,7 @@ def detectObject(frame, confidence_threshold=CONFIDENCE_THRESHOLD, resize_width=
 #             break
 
 #         try:
-#             labels, processed_frame, person_count, detected_objects = detectObject(frame)
+#             labels, processed_frame, person_count, detected_objects, _ = detectObject(frame)
 
 #             # Display alert if two or more persons are detected
 #             if person_count >= 2:
@@ -0,0 +1,176 @@
+import numpy as np
+
+# A track is confirmed after this many matched detections
+MIN_HITS = 3
+# A track is dropped after this many detector runs without a match
+MAX_MISSES = 5
+# Minimum IoU for a detection to be matched to a track
+IOU_THRESHOLD = 0.3
+# While every track is confirmed and nothing changes, the detector runs only
+# every `n` frames, with `n` growing up to this value
+MAX_DETECT_INTERVAL = 4
+
+
+def iou(box_a, box_b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    x1, y1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x2, y2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    if inter == 0:
+        return 0.0
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    return inter / (area_a + area_b - inter)
+
+
+class KalmanBox:
+    """Constant-velocity Kalman filter over a box's centre and size (cx, cy, w, h)."""
+
+    # State: cx, cy, w, h and their velocities
+    F = np.eye(8) + np.eye(8, k=4)
+    H = np.eye(4, 8)
+    Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.01, 0.01])
+    R = np.diag([10.0, 10.0, 10.0, 10.0])
+
+    def __init__(self, box):
+        self.x = np.zeros(8)
+        self.x[:4] = self._to_z(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0, 1000.0])
+
+    @staticmethod
+    def _to_z(box):
+        x1, y1, x2, y2 = box
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+    def predict(self):
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.box()
+
+    def update(self, box):
+        y = self._to_z(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+
+class Track:
+    def __init__(self, track_id, label, score, box):
+        self.id = track_id
+        self.label = label
+        self.score = score
+        self.kalman = KalmanBox(box)
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+
+    @property
+    def box(self):
+        return self.kalman.box()
+
+
+class ObjectTracker:
+    """
+    Lightweight IoU + Kalman tracker over detectObject detections.
+
+    Objects keep a stable track id across frames and are only reported once
+    they have been matched `min_hits` times, so a detection that flickers
+    around the confidence threshold does not raise a new alert every frame.
+    While all tracks are confirmed and stable the detector can be skipped on
+    some frames (see should_detect); tracks are then only predicted.
+    """
+
+    def __init__(self, min_hits=MIN_HITS, max_misses=MAX_MISSES, iou_threshold=IOU_THRESHOLD,
+                 max_detect_interval=MAX_DETECT_INTERVAL):
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.iou_threshold = iou_threshold
+        self.max_detect_interval = max_detect_interval
+        self.tracks = []
+        self.next_id = 1
+        self.detect_interval = 1
+        self.frames_since_detect = 0
+
+    def should_detect(self):
+        """True when the detector should run on this frame."""
+        return self.frames_since_detect + 1 >= self.detect_interval
+
+    def skip(self):
+        """Advance the tracks one frame without running the detector."""
+        self.frames_since_detect += 1
+        for track in self.tracks:
+            track.kalman.predict()
+
+    def update(self, detections):
+        """
+        Feed the detections of one frame as (label, score, (x1, y1, x2, y2)).
+        Returns the tracks that became confirmed on this frame.
+        """
+        self.frames_since_detect = 0
+        for track in self.tracks:
+            track.kalman.predict()
+
+        # Greedy matching by IoU, best pairs first, only within the same label
+        pairs = []
+        for t_idx, track in enumerate(self.tracks):
+            for d_idx, (label, _, box) in enumerate(detections):
+                if label == track.label:
+                    overlap = iou(track.box, box)
+                    if overlap >= self.iou_threshold:
+                        pairs.append((overlap, t_idx, d_idx))
+        pairs.sort(reverse=True)
+
+        matched_tracks, matched_detections = set(), set()
+        newly_confirmed = []
+        for _, t_idx, d_idx in pairs:
+            if t_idx in matched_tracks or d_idx in matched_detections:
+                continue
+            matched_tracks.add(t_idx)
+            matched_detections.add(d_idx)
+            track = self.tracks[t_idx]
+            label, score, box = detections[d_idx]
+            track.kalman.update(box)
+            track.score = score
+            track.hits += 1
+            track.misses = 0
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                newly_confirmed.append(track)
+
+        changed = bool(newly_confirmed)
+        for t_idx, track in enumerate(self.tracks):
+            if t_idx not in matched_tracks:
+                track.misses += 1
+                changed = True
+
+        for d_idx, (label, score, box) in enumerate(detections):
+            if d_idx not in matched_detections:
+                track = Track(self.next_id, label, score, box)
+                self.next_id += 1
+                if self.min_hits <= 1:
+                    track.confirmed = True
+                    newly_confirmed.append(track)
+                self.tracks.append(track)
+                changed = True
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        # Back off the detector only while the scene is stable
+        if changed or any(not track.confirmed for track in self.tracks):
+            self.detect_interval = 1
+        else:
+            self.detect_interval = min(self.detect_interval + 1, self.max_detect_interval)
+
+        return newly_confirmed
+
+    def confirmed(self, label=None):
+        """Confirmed tracks that are still alive, optionally filtered by label."""
+        return [
+            track for track in self.tracks
+            if track.confirmed and (label is None or track.label == label)
+        ]
@@ -0,0 +1,122 @@
+import threading
+import time
+from dataclasses import dataclass
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+    print("Warning: psutil not installed. Load shedding will only react to processing lag.")
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    """One rung of the proctoring quality ladder."""
+    name: str
+    detect_objects: bool = True
+    resize_width: int = 640
+    model_name: str = "yolo11s.pt"
+    track_face: bool = True
+    refine_landmarks: bool = True
+
+
+# Ordered from full coverage down to a bare heartbeat
+QUALITY_LEVELS = [
+    QualityLevel("full"),
+    QualityLevel("reduced_input", resize_width=416, refine_landmarks=False),
+    QualityLevel("small_model", resize_width=416, model_name="yolo11n.pt", refine_landmarks=False),
+    QualityLevel("face_only", detect_objects=False, refine_landmarks=False),
+    QualityLevel("heartbeat_only", detect_objects=False, track_face=False),
+]
+
+# Overload / recovery thresholds
+CPU_HIGH = 85.0
+CPU_LOW = 60.0
+LAG_HIGH = 0.5   # seconds a session spends on one frame (the capture loop budget)
+LAG_LOW = 0.2
+# Minimum time between two steps of the ladder, so it does not oscillate
+STEP_COOLDOWN = 10.0
+
+# Sessions with more risk are kept this many rungs above the node level
+RISK_TIERS = [(3, 2), (1, 1)]  # (events raised >=, rungs of protection)
+
+
+class ProctoringSession:
+    """Load and risk state of one running proctoring session."""
+
+    def __init__(self, risk=0):
+        self.risk = risk
+        self.lag = 0.0
+        self.level_index = 0
+
+    @property
+    def level(self):
+        return QUALITY_LEVELS[self.level_index]
+
+
+class LoadShedder:
+    """
+    Steps every proctoring session on this node down the quality ladder when
+    the node is overloaded (high CPU or sessions lagging behind the frame
+    budget) and back up once load falls.
+
+    The node-wide depth applies in full to low-risk sessions; sessions that
+    have already raised events are protected by one or two rungs, so they are
+    degraded last.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.depth = 0
+        self.last_step = 0.0
+        self.last_cpu = 0.0
+        self.last_cpu_sample = 0.0
+
+    def register(self, risk=0):
+        session = ProctoringSession(risk)
+        with self.lock:
+            self.sessions.add(session)
+        return session
+
+    def unregister(self, session):
+        with self.lock:
+            self.sessions.discard(session)
+
+    def _cpu(self, now):
+        # psutil.cpu_percent(None) is cheap but only meaningful about once a second
+        if psutil is not None and now - self.last_cpu_sample >= 1.0:
+            self.last_cpu = psutil.cpu_percent(interval=None)
+            self.last_cpu_sample = now
+        return self.last_cpu
+
+    def load_summary(self):
+        """Human readable load figures, recorded with each level change."""
+        lag = max((s.lag for s in self.sessions), default=0.0)
+        return f"cpu={self.last_cpu:.0f}% lag={lag:.2f}s sessions={len(self.sessions)}"
+
+    def report(self, session, lag, now=None):
+        """
+        Record how long `session` took on its last frame and return its
+        (possibly changed) quality level.
+        """
+        now = now or time.time()
+        with self.lock:
+            session.lag = lag
+            cpu = self._cpu(now)
+            worst_lag = max((s.lag for s in self.sessions), default=0.0)
+
+            if now - self.last_step >= STEP_COOLDOWN:
+                if (cpu >= CPU_HIGH or worst_lag >= LAG_HIGH) and self.depth < len(QUALITY_LEVELS) - 1:
+                    self.depth += 1
+                    self.last_step = now
+                elif cpu <= CPU_LOW and worst_lag <= LAG_LOW and self.depth > 0:
+                    self.depth -= 1
+                    self.last_step = now
+
+            protection = next((rungs for events, rungs in RISK_TIERS if session.risk >= events), 0)
+            session.level_index = max(0, self.depth - protection)
+            return session.level
+
+
+load_shedder = LoadShedder()
@@ -1,12 +1,15 @@
 # models.py
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, F, Max, Q, Sum
+from django.contrib.postgres.aggregates import BitOr
 from django.contrib.auth.models import User
 from django.utils import timezone
 import pytz
 from django.core.files.base import ContentFile
 from django.utils import timezone
 import pytz
-from datetime import datetime  
+
+from .media_layout import evidence_audio_path, evidence_image_path, student_photo_path
 
 # Define Nepal Time Zone
 NEPAL_TZ = pytz.timezone('Asia/Kathmandu')
@@ -29,9 +32,11 @@ class Student(models.Model):
     name = models.CharField(max_length=255)
     address = models.TextField(null=True, blank=True)
     email = models.EmailField(unique=True)
-    photo = models.ImageField(upload_to='student_photos/')
+    photo = models.ImageField(upload_to=student_photo_path, db_index=True)
+    # Name of the photo its thumbnails were made from (see thumbnails.py)
+    thumbnail_source = models.CharField(max_length=255, blank=True, default='')
     face_encoding = models.JSONField(null=True, blank=True)
-    timestamp = models.DateTimeField(default=datetime.now())
+    timestamp = models.DateTimeField(default=timezone.now)
     feedback = models.TextField(null=True, blank=True, max_length=1000)
     approval_status = models.CharField(max_length=20, choices=APPROVAL_STATUS_CHOICES, default='pending')
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_students')
@@ -45,7 +50,7 @@ class Exam(models.Model):
     exam_name = models.CharField(max_length=255, default='Default Exam Name')
     total_questions = models.IntegerField(null=True, blank=True)
     correct_answers = models.IntegerField(null=True, blank=True)
-    timestamp = models.DateTimeField(default=datetime.now())
+    timestamp = models.DateTimeField(default=timezone.now)
     status = models.CharField(
         max_length=50,
         choices=[('ongoing', 'Ongoing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')],
@@ -63,6 +68,101 @@ class Exam(models.Model):
     def __str__(self):
         return f"{self.exam_name} - {self.student.name}"
 
+class EventCode(models.IntegerChoices):
+    """Proctoring event types, stored as small integers"""
+    OTHER = 0, 'Other'
+    OBJECT_DETECTED = 1, 'Object Detected'
+    MULTIPLE_PERSONS = 2, 'Multiple Persons'
+    GAZE_DETECTED = 3, 'Gaze Away'
+    IDENTITY_MISMATCH = 4, 'Identity Mismatch'
+    AUDIO_DETECTED = 5, 'Suspicious Audio'
+    TAB_SWITCH = 6, 'Tab Switch'
+
+
+# Events that mark the candidate as cheating in the reports
+FLAGGED_EVENT_CODES = [
+    EventCode.OBJECT_DETECTED,
+    EventCode.MULTIPLE_PERSONS,
+    EventCode.TAB_SWITCH,
+    EventCode.IDENTITY_MISMATCH,
+]
+
+
+class ObjectClass(models.IntegerChoices):
+    """Detected object classes, one bit each in CheatingEvent.objects_mask"""
+    PERSON = 1, 'person'
+    CELL_PHONE = 2, 'cell phone'
+    BOOK = 4, 'book'
+
+
+def encode_objects(labels):
+    """Bitmask of the object classes in `labels` (unknown labels are ignored)."""
+    mask = 0
+    for object_class in ObjectClass:
+        if object_class.label in labels:
+            mask |= object_class
+    return mask
+
+
+def decode_objects(mask):
+    """Object class labels set in `mask`."""
+    return [object_class.label for object_class in ObjectClass if mask & object_class]
+
+
+class CheatingEventQuerySet(models.QuerySet):
+    """Aggregations that run in SQL on the integer event code and object bitmask"""
+
+    def flagged(self):
+        return self.filter(event_code__in=FLAGGED_EVENT_CODES)
+
+    def with_object(self, object_class):
+        """Events where `object_class` was detected."""
+        return self.alias(object_bit=F('objects_mask').bitand(int(object_class))).filter(object_bit__gt=0)
+
+    def _objects_mask_aggregates(self):
+        """Aggregates whose values OR together into the combined object mask."""
+        if connections[self.db].vendor == 'postgresql':
+            return {'objects_mask': BitOr('objects_mask')}
+        # No BIT_OR elsewhere (SQLite): the highest value of each bit on its own
+        return {
+            f'object_{object_class.name.lower()}': Max(F('objects_mask').bitand(int(object_class)))
+            for object_class in ObjectClass
+        }
+
+    def objects_mask(self):
+        """Bitwise OR of the object masks of all events, in one query."""
+        aggregates = self._objects_mask_aggregates()
+        values = self.aggregate(**aggregates)
+        return sum(values[name] or 0 for name in aggregates)
+
+    def summary(self):
+        """
+        Combined object mask, tab switch total and number of events (all and
+        flagged), in one query however many events there are.
+        """
+        aggregates = self._objects_mask_aggregates()
+        values = self.aggregate(
+            events=Count('id'),
+            flagged=Count('id', filter=Q(event_code__in=FLAGGED_EVENT_CODES)),
+            tab_switch_count=Sum('tab_switch_count'),
+            **aggregates,
+        )
+        return {
+            'objects_mask': sum(values.pop(name) or 0 for name in aggregates),
+            'events': values['events'],
+            'flagged': values['flagged'],
+            'tab_switch_count': values['tab_switch_count'] or 0,
+        }
+
+    def detected_objects(self):
+        return decode_objects(self.objects_mask())
+
+    def code_counts(self):
+        """{EventCode: number of events}"""
+        rows = self.order_by().values_list('event_code').annotate(n=Count('id'))
+        return {EventCode(code): n for code, n in rows}
+
+
 class CheatingEvent(models.Model):
     student = models.ForeignKey(
         Student,
@@ -71,22 +171,59 @@ class CheatingEvent(models.Model):
         blank=True,
         null=True
     )
+    # The exam attempt the event belongs to (null for the legacy exam page).
+    # exam_paper is denormalized from the attempt for per-exam live views.
+    attempt = models.ForeignKey(
+        'StudentExamAttempt',
+        on_delete=models.CASCADE,
+        related_name='cheating_events',
+        blank=True,
+        null=True
+    )
+    exam_paper = models.ForeignKey(
+        'ExamPaper',
+        on_delete=models.CASCADE,
+        related_name='cheating_events',
+        blank=True,
+        null=True
+    )
     cheating_flag = models.BooleanField(default=False)
-    event_type = models.CharField(max_length=50, blank=True, null=True)
-    # Use a single timestamp field. Here we use Nepal time.
-    timestamp = models.DateTimeField(default=datetime.now())
-    detected_objects = models.JSONField(default=list)
+    event_code = models.PositiveSmallIntegerField(choices=EventCode.choices, default=EventCode.OTHER)
+    # Use a single timestamp field (aware, converted to Nepal time for display)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # ObjectClass bits of every object seen with this event
+    objects_mask = models.PositiveSmallIntegerField(default=0)
     tab_switch_count = models.IntegerField(default=0)
 
+    objects = CheatingEventQuerySet.as_manager()
+
+    @property
+    def detected_objects(self):
+        return decode_objects(self.objects_mask)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['attempt', 'event_code', 'timestamp']),
+            models.Index(fields=['exam_paper', 'timestamp']),
+            models.Index(fields=['exam_paper', 'event_code']),
+        ]
+
 class CheatingImage(models.Model):
     event = models.ForeignKey(CheatingEvent, on_delete=models.CASCADE, related_name='cheating_images')
-    image = models.ImageField(upload_to='cheating_images/')
-    timestamp = models.DateTimeField(default=datetime.now())
+    attempt = models.ForeignKey('StudentExamAttempt', on_delete=models.CASCADE, related_name='cheating_images', blank=True, null=True)
+    image = models.ImageField(upload_to=evidence_image_path, db_index=True)
+    # Name of the image its thumbnails were made from (see thumbnails.py)
+    thumbnail_source = models.CharField(max_length=255, blank=True, default='')
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Detection boxes and face landmarks seen in the frame (see overlays.py);
+    # the image itself is stored without anything drawn on it
+    overlays = models.JSONField(default=dict, blank=True)
 
 class CheatingAudio(models.Model):
     event = models.ForeignKey(CheatingEvent, on_delete=models.CASCADE, related_name='cheating_audios')
-    audio = models.FileField(upload_to='cheating_audios/', blank=True, null=True)
-    timestamp = models.DateTimeField(default=datetime.now())
+    attempt = models.ForeignKey('StudentExamAttempt', on_delete=models.CASCADE, related_name='cheating_audios', blank=True, null=True)
+    audio = models.FileField(upload_to=evidence_audio_path, blank=True, null=True, db_index=True)
+    timestamp = models.DateTimeField(default=timezone.now)
 
 
 
@@ -111,6 +248,12 @@ class ExamPaper(models.Model):
     total_marks = models.IntegerField(default=0, help_text="Total marks for the exam")
     passing_marks = models.IntegerField(default=0, help_text="Minimum marks to pass")
     is_active = models.BooleanField(default=True, help_text="Is exam available for students")
+    evidence_retention_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Days after results are published to keep proctoring evidence (empty: keep it forever)"
+    )
+    shuffle_questions = models.BooleanField(default=False, help_text="Show the questions in a different order to each student")
+    shuffle_options = models.BooleanField(default=False, help_text="Show the MCQ options in a different order to each student")
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_exams')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -175,6 +318,22 @@ class StudentExamAttempt(models.Model):
     total_marks_obtained = models.FloatField(default=0.0)
     percentage = models.FloatField(default=0.0)
     
+    # Incremented with F() expressions by tab_switches.flush
+    tab_switch_count = models.IntegerField(default=0)
+    
+    # Weighted risk of the proctoring events so far, maintained by risk.add_event
+    risk_score = models.FloatField(default=0.0, help_text="Weighted proctoring risk score")
+    
+    # Proctoring coverage: the runtime steps down a quality ladder under load
+    quality_level = models.CharField(max_length=20, default='full', help_text="Current proctoring quality level")
+    quality_log = models.JSONField(default=list, blank=True, help_text="Every quality level change with the load that caused it")
+    
+    # Evidence lifecycle, see retention.py: images and audio are packed into
+    # one archive some time after publication, and deleted per the exam
+    # paper's retention policy
+    evidence_archive = models.FileField(upload_to='evidence_archives/', blank=True, db_index=True)
+    evidence_purged_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -183,6 +342,74 @@ class StudentExamAttempt(models.Model):
 
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['-risk_score']),
+            models.Index(fields=['exam_paper', '-risk_score']),
+        ]
+
+
+class TelemetryEvent(models.Model):
+    """Browser integrity event sent by the exam page in batches"""
+    EVENT_TYPES = [
+        ('visibility_hidden', 'Page Hidden'),
+        ('visibility_visible', 'Page Visible'),
+        ('blur', 'Window Blur'),
+        ('focus', 'Window Focus'),
+        ('fullscreen_exit', 'Fullscreen Exit'),
+        ('copy', 'Copy'),
+        ('cut', 'Cut'),
+        ('paste', 'Paste'),
+        ('context_menu', 'Context Menu'),
+        ('devtools_open', 'Developer Tools Opened'),
+    ]
+    
+    attempt = models.ForeignKey(StudentExamAttempt, on_delete=models.CASCADE, related_name='telemetry_events')
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    client_timestamp = models.DateTimeField(help_text="When the browser observed the event")
+    received_at = models.DateTimeField(auto_now_add=True)
+    detail = models.CharField(max_length=200, blank=True, default='')
+
+    def __str__(self):
+        return f"{self.attempt_id} - {self.event_type} @ {self.client_timestamp}"
+
+    class Meta:
+        ordering = ['client_timestamp']
+        indexes = [
+            models.Index(fields=['attempt', 'client_timestamp']),
+        ]
+
+
+class ProctoringEvent(models.Model):
+    """
+    Append-only log of every detection raised during an attempt.
+    Rows are never updated; once the attempt is finished they are folded
+    into its AttemptTimeline by timeline.compact() and deleted.
+    """
+    attempt = models.ForeignKey(StudentExamAttempt, on_delete=models.CASCADE, related_name='proctoring_events')
+    event_code = models.PositiveSmallIntegerField(choices=EventCode.choices, default=EventCode.OTHER)
+    timestamp = models.DateTimeField(default=timezone.now)
+    confidence = models.FloatField(default=1.0)
+
+    def __str__(self):
+        return f"{self.attempt_id} - {self.get_event_code_display()} @ {self.timestamp}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['attempt', 'timestamp']),
+        ]
+
+
+class AttemptTimeline(models.Model):
+    """Compacted event timeline of a finished attempt, stored as one NumPy blob"""
+    attempt = models.OneToOneField(StudentExamAttempt, on_delete=models.CASCADE, related_name='timeline')
+    data = models.BinaryField(help_text="np.savez_compressed arrays: time, code, confidence")
+    event_count = models.IntegerField(default=0)
+    first_event_at = models.DateTimeField(null=True, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+    compacted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Timeline of attempt {self.attempt_id} ({self.event_count} events)"
 
 
 class StudentAnswer(models.Model):
@@ -209,6 +436,12 @@ class StudentAnswer(models.Model):
     def __str__(self):
         return f"{self.attempt.student.name} - {self.question.question_text[:30]}"
 
+    class Meta:
+        constraints = [
+            # One answer per question: autosaves upsert on it (see answers.py)
+            models.UniqueConstraint(fields=['attempt', 'question'], name='unique_answer_per_question'),
+        ]
+
 
 class Result(models.Model):
     """Published exam results"""
@@ -0,0 +1,111 @@
+# overlays.py - Detection overlays for evidence images
+#
+# The proctoring loop no longer draws on frames. Evidence images are saved
+# as captured, and the boxes and face landmarks seen in the frame are kept as
+# data on the CheatingImage (normalized 0-1 coordinates, so they fit the
+# image at any size). Overlays are drawn only when a reviewer opens an image;
+# the drawn copy is cached next to the original as <name>_overlay.jpg.
+import io
+import os
+
+import numpy as np
+from django.core.files.base import ContentFile
+from PIL import Image, ImageDraw
+
+BOX_COLOURS = {
+    'person': (52, 152, 219),
+    'cell phone': (231, 76, 60),
+    'book': (241, 196, 15),
+}
+DEFAULT_BOX_COLOUR = (155, 89, 182)
+FACE_COLOUR = (46, 204, 113)
+
+JPEG_QUALITY = 85
+
+# Decimal places kept for normalized coordinates (sub-pixel at 4K)
+PRECISION = 4
+
+
+def _normalize_box(box, width, height):
+    x1, y1, x2, y2 = box
+    return [round(float(x1) / width, PRECISION), round(float(y1) / height, PRECISION),
+            round(float(x2) / width, PRECISION), round(float(y2) / height, PRECISION)]
+
+
+def frame_overlays(frame_shape, tracks=(), face_box=None, landmarks=None):
+    """
+    Overlay data for one frame: object tracks (ObjectTracker tracks, boxes in
+    frame pixels), the face box as (top, right, bottom, left) pixels and the
+    normalized (N, 2) face landmarks, as stored in CheatingImage.overlays.
+    """
+    height, width = frame_shape[:2]
+    data = {
+        'boxes': [
+            {'label': track.label, 'score': round(float(track.score), 3), 'box': _normalize_box(track.box, width, height)}
+            for track in tracks
+        ],
+    }
+    if face_box is not None:
+        top, right, bottom, left = face_box
+        data['face_box'] = _normalize_box((left, top, right, bottom), width, height)
+    if landmarks is not None:
+        data['landmarks'] = np.round(np.asarray(landmarks, dtype=float), PRECISION).tolist()
+    return data
+
+
+def overlay_name(name):
+    root, _ = os.path.splitext(name)
+    return f"{root}_overlay.jpg"
+
+
+def draw(image, overlays):
+    """Draw the overlays on a PIL image (in place) and return it."""
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+    line = max(2, width // 320)
+
+    def pixels(box):
+        return [box[0] * width, box[1] * height, box[2] * width, box[3] * height]
+
+    for box in overlays.get('boxes', []):
+        colour = BOX_COLOURS.get(box['label'], DEFAULT_BOX_COLOUR)
+        x1, y1, x2, y2 = pixels(box['box'])
+        draw.rectangle([x1, y1, x2, y2], outline=colour, width=line)
+        draw.text((x1 + line, max(0, y1 - 12)), f"{box['label']} {box['score']:.2f}", fill=colour)
+
+    if overlays.get('face_box'):
+        draw.rectangle(pixels(overlays['face_box']), outline=FACE_COLOUR, width=line)
+
+    # Landmarks as points rather than the full mesh tessellation
+    radius = max(1, width // 640)
+    for x, y in overlays.get('landmarks', []):
+        cx, cy = x * width, y * height
+        draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=FACE_COLOUR)
+    return image
+
+
+def render(cheating_image):
+    """JPEG bytes of the evidence image with its overlays drawn."""
+    with cheating_image.image.open('rb') as f:
+        image = Image.open(f).convert('RGB')
+    draw(image, cheating_image.overlays)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def overlay_url(cheating_image):
+    """
+    URL of the image with its overlays drawn, rendering and caching it on
+    first use. Images saved without overlay data are served as they are.
+    """
+    if not cheating_image.overlays:
+        return cheating_image.image.url
+    storage = cheating_image.image.storage
+    name = overlay_name(cheating_image.image.name)
+    if not storage.exists(name):
+        data = render(cheating_image)
+        # Another request may have rendered it meanwhile; keep one copy under the fixed name
+        if not storage.exists(name):
+            storage.save(name, ContentFile(data))
+    return storage.url(name)
@@ -0,0 +1,165 @@
+# paper_snapshots.py - Compiled, cached exam papers for take_exam
+#
+# Every candidate sees the same paper, so it is compiled once into a
+# snapshot: the paper's settings and questions, serialized to JSON and stored
+# in the shared cache under a version number. signals.py bumps the version
+# when a question or the paper is saved or deleted, so a snapshot is never
+# changed, only replaced. Each process also keeps the decoded snapshots it
+# has used for up to LOCAL_TTL seconds, so a page load costs one cache read
+# for the version and no database query.
+#
+# Invalidation only reaches other workers through a shared cache backend
+# (Redis, Memcached; see CACHES in settings.py). With the default per-process
+# LocMemCache an edit shows up in the other workers after SNAPSHOT_TIMEOUT,
+# when their version key expires and the paper is compiled again.
+#
+# Question and option order are shuffled per candidate (when the paper asks
+# for it) from a seed derived from the attempt, so a reload shows the same
+# order. Option values stay the original letters, so grading is unaffected.
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ExamPaper
+
+# Safety net for writes that send no signals (update(), bulk_create())
+SNAPSHOT_TIMEOUT = 3600
+
+# Decoded snapshots kept per process, and for how long
+LOCAL_SNAPSHOTS = 64
+LOCAL_TTL = 60  # seconds
+
+OPTION_LETTERS = ['A', 'B', 'C', 'D']
+
+
+def _version_key(exam_paper_id):
+    return f"exam_paper_snapshot:{exam_paper_id}:version"
+
+
+def _snapshot_key(exam_paper_id, version):
+    return f"exam_paper_snapshot:{exam_paper_id}:{version}"
+
+
+def _version(exam_paper_id):
+    version = cache.get(_version_key(exam_paper_id))
+    if version is None:
+        # Seeded from the clock so a lost or expired version key never brings
+        # back an old snapshot. It expires with the snapshots, which bounds
+        # staleness where the cache is not shared.
+        cache.add(_version_key(exam_paper_id), int(time.time() * 1000), timeout=SNAPSHOT_TIMEOUT)
+        version = cache.get(_version_key(exam_paper_id))
+    return version
+
+
+def invalidate(exam_paper_id):
+    """Retire the paper's snapshot (called from the model signals)."""
+    try:
+        cache.incr(_version_key(exam_paper_id))
+    except ValueError:
+        cache.add(_version_key(exam_paper_id), int(time.time() * 1000), timeout=SNAPSHOT_TIMEOUT)
+
+
+def compile_paper(exam_paper_id, version):
+    """The snapshot of a paper as stored in the cache: two queries."""
+    exam_paper = ExamPaper.objects.get(id=exam_paper_id)
+    questions = exam_paper.questions.order_by('order', 'id').values(
+        'id', 'question_text', 'question_type', 'marks',
+        'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer',
+    )
+    return {
+        'exam_paper_id': exam_paper.id,
+        'version': version,
+        'duration_minutes': exam_paper.duration_minutes,
+        'shuffle_questions': exam_paper.shuffle_questions,
+        'shuffle_options': exam_paper.shuffle_options,
+        'questions': [
+            {
+                'id': q['id'],
+                'text': q['question_text'],
+                'type': q['question_type'],
+                'marks': q['marks'],
+                'options': [
+                    [letter, q[f'option_{letter.lower()}']] for letter in OPTION_LETTERS
+                ] if q['question_type'] == 'mcq' else [],
+                'correct_answer': q['correct_answer'],
+            }
+            for q in questions
+        ],
+    }
+
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+# One compile at a time per process, so a burst of first loads queries once
+_compile_lock = threading.Lock()
+
+
+def _remember(key, snapshot):
+    with _local_lock:
+        _local[key] = (snapshot, time.monotonic() + LOCAL_TTL)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_SNAPSHOTS:
+            _local.popitem(last=False)
+
+
+def get(exam_paper_id):
+    """The current snapshot of the paper. Treat it as read-only: it is shared by every request."""
+    version = _version(exam_paper_id)
+    key = (exam_paper_id, version)
+    snapshot, expires = _local.get(key, (None, 0))
+    if snapshot is not None and expires > time.monotonic():
+        return snapshot
+
+    payload = cache.get(_snapshot_key(exam_paper_id, version))
+    if payload is None:
+        with _compile_lock:
+            payload = cache.get(_snapshot_key(exam_paper_id, version))
+            if payload is None:
+                payload = json.dumps(compile_paper(exam_paper_id, version))
+                cache.set(_snapshot_key(exam_paper_id, version), payload, timeout=SNAPSHOT_TIMEOUT)
+    snapshot = json.loads(payload)
+    _remember(key, snapshot)
+    return snapshot
+
+
+def _seed(attempt_id):
+    # Keyed with SECRET_KEY so a candidate cannot work out another's order
+    digest = hashlib.sha256(f"{settings.SECRET_KEY}:attempt:{attempt_id}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def for_attempt(attempt):
+    """
+    The questions as shown to one candidate: shuffled from the attempt's seed
+    when the paper asks for it, without correct answers. Options are
+    relabelled A-D in the order shown; their values are the original letters.
+    """
+    snapshot = get(attempt.exam_paper_id)
+    rng = random.Random(_seed(attempt.id))
+
+    questions = list(snapshot['questions'])
+    if snapshot['shuffle_questions']:
+        rng.shuffle(questions)
+
+    shown = []
+    for question in questions:
+        options = list(question['options'])
+        if snapshot['shuffle_options']:
+            rng.shuffle(options)
+        shown.append({
+            'id': question['id'],
+            'text': question['text'],
+            'type': question['type'],
+            'marks': question['marks'],
+            'options': [
+                {'label': label, 'value': value, 'text': text}
+                for label, (value, text) in zip(OPTION_LETTERS, options)
+            ],
+        })
+    return shown
@@ -0,0 +1,26 @@
+# process_pools.py - Process pools for CPU-bound batch jobs
+#
+# Workers are always started with the 'spawn' method. The pools are opened
+# from background threads of the web process, and a child forked from a
+# process with running threads can inherit locks (the database connection's,
+# logging's) that no thread in it will ever release. Spawned workers import
+# the project afresh, set Django up in the initializer and open their own
+# database connections.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+def init_worker():
+    """Configure Django in a pool worker"""
+    django.setup()
+
+
+def process_pool(workers=None):
+    """A ProcessPoolExecutor of `workers` spawned processes (None: one per CPU) with Django set up."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
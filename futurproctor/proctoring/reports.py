@@ -0,0 +1,300 @@
+# reports.py - Background PDF report generation with an on-disk cache
+#
+# PDFs are rendered by a small pool of worker threads instead of inside the
+# request. Each PDF is cached on disk under a version derived from the
+# student's (or attempt's) latest events, so a report is only rendered again
+# once something new has been recorded. Evidence images are downscaled and
+# embedded as data URIs, keeping the PDFs small and fast to render.
+import base64
+import glob
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q, Sum
+from django.template.loader import get_template
+from PIL import Image
+
+from .models import CheatingAudio, CheatingEvent, CheatingImage, Exam, Student, StudentExamAttempt, decode_objects
+from .thumbnails import thumbnail_url
+from .worker_threads import WorkerQueue
+
+try:
+    from xhtml2pdf import pisa
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+    print("Warning: xhtml2pdf not installed. PDF download feature will be disabled.")
+
+logger = logging.getLogger(__name__)
+
+# Generated PDFs live outside MEDIA_ROOT so they are only served through the views
+REPORT_CACHE_DIR = getattr(settings, 'REPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'report_cache'))
+
+# Number of threads rendering PDFs
+REPORT_WORKERS = 2
+
+# Longest side of an evidence image embedded in a PDF
+PDF_IMAGE_SIZE = 480
+
+# How long a job status is remembered
+JOB_STATUS_TIMEOUT = 60 * 60
+
+QUEUED, RUNNING, READY, FAILED = 'queued', 'running', 'ready', 'failed'
+
+
+def _events(student_id, attempt_id=None):
+    events = CheatingEvent.objects.filter(student_id=student_id)
+    if attempt_id:
+        events = events.filter(attempt_id=attempt_id)
+    return events
+
+
+def _attempt_details(attempts, *keys):
+    return attempts.values(
+        *keys,
+        exam_name=F('exam_paper__title'),
+        percentage_score=F('percentage'),
+        marks=F('total_marks_obtained'),
+        total_marks=F('exam_paper__total_marks'),
+    ).annotate(
+        total_questions=Count('exam_paper__questions', distinct=True),
+        correct_answers=Count('answers', filter=Q(answers__is_correct=True), distinct=True),
+    )
+
+
+def exam_details(student_id, attempt_id=None):
+    """
+    The exam part of the report as a dict (exam_name, total_questions,
+    correct_answers, percentage_score, marks, total_marks), or None. A
+    report for one attempt shows that attempt's paper and marks; a student
+    report the legacy Exam record. One query either way.
+    """
+    if attempt_id:
+        attempts = StudentExamAttempt.objects.filter(id=attempt_id, student_id=student_id)
+        return _attempt_details(attempts).order_by('id').first()
+    return Exam.objects.filter(student_id=student_id).order_by('id').values(
+        'exam_name', 'total_questions', 'correct_answers', 'percentage_score'
+    ).first()
+
+
+EVENT_STATE = {'count': Count('id'), 'last': Max('timestamp'), 'tabs': Sum('tab_switch_count'), 'objects': Sum('objects_mask')}
+EVIDENCE_STATE = {'count': Count('id'), 'last': Max('id')}
+
+
+def _version(events, images, audio, exam):
+    state = repr((sorted(events.items()), sorted(images.items()), sorted(audio.items()), sorted((exam or {}).items())))
+    return hashlib.sha1(state.encode()).hexdigest()[:16]
+
+
+def report_version(student_id, attempt_id=None):
+    """
+    Short hash of everything the report shows that can change: the events,
+    their images and audio and the exam details and score. A new event means a new version.
+    """
+    return _version(
+        _events(student_id, attempt_id).aggregate(**EVENT_STATE),
+        CheatingImage.objects.filter(event__in=_events(student_id, attempt_id)).aggregate(**EVIDENCE_STATE),
+        CheatingAudio.objects.filter(event__in=_events(student_id, attempt_id)).aggregate(**EVIDENCE_STATE),
+        exam_details(student_id, attempt_id),
+    )
+
+
+def _grouped(rows, student_key, attempt_key):
+    """{(student id, attempt id): aggregates} from rows grouped by student and attempt."""
+    return {(row.pop(student_key), row.pop(attempt_key)): row for row in rows.order_by()}
+
+
+def report_versions(attempts):
+    """
+    {attempt id: report_version(attempt.student_id, attempt.id)} for a list
+    of attempts, in four grouped queries instead of four per attempt.
+    """
+    ids = [attempt.id for attempt in attempts]
+    events = _grouped(
+        CheatingEvent.objects.filter(attempt_id__in=ids).values('student_id', 'attempt_id').annotate(**EVENT_STATE),
+        'student_id', 'attempt_id',
+    )
+    evidence = [
+        _grouped(
+            model.objects.filter(event__attempt_id__in=ids)
+            .values('event__student_id', 'event__attempt_id').annotate(**EVIDENCE_STATE),
+            'event__student_id', 'event__attempt_id',
+        )
+        for model in (CheatingImage, CheatingAudio)
+    ]
+    exams = _grouped(
+        _attempt_details(StudentExamAttempt.objects.filter(id__in=ids), 'student_id', 'id'), 'student_id', 'id'
+    )
+
+    # What aggregate() returns for no rows
+    no_events = {name: None for name in EVENT_STATE} | {'count': 0}
+    no_evidence = {name: None for name in EVIDENCE_STATE} | {'count': 0}
+    versions = {}
+    for attempt in attempts:
+        key = (attempt.student_id, attempt.id)
+        versions[attempt.id] = _version(
+            events.get(key, no_events),
+            evidence[0].get(key, no_evidence),
+            evidence[1].get(key, no_evidence),
+            exams.get(key),
+        )
+    return versions
+
+
+def report_path(student_id, attempt_id, version):
+    return os.path.join(REPORT_CACHE_DIR, f"report_{student_id}_{attempt_id or 0}_{version}.pdf")
+
+
+def _downscaled_data_uri(image_field):
+    """Open an evidence image, shrink it and return it as a JPEG data URI."""
+    with image_field.open('rb') as f:
+        image = Image.open(f)
+        image.thumbnail((PDF_IMAGE_SIZE, PDF_IMAGE_SIZE))
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, format='JPEG', quality=70)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_report_context(student, attempt_id=None, embed_images=False):
+    """
+    Context for report_page.html, shared by the report page and the PDF.
+    Takes a fixed number of queries however many events there are: the
+    exam, one aggregate over the events, the images (with their event) and
+    the audio clips. Pages get the evidence thumbnails; with `embed_images`
+    the images are downscaled and embedded as data URIs instead, as the PDF
+    renderer cannot fetch media URLs.
+    """
+    exam = exam_details(student.id, attempt_id)
+
+    # Detected objects (bitwise OR of the object masks), flags and tab switches in SQL
+    summary = _events(student.id, attempt_id).summary()
+    detected_objects_list = decode_objects(summary['objects_mask'])
+    detected_objects_str = ", ".join(detected_objects_list) if detected_objects_list else "No objects detected"
+
+    evidence_filter = {'event__student_id': student.id}
+    if attempt_id:
+        evidence_filter['event__attempt_id'] = attempt_id
+
+    cheating_images = []
+    images = (
+        CheatingImage.objects.filter(**evidence_filter)
+        .select_related('event')
+        .only('image', 'thumbnail_source', 'timestamp', 'event__event_code')
+        .order_by('timestamp', 'id')
+    )
+    for img in images:
+        if embed_images:
+            try:
+                url = _downscaled_data_uri(img.image)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable evidence image {img.id}: {e}")
+                continue
+            full_url = None
+        else:
+            url, full_url = thumbnail_url(img.image, 'medium'), img.image.url
+        cheating_images.append({
+            'url': url,
+            'full_url': full_url,
+            'event_type': img.event.get_event_code_display(),
+            'timestamp': img.timestamp,
+        })
+
+    # Audio cannot be played from a PDF; it still lists the clips so reviewers know they exist
+    cheating_audios = CheatingAudio.objects.filter(**evidence_filter).only('audio')
+    audio_urls = [audio.audio.url for audio in cheating_audios if audio.audio]
+
+    student_photo_url = None
+    if embed_images and student.photo:
+        try:
+            student_photo_url = _downscaled_data_uri(student.photo)
+        except (OSError, ValueError):
+            pass
+
+    return {
+        'student': student,
+        'attempt_id': attempt_id,
+        'student_photo_url': student_photo_url,
+        'exam': exam,
+        'detected_objects': detected_objects_str,
+        'total_tab_switch_count': summary['tab_switch_count'],
+        'correct_answers': exam['correct_answers'] if exam else None,
+        'total_questions': exam['total_questions'] if exam else None,
+        'cheating_status': summary['flagged'] > 0,
+        'cheating_images': cheating_images,
+        'audio_urls': audio_urls,
+    }
+
+
+def render_pdf(student_id, attempt_id, version):
+    """Render the report and store it in the cache directory under `version`."""
+    student = Student.objects.get(id=student_id)
+    html = get_template('report_page.html').render(build_report_context(student, attempt_id, embed_images=True))
+
+    path = report_path(student_id, attempt_id, version)
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pisa_status = pisa.CreatePDF(html, dest=f)
+    if pisa_status.err:
+        os.remove(tmp_path)
+        raise RuntimeError(f"xhtml2pdf reported {pisa_status.err} errors")
+    os.replace(tmp_path, path)
+
+    # Older versions of this report are never served again
+    for old in glob.glob(report_path(student_id, attempt_id, '*')):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+
+def _job_key(student_id, attempt_id, version):
+    return f"report_job:{student_id}:{attempt_id or 0}:{version}"
+
+
+def _render_job(job):
+    student_id, attempt_id, version = job
+    key = _job_key(student_id, attempt_id, version)
+    cache.set(key, RUNNING, timeout=JOB_STATUS_TIMEOUT)
+    try:
+        render_pdf(student_id, attempt_id, version)
+        cache.set(key, READY, timeout=JOB_STATUS_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error generating report for student {student_id}: {e}")
+        cache.set(key, FAILED, timeout=JOB_STATUS_TIMEOUT)
+
+
+class ReportJobQueue(WorkerQueue):
+    """FIFO queue of report jobs processed by REPORT_WORKERS daemon threads."""
+
+    def __init__(self, workers=REPORT_WORKERS):
+        super().__init__(_render_job, 'report queue', workers=workers)
+
+    def submit(self, student_id, attempt_id, version):
+        """Queue a report unless the same version is already queued or rendering. Returns its status."""
+        key = _job_key(student_id, attempt_id, version)
+        if cache.get(key) in (READY, FAILED):
+            # Only called when the PDF is missing: retry failures and re-render removed files
+            cache.delete(key)
+        if cache.add(key, QUEUED, timeout=JOB_STATUS_TIMEOUT):
+            super().submit((student_id, attempt_id, version))
+        return cache.get(key, QUEUED)
+
+
+def report_status(student_id, attempt_id, version):
+    """READY when the PDF for this version is on disk, else the job status (None if never queued)."""
+    if os.path.exists(report_path(student_id, attempt_id, version)):
+        return READY
+    status = cache.get(_job_key(student_id, attempt_id, version))
+    # A job marked ready whose file has since been replaced must run again
+    return None if status == READY else status
+
+
+report_jobs = ReportJobQueue()
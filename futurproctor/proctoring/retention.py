@@ -0,0 +1,322 @@
+# retention.py - Evidence archival, retention and orphaned media cleanup
+#
+# Batch jobs, run from cron through management commands:
+#
+# - archive_evidence: once reviewers are done with a published result, the
+#   attempt's evidence images and audio are packed into one zip with a
+#   manifest of what each file was, and the loose files and rows are removed.
+# - apply_evidence_retention: exam papers with evidence_retention_days delete
+#   their attempts' evidence, archive included, that many days after the
+#   result was published. Proctoring events (and so report summaries) stay.
+# - sweep_orphan_media: files no row refers to any more (interrupted uploads,
+#   rows deleted before files were cleaned up with them) are removed.
+#
+# Rows are read in keyset pages and storage one directory at a time (the
+# layout in media_layout.py keeps directories small), so memory stays
+# bounded however many files there are. Deleting a row deletes its files
+# through the post_delete receivers in signals.py.
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import contact_sheets
+from .models import CheatingAudio, CheatingImage, ExamPaper, Student, StudentExamAttempt
+from .overlays import overlay_name
+from .thumbnails import SIZES, thumbnail_name
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+# Names per `__in` lookup when checking a directory listing against the database
+LOOKUP_SIZE = 500
+
+ARCHIVE_DIR = 'evidence_archives'
+# Archives are built in memory up to this size, then in a temporary file
+SPOOL_SIZE = 16 * 1024 * 1024
+COPY_BUFFER = 64 * 1024
+# Already compressed formats are stored in the archive as they are
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# Files younger than this are never swept: their row may not be committed yet
+ORPHAN_MIN_AGE = timedelta(hours=24)
+
+# Directory swept -> the model field that refers to its files
+FILE_FIELDS = {
+    'student_photos': (Student, 'photo'),
+    'cheating_images': (CheatingImage, 'image'),
+    'cheating_audios': (CheatingAudio, 'audio'),
+    ARCHIVE_DIR: (StudentExamAttempt, 'evidence_archive'),
+}
+
+DERIVED_SUFFIXES = tuple(f"_{px}.webp" for px in SIZES.values()) + ('_overlay.jpg',)
+
+CONTACT_SHEET_FILE = re.compile(r'^attempt_(\d+)(?:_\d+)?\.(?:jpg|json)$')
+
+
+def derived_names(name):
+    """Thumbnails and the overlay made from a stored file (named after it)."""
+    return [thumbnail_name(name, size) for size in SIZES] + [overlay_name(name)]
+
+
+def delete_stored(storage, name):
+    """Delete a stored file and whatever was derived from it."""
+    for target in [name] + derived_names(name):
+        if storage.exists(target):
+            storage.delete(target)
+
+
+def _keyset(queryset, batch_size=BATCH_SIZE):
+    """Rows of `queryset` in id order, fetched one page at a time."""
+    last_id = 0
+    while True:
+        page = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not page:
+            return
+        yield from page
+        last_id = page[-1].id
+
+
+def _has_evidence():
+    return (
+        Exists(CheatingImage.objects.filter(attempt=OuterRef('pk')))
+        | Exists(CheatingAudio.objects.filter(attempt=OuterRef('pk')))
+    )
+
+
+# Archival
+
+def archive_name(attempt):
+    when = attempt.submitted_at or attempt.started_at
+    return f"{ARCHIVE_DIR}/{when:%Y/%m}/attempt_{attempt.id}.zip"
+
+
+def archivable_attempts(after_days):
+    """Attempts whose result was published at least `after_days` ago and that still have loose evidence."""
+    cutoff = timezone.now() - timedelta(days=after_days)
+    return StudentExamAttempt.objects.filter(
+        result__published=True, result__published_at__lte=cutoff, evidence_archive='',
+    ).filter(_has_evidence())
+
+
+def _add_member(archive, member, field_file, when):
+    info = zipfile.ZipInfo(member, date_time=timezone.localtime(when).timetuple()[:6])
+    extension = os.path.splitext(member)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    with field_file.open('rb') as source, archive.open(info, 'w') as target:
+        shutil.copyfileobj(source, target, COPY_BUFFER)
+
+
+def archive_attempt(attempt, storage=default_storage):
+    """
+    Pack the attempt's evidence into one zip and remove the loose files.
+    Files already missing are listed in the manifest as such. Returns the
+    archive's storage name.
+    """
+    sources = [
+        ('image', CheatingImage.objects.filter(attempt=attempt).select_related('event')
+            .only('id', 'image', 'timestamp', 'overlays', 'event__event_code')),
+        ('audio', CheatingAudio.objects.filter(attempt=attempt).select_related('event')
+            .only('id', 'audio', 'timestamp', 'event__event_code')),
+    ]
+    manifest = {
+        'attempt_id': attempt.id,
+        'student_id': attempt.student_id,
+        'exam_paper_id': attempt.exam_paper_id,
+        'archived_at': timezone.now().isoformat(),
+        'files': [],
+    }
+    archived = {'image': [], 'audio': []}
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as buffer:
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for kind, rows in sources:
+                for row in _keyset(rows):
+                    field_file = getattr(row, kind)
+                    entry = {
+                        'kind': kind,
+                        'id': row.id,
+                        'event': row.event.get_event_code_display(),
+                        'timestamp': row.timestamp.isoformat(),
+                        'original_name': field_file.name,
+                    }
+                    if kind == 'image':
+                        entry['overlays'] = row.overlays
+                    member = f"{kind}s/{row.id}{os.path.splitext(field_file.name)[1].lower()}"
+                    try:
+                        _add_member(archive, member, field_file, row.timestamp)
+                        entry['member'] = member
+                    except (FileNotFoundError, ValueError):
+                        entry['missing'] = True
+                    manifest['files'].append(entry)
+                    archived[kind].append(row.id)
+            archive.writestr('manifest.json', json.dumps(manifest, indent=1))
+        buffer.seek(0)
+        name = storage.save(archive_name(attempt), File(buffer))
+
+    with transaction.atomic():
+        StudentExamAttempt.objects.filter(id=attempt.id).update(evidence_archive=name)
+        # Only what went into the archive; the files go once this commits
+        CheatingImage.objects.filter(id__in=archived['image']).delete()
+        CheatingAudio.objects.filter(id__in=archived['audio']).delete()
+        transaction.on_commit(lambda: contact_sheets.reset(attempt.id))
+    logger.info(f"Archived {len(manifest['files'])} evidence files of attempt {attempt.id} to {name}")
+    return name
+
+
+def archive_published(after_days, limit=None, storage=default_storage):
+    """Archive the evidence of every attempt published `after_days` ago. Returns (archived, failed)."""
+    archived = failed = 0
+    for attempt in _keyset(archivable_attempts(after_days)):
+        if limit and archived + failed >= limit:
+            break
+        try:
+            archive_attempt(attempt, storage)
+            archived += 1
+        except Exception as e:
+            failed += 1
+            logger.error(f"Error archiving evidence of attempt {attempt.id}: {e}")
+    return archived, failed
+
+
+# Retention
+
+def expired_attempts(exam_paper, now=None):
+    """Attempts of the paper whose evidence is past its retention period and not deleted yet."""
+    cutoff = (now or timezone.now()) - timedelta(days=exam_paper.evidence_retention_days)
+    return exam_paper.attempts.filter(
+        result__published=True, result__published_at__lte=cutoff, evidence_purged_at__isnull=True,
+    )
+
+
+def purge_attempt(attempt, storage=default_storage):
+    """Delete the attempt's evidence files, loose and archived."""
+    archive = attempt.evidence_archive.name
+    with transaction.atomic():
+        CheatingImage.objects.filter(attempt=attempt).delete()
+        CheatingAudio.objects.filter(attempt=attempt).delete()
+        StudentExamAttempt.objects.filter(id=attempt.id).update(
+            evidence_archive='', evidence_purged_at=timezone.now(),
+        )
+        if archive:
+            transaction.on_commit(lambda: delete_stored(storage, archive))
+        transaction.on_commit(lambda: contact_sheets.reset(attempt.id))
+
+
+def apply_retention(limit=None, storage=default_storage):
+    """Delete the evidence of every attempt past its exam paper's retention period. Returns (purged, failed)."""
+    purged = failed = 0
+    now = timezone.now()
+    for exam_paper in ExamPaper.objects.filter(evidence_retention_days__isnull=False):
+        attempts = expired_attempts(exam_paper, now).only('id', 'evidence_archive')
+        for attempt in _keyset(attempts):
+            if limit and purged + failed >= limit:
+                return purged, failed
+            try:
+                purge_attempt(attempt, storage)
+                purged += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error deleting evidence of attempt {attempt.id}: {e}")
+    return purged, failed
+
+
+# Orphaned files
+
+def walk(storage, directory):
+    """(directory, file names) for `directory` and every directory below it, one listing at a time."""
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    yield directory, files
+    for name in sorted(directories):
+        yield from walk(storage, f"{directory}/{name}")
+
+
+def _derived_root(name):
+    for suffix in DERIVED_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+def _referenced(model, field, names):
+    """The subset of `names` some row of `model` refers to."""
+    names = sorted(names)
+    referenced = set()
+    for start in range(0, len(names), LOOKUP_SIZE):
+        chunk = names[start:start + LOOKUP_SIZE]
+        referenced.update(model.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return referenced
+
+
+def orphans_in(directory, files, model, field):
+    """Files of one directory listing that no row refers to, directly or as the original of a derived file."""
+    names = {f"{directory}/{name}" for name in files}
+    derived = {name for name in names if _derived_root(name) is not None}
+    originals = names - derived
+    referenced = _referenced(model, field, originals)
+    kept_roots = {os.path.splitext(name)[0] for name in referenced}
+    return (originals - referenced) | {name for name in derived if _derived_root(name) not in kept_roots}
+
+
+def contact_sheet_orphans(files):
+    """Contact sheets and indexes of attempts that no longer exist."""
+    attempt_ids = {}
+    for name in files:
+        match = CONTACT_SHEET_FILE.match(name)
+        if match:
+            attempt_ids.setdefault(int(match.group(1)), []).append(name)
+    existing = set()
+    ids = sorted(attempt_ids)
+    for start in range(0, len(ids), LOOKUP_SIZE):
+        chunk = ids[start:start + LOOKUP_SIZE]
+        existing.update(StudentExamAttempt.objects.filter(id__in=chunk).values_list('id', flat=True))
+    return {
+        f"{contact_sheets.SHEET_DIR}/{name}"
+        for attempt_id, names in attempt_ids.items() if attempt_id not in existing
+        for name in names
+    }
+
+
+def sweep_orphans(min_age=ORPHAN_MIN_AGE, dry_run=False, storage=default_storage):
+    """
+    Delete files under the media directories that nothing refers to and
+    that are older than `min_age`. Returns {directory: (scanned, orphaned)}.
+    """
+    cutoff = timezone.now() - min_age
+    totals = {}
+    listings = [(top, walk(storage, top), FILE_FIELDS[top]) for top in FILE_FIELDS]
+    listings.append((contact_sheets.SHEET_DIR, walk(storage, contact_sheets.SHEET_DIR), None))
+
+    for top, directories, model_field in listings:
+        scanned = orphaned = 0
+        for directory, files in directories:
+            scanned += len(files)
+            if model_field is None:
+                candidates = contact_sheet_orphans(files) if directory == top else set()
+            else:
+                candidates = orphans_in(directory, files, *model_field)
+            for name in sorted(candidates):
+                try:
+                    if storage.get_modified_time(name) > cutoff:
+                        continue
+                except (FileNotFoundError, NotImplementedError):
+                    continue
+                orphaned += 1
+                if not dry_run:
+                    storage.delete(name)
+                    logger.info(f"Deleted orphaned media file {name}")
+        totals[top] = (scanned, orphaned)
+    return totals
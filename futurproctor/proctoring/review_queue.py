@@ -0,0 +1,159 @@
+# review_queue.py - Proctor review queue ordered by live risk score
+#
+# Ongoing and recently submitted attempts are kept in memory sorted by risk,
+# so proctors can triage the riskiest candidates while they are still sitting
+# the exam. Risk increments from the proctoring threads are applied to the
+# queue immediately and written to
+# StudentExamAttempt.risk_score periodically with F() expressions; each flush
+# also reloads the scores from the database so attempts proctored by other
+# processes show up too.
+import bisect
+import logging
+import threading
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import StudentExamAttempt
+from .worker_threads import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two flushes of pending risk to the database
+FLUSH_INTERVAL = 10
+
+# Submitted attempts stay in the queue this long after submission
+RECENT_WINDOW = 2 * 60 * 60  # seconds
+
+
+class ReviewQueue:
+    """
+    Ongoing and recently submitted attempts as a list of (-risk, attempt_id)
+    kept sorted with bisect, plus each attempt's current risk. A risk change
+    moves one key; an attempt started since the last load is added on its
+    first increment.
+
+    Pages use keyset pagination on (risk desc, attempt id): a bisect to the
+    cursor and a slice, so page 50 costs the same as page 1 and concurrent
+    risk changes never duplicate or skip an attempt within a page.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.order = []
+        self.risks = {}
+        self.pending = {}
+        self.loaded = False
+        self.flusher = PeriodicTask(self.flush, FLUSH_INTERVAL, 'review queue flush')
+
+    def _set_risk(self, attempt_id, risk):
+        old = self.risks.get(attempt_id)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (-old, attempt_id))]
+        self.risks[attempt_id] = risk
+        bisect.insort(self.order, (-risk, attempt_id))
+
+    def add(self, attempt_id, points):
+        """Add risk points to an attempt (from the proctoring threads)."""
+        self._ensure_loaded()
+        with self.lock:
+            self.pending[attempt_id] = self.pending.get(attempt_id, 0.0) + points
+            known = attempt_id in self.risks
+            if known:
+                self._set_risk(attempt_id, self.risks[attempt_id] + points)
+        if not known:
+            self._add_attempt(attempt_id)
+        self.flusher.start()
+
+    def _add_attempt(self, attempt_id):
+        """Queue an ongoing attempt started since the last load, at its stored risk plus what is pending."""
+        stored = (
+            StudentExamAttempt.objects.filter(id=attempt_id, status='ongoing')
+            .values_list('risk_score', flat=True).first()
+        )
+        if stored is None:
+            return
+        with self.lock:
+            if attempt_id not in self.risks:
+                self._set_risk(attempt_id, stored + self.pending.get(attempt_id, 0.0))
+
+    def page(self, limit=25, after=None):
+        """
+        Up to `limit` (attempt_id, risk) pairs in descending risk order,
+        starting after the `after` cursor (a (risk, attempt_id) pair from the
+        previous page). Returns (items, next_cursor).
+        """
+        self._ensure_loaded()
+        with self.lock:
+            start = 0 if after is None else bisect.bisect_right(self.order, (-after[0], after[1]))
+            keys = self.order[start:start + limit]
+
+        results = [(attempt_id, -neg_risk) for neg_risk, attempt_id in keys]
+        next_cursor = (results[-1][1], results[-1][0]) if len(results) == limit else None
+        return results, next_cursor
+
+    def __len__(self):
+        return len(self.risks)
+
+    def load(self):
+        """(Re)load the ongoing and recently submitted attempts from the database."""
+        since = timezone.now() - timedelta(seconds=RECENT_WINDOW)
+        rows = StudentExamAttempt.objects.filter(
+            Q(status='ongoing') | Q(status='submitted', submitted_at__gte=since),
+        ).values_list('id', 'risk_score')
+
+        with self.lock:
+            # Keep increments that are not in the database yet; attempts
+            # evaluated or past the window drop out here
+            self.risks = {
+                attempt_id: risk_score + self.pending.get(attempt_id, 0.0)
+                for attempt_id, risk_score in rows
+            }
+            self.order = sorted((-risk, attempt_id) for attempt_id, risk in self.risks.items())
+            self.loaded = True
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def flush(self):
+        """Write pending risk increments to the database, then refresh from it."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        items = list(pending.items())
+        for i, (attempt_id, points) in enumerate(items):
+            try:
+                StudentExamAttempt.objects.filter(id=attempt_id).update(risk_score=F('risk_score') + points)
+            except Exception:
+                # Keep the unwritten increments for the next flush
+                with self.lock:
+                    for unwritten_id, unwritten in items[i:]:
+                        self.pending[unwritten_id] = self.pending.get(unwritten_id, 0.0) + unwritten
+                raise
+
+        self.load()
+
+    def flush_attempt(self, attempt_id):
+        """Write one attempt's pending increments now (e.g. on submission)."""
+        with self.lock:
+            points = self.pending.pop(attempt_id, 0.0)
+        if points:
+            StudentExamAttempt.objects.filter(id=attempt_id).update(risk_score=F('risk_score') + points)
+
+
+def parse_cursor(value):
+    """Parse a 'risk_attemptid' cursor from the query string; None if missing or malformed."""
+    try:
+        risk, attempt_id = value.split('_')
+        return float(risk), int(attempt_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_cursor(cursor):
+    return f"{cursor[0]!r}_{cursor[1]}" if cursor else None
+
+
+review_queue = ReviewQueue()
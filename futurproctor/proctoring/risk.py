@@ -0,0 +1,133 @@
+# risk.py - Weighted risk score per exam attempt
+#
+# Every proctoring event adds to the attempt's score as it is written. The
+# increment goes to the review queue at once and reaches the indexed
+# StudentExamAttempt.risk_score column with its periodic F() flush, so
+# dashboards sort and filter by a column instead of recounting events.
+#
+# The score of an event depends on its type, the detector confidence and how
+# long the behaviour lasts: the first event of an episode adds its full
+# weight, and events continuing the same episode add weight in proportion to
+# the time elapsed since the previous one.
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from . import timeline
+from .models import EventCode, StudentExamAttempt
+from .review_queue import review_queue
+
+# Points for one episode of each event type at full confidence
+EVENT_WEIGHTS = {
+    EventCode.OTHER: 1.0,
+    EventCode.OBJECT_DETECTED: 15.0,
+    EventCode.MULTIPLE_PERSONS: 20.0,
+    EventCode.GAZE_DETECTED: 3.0,
+    EventCode.IDENTITY_MISMATCH: 25.0,
+    EventCode.AUDIO_DETECTED: 8.0,
+    EventCode.TAB_SWITCH: 5.0,
+}
+
+# Events of the same type closer together than this belong to one episode
+EPISODE_GAP = 10.0  # seconds
+# Weight added per minute an episode continues
+DURATION_RATE = 0.5
+
+# Discrete actions: every event is its own episode
+DISCRETE_EVENTS = {EventCode.TAB_SWITCH}
+
+
+def _weight(code):
+    return EVENT_WEIGHTS.get(code, EVENT_WEIGHTS[EventCode.OTHER])
+
+
+def _last_key(attempt_id, code):
+    return f"risk_last:{attempt_id}:{int(code)}"
+
+
+def event_score(code, confidence=1.0, gap=None):
+    """
+    Points for one event; `gap` is the time in seconds since the previous
+    event of the same type in the attempt (None if there was none).
+    """
+    weight = _weight(code) * confidence
+    if gap is None or gap > EPISODE_GAP:
+        return weight
+    return weight * DURATION_RATE * gap / 60
+
+
+def add_event(attempt_id, code, confidence=1.0, timestamp=None):
+    """Add one event to the attempt's stored risk score. Returns the points added."""
+    now = timestamp.timestamp() if timestamp is not None else time.time()
+    gap = None
+    if code not in DISCRETE_EVENTS:
+        key = _last_key(attempt_id, code)
+        last = cache.get(key)
+        gap = now - last if last is not None else None
+        cache.set(key, now, timeout=EPISODE_GAP * 6)
+
+    score = event_score(code, confidence, gap)
+    review_queue.add(attempt_id, score)
+    return score
+
+
+def add_events(attempt_id, code, count):
+    """Add `count` separate episodes of one type at once (e.g. flushed tab switches)."""
+    if count:
+        review_queue.add(attempt_id, _weight(code) * count)
+
+
+def score_arrays(arrays):
+    """
+    Risk score of a whole timeline (see timeline.load), computed the same way
+    as the incremental updates.
+    """
+    times = arrays['time'] / 1000.0
+    codes = arrays['code']
+    confidences = arrays['confidence'].astype(np.float64)
+
+    total = 0.0
+    for code in np.unique(codes):
+        mask = codes == code
+        base = _weight(code) * confidences[mask]
+        if code in DISCRETE_EVENTS:
+            total += base.sum()
+            continue
+        # Time since the previous event of this type; the first one starts an episode
+        gaps = np.diff(times[mask], prepend=-np.inf)
+        continued = gaps <= EPISODE_GAP
+        total += np.where(continued, base * DURATION_RATE * np.where(continued, gaps, 0) / 60, base).sum()
+    return float(total)
+
+
+def score_attempt(attempt):
+    """
+    Recompute an attempt's score from its timeline. Attempts recorded before
+    the timeline existed only have their per-type CheatingEvent rows, which
+    count as one episode each (plus every stored tab switch).
+    """
+    arrays = timeline.load(attempt.id)
+    if len(arrays['time']):
+        return score_arrays(arrays)
+
+    counts = attempt.cheating_events.exclude(event_code=EventCode.TAB_SWITCH).code_counts()
+    score = sum(_weight(code) * n for code, n in counts.items())
+    return score + _weight(EventCode.TAB_SWITCH) * attempt.tab_switch_count
+
+
+def backfill(attempts, progress=None, batch_size=500):
+    """Recompute and store the risk score of every attempt in the queryset. Returns how many were updated."""
+    updated = 0
+    batch = []
+    for attempt in attempts.only('id', 'tab_switch_count').iterator(chunk_size=batch_size):
+        attempt.risk_score = round(score_attempt(attempt), 2)
+        batch.append(attempt)
+        if len(batch) >= batch_size:
+            updated += StudentExamAttempt.objects.bulk_update(batch, ['risk_score'])
+            batch = []
+            if progress:
+                progress(updated)
+    if batch:
+        updated += StudentExamAttempt.objects.bulk_update(batch, ['risk_score'])
+    return updated
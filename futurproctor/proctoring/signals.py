@@ -0,0 +1,129 @@
+# signals.py - Cache invalidation, counter updates, thumbnails and file cleanup driven by model writes
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import dashboard_stats, examinee_list, paper_snapshots, retention
+from .dashboard_stats import APPROVAL_COUNTERS, ATTEMPT_STATUS_COUNTERS
+from .models import CheatingAudio, CheatingEvent, CheatingImage, Exam, ExamPaper, Question, Student, StudentExamAttempt
+from .contact_sheets import contact_sheet_queue
+from .thumbnails import thumbnail_queue
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Exam)
+@receiver(post_delete, sender=CheatingEvent)
+def invalidate_admin_dashboard(sender, **kwargs):
+    examinee_list.invalidate()
+
+
+@receiver(post_save, sender=CheatingEvent)
+def invalidate_admin_dashboard_on_new_event(sender, created, **kwargs):
+    # The list only shows how many events a student has; the saves that
+    # follow (image counts, tab switches) change nothing on it
+    if created:
+        examinee_list.invalidate()
+
+
+def _remember_old_value(instance, field, update_fields):
+    """Store the value `field` has in the database before the save, for the post_save receivers."""
+    instance._stats_old = None
+    if instance.pk is None or (update_fields is not None and field not in update_fields):
+        return
+    instance._stats_old = type(instance).objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Student)
+def remember_approval_status(sender, instance, update_fields=None, **kwargs):
+    _remember_old_value(instance, 'approval_status', update_fields)
+
+
+@receiver(post_save, sender=Student)
+def count_student(sender, instance, created, **kwargs):
+    if created:
+        dashboard_stats.adjust('total_students', 1)
+        dashboard_stats.adjust(APPROVAL_COUNTERS.get(instance.approval_status), 1)
+    elif instance._stats_old is not None and instance._stats_old != instance.approval_status:
+        dashboard_stats.adjust(APPROVAL_COUNTERS.get(instance._stats_old), -1)
+        dashboard_stats.adjust(APPROVAL_COUNTERS.get(instance.approval_status), 1)
+
+
+@receiver(pre_save, sender=ExamPaper)
+def remember_is_active(sender, instance, update_fields=None, **kwargs):
+    _remember_old_value(instance, 'is_active', update_fields)
+
+
+@receiver(post_save, sender=ExamPaper)
+def count_exam_paper(sender, instance, created, **kwargs):
+    if created:
+        dashboard_stats.adjust('total_exams', 1)
+        dashboard_stats.adjust('active_exams', 1 if instance.is_active else 0)
+    elif instance._stats_old is not None and instance._stats_old != instance.is_active:
+        dashboard_stats.adjust('active_exams', 1 if instance.is_active else -1)
+
+
+@receiver(pre_save, sender=StudentExamAttempt)
+def remember_attempt_status(sender, instance, update_fields=None, **kwargs):
+    _remember_old_value(instance, 'status', update_fields)
+
+
+@receiver(post_save, sender=StudentExamAttempt)
+def count_attempt(sender, instance, created, **kwargs):
+    if created:
+        dashboard_stats.adjust('total_attempts', 1)
+        dashboard_stats.adjust(ATTEMPT_STATUS_COUNTERS.get(instance.status), 1)
+    elif instance._stats_old is not None and instance._stats_old != instance.status:
+        dashboard_stats.attempt_status_changed(instance._stats_old, instance.status)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=ExamPaper)
+@receiver(post_delete, sender=StudentExamAttempt)
+def recount_after_delete(sender, **kwargs):
+    # Deletes cascade, so recount instead of adjusting
+    dashboard_stats.invalidate()
+
+
+@receiver(post_save, sender=Student)
+def queue_photo_thumbnails(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'photo' in update_fields:
+        # Existing thumbnails are kept, so this is cheap for saves that did not touch the photo
+        transaction.on_commit(lambda: thumbnail_queue.submit(instance.photo))
+
+
+@receiver(post_save, sender=CheatingImage)
+def queue_evidence_thumbnails(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: thumbnail_queue.submit(instance.image))
+
+
+@receiver(post_save, sender=CheatingImage)
+def queue_contact_sheet(sender, instance, created, **kwargs):
+    if created and instance.attempt_id:
+        transaction.on_commit(lambda: contact_sheet_queue.submit(instance.attempt_id))
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=CheatingImage)
+@receiver(post_delete, sender=CheatingAudio)
+@receiver(post_delete, sender=StudentExamAttempt)
+def delete_media_files(sender, instance, **kwargs):
+    field = {
+        Student: 'photo',
+        CheatingImage: 'image',
+        CheatingAudio: 'audio',
+        StudentExamAttempt: 'evidence_archive',
+    }[sender]
+    field_file = getattr(instance, field)
+    if field_file:
+        storage, name = field_file.storage, field_file.name
+        # Only once the delete is committed: a rolled back delete keeps its files
+        transaction.on_commit(lambda: retention.delete_stored(storage, name))
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=ExamPaper)
+def invalidate_paper_snapshot(sender, instance, **kwargs):
+    exam_paper_id = instance.exam_paper_id if sender is Question else instance.id
+    # After commit, so a snapshot compiled meanwhile from the old rows is retired too
+    transaction.on_commit(lambda: paper_snapshots.invalidate(exam_paper_id))
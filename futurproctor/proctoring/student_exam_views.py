@@ -4,11 +4,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
-from django.db.models import Q
-from .models import (
-    Student, ExamPaper, Question, StudentExamAttempt, 
-    StudentAnswer, Result
-)
+from .models import ExamPaper, StudentExamAttempt, Result
+from . import answers
+from . import dashboard_stats
+from . import paper_snapshots
+from . import tab_switches
+from . import telemetry
+from . import timeline
+from .review_queue import review_queue
 import json
 
 
@@ -70,11 +73,11 @@ def start_exam(request, exam_id):
 @login_required
 @student_approval_check
 def take_exam(request, attempt_id):
-    """Take exam with proctoring - dynamic questions from database"""
-    attempt = get_object_or_404(StudentExamAttempt, id=attempt_id)
+    """Take exam with proctoring - questions from the paper's cached snapshot"""
+    attempt = get_object_or_404(StudentExamAttempt.objects.select_related('exam_paper'), id=attempt_id)
     
     # Check if student owns this attempt
-    if attempt.student != request.user.student:
+    if attempt.student_id != request.user.student.id:
         messages.error(request, "Unauthorized access!")
         return redirect('available_exams')
     
@@ -83,33 +86,22 @@ def take_exam(request, attempt_id):
         messages.warning(request, "This exam has already been submitted!")
         return redirect('student_results')
     
-    # Get all questions for this exam
-    questions = attempt.exam_paper.questions.all().order_by('order')
-    
-    # Convert questions to format similar to old ai.json
-    questions_data = []
-    for q in questions:
-        question_dict = {
-            'id': q.id,
-            'text': q.question_text,
-            'type': q.question_type,
-            'marks': q.marks,
-        }
-        
-        if q.question_type == 'mcq':
-            question_dict.update({
-                'option_a': q.option_a,
-                'option_b': q.option_b,
-                'option_c': q.option_c,
-                'option_d': q.option_d,
-            })
-        
-        questions_data.append(question_dict)
-    
-    # Get tab switch count from CheatingEvent
-    from .models import CheatingEvent
-    violations = CheatingEvent.objects.filter(student=request.user.student).first()
-    tab_count = violations.tab_switch_count if violations else 0
+    # Compiled once per paper and cached; shuffled per candidate without a query
+    questions_data = paper_snapshots.for_attempt(attempt)
+    
+    # Answers autosaved before a reload or a browser crash are shown again
+    saved = answers.saved_answers(attempt.id)
+    for question in questions_data:
+        question['saved'] = saved.get(question['id'])
+    
+    # Tab switches are counted per attempt (see tab_switches.py)
+    tab_count = tab_switches.current_count(attempt)
+    request.session['active_attempt_id'] = attempt.id
+    
+    # Start background proctoring (video + identity re-verification, audio)
+    # once per attempt; submit_exam_new stops these threads again
+    from . import views
+    views.start_proctoring(request, attempt)
     
     context = {
         'attempt': attempt,
@@ -125,67 +117,122 @@ def take_exam(request, attempt_id):
 @login_required
 @student_approval_check
 def submit_exam_new(request, attempt_id):
-    """Submit exam answers - handles both MCQ and subjective"""
+    """Submit exam - finalizes the autosaved answers (plus any the page had not sent yet)"""
     if request.method != 'POST':
         return HttpResponse("Invalid request method.", status=400)
     
     attempt = get_object_or_404(StudentExamAttempt, id=attempt_id)
     
     # Check if student owns this attempt
-    if attempt.student != request.user.student:
+    if attempt.student_id != request.user.student.id:
         messages.error(request, "Unauthorized access!")
         return redirect('available_exams')
     
-    # Get all questions
-    questions = attempt.exam_paper.questions.all()
-    
-    total_marks_obtained = 0
-    
-    for question in questions:
-        if question.question_type == 'mcq':
-            # MCQ answer
-            user_answer = request.POST.get(f'answer_{question.id}')
-            
-            if user_answer:
-                is_correct = (user_answer.upper() == question.correct_answer.upper())
-                marks = question.marks if is_correct else 0
-                
-                StudentAnswer.objects.create(
-                    attempt=attempt,
-                    question=question,
-                    selected_option=user_answer.upper(),
-                    is_correct=is_correct,
-                    marks_obtained=marks
-                )
-                
-                total_marks_obtained += marks
-        
-        else:  # subjective
-            # Subjective answer
-            answer_text = request.POST.get(f'answer_{question.id}', '').strip()
-            
-            StudentAnswer.objects.create(
-                attempt=attempt,
-                question=question,
-                answer_text=answer_text,
-                marks_obtained=0  # Will be evaluated later
-            )
-    
-    # Update attempt
-    attempt.submitted_at = timezone.now()
-    attempt.status = 'submitted'  # Needs evaluation for subjective questions
-    attempt.total_marks_obtained = total_marks_obtained  # Only MCQ marks for now
-    attempt.save()
-    
-    # Stop background proctoring threads
-    import threading
-    from .views import stop_event
-    stop_event.set()
+    # Claim the submission: of two concurrent submits (double click, timer
+    # and button together) only the one that moves the attempt on goes further
+    claimed = StudentExamAttempt.objects.filter(id=attempt.id, status='ongoing').update(
+        status='submitted',  # Needs evaluation for subjective questions
+        submitted_at=timezone.now(),
+    )
+    if claimed != 1:
+        messages.warning(request, "This exam has already been submitted!")
+        return redirect('student_results')
+    dashboard_stats.attempt_status_changed('ongoing', 'submitted')
+    
+    snapshot = paper_snapshots.get(attempt.exam_paper_id)
+    
+    # The page autosaves as the student works; the form only carries answers
+    # when that failed or JavaScript is off
+    answers.save_answers(attempt.id, answers.answers_from_post(request.POST, snapshot), snapshot)
+    total_marks_obtained = answers.finalize(attempt.id, snapshot)
+    # Only MCQ marks for now
+    StudentExamAttempt.objects.filter(id=attempt.id).update(total_marks_obtained=total_marks_obtained)
+    
+    # Persist any tab switches and risk still pending in memory
+    tab_switches.flush([attempt.id])
+    review_queue.flush_attempt(attempt.id)
+    request.session.pop('active_attempt_id', None)
+    
+    # Stop this attempt's background proctoring threads
+    from .views import stop_proctoring
+    stop_proctoring(attempt.id)
+    
+    # Fold the attempt's event log into its timeline once the threads have stopped
+    timeline.compaction_queue.submit(attempt.id)
     
     messages.success(request, 'Exam submitted successfully! Results will be published after evaluation.')
     return redirect('exam_submission_success_new')
 
 
+@login_required
+def autosave_answers(request, attempt_id):
+    """Save the answers changed since the page's last autosave"""
+    if request.method != 'POST':
+        return JsonResponse({"error": "Invalid request"}, status=400)
+    
+    # Authorized from the session like telemetry: take_exam checked ownership
+    if request.session.get('active_attempt_id') != attempt_id:
+        return JsonResponse({"error": "This attempt is not active."}, status=403)
+    
+    attempt = StudentExamAttempt.objects.filter(id=attempt_id).values('exam_paper_id', 'status').first()
+    if attempt is None or attempt['status'] != 'ongoing':
+        return JsonResponse({"error": "This attempt is not active."}, status=403)
+    
+    snapshot = paper_snapshots.get(attempt['exam_paper_id'])
+    try:
+        batch, rejected = answers.parse_batch(json.loads(request.body), snapshot)
+    except (json.JSONDecodeError, answers.AnswerError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    saved = answers.save_answers(attempt_id, batch, snapshot)
+    return JsonResponse({
+        "status": "saved",
+        "saved": saved,
+        "rejected": rejected,
+        "saved_at": timezone.now().isoformat(),
+    })
+
+
+@login_required
+def record_telemetry(request, attempt_id):
+    """Store a batch of browser integrity events for the ongoing attempt"""
+    if request.method != 'POST':
+        return JsonResponse({"error": "Invalid request"}, status=400)
+    
+    # take_exam puts the attempt it checked ownership of in the session,
+    # so batches are authorized without a database query
+    if request.session.get('active_attempt_id') != attempt_id:
+        return JsonResponse({"error": "This attempt is not active."}, status=403)
+    
+    try:
+        payload = json.loads(request.body)
+        events, rejected = telemetry.parse_batch(payload, attempt_id)
+    except (json.JSONDecodeError, telemetry.TelemetryError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    telemetry.store_batch(events)
+    
+    response = {
+        "status": "updated",
+        "stored": len(events),
+        "rejected": rejected,
+    }
+    
+    # Page-hidden events are tab switches
+    switches = sum(1 for event in events if event.event_type == 'visibility_hidden')
+    if switches:
+        count = tab_switches.record_tab_switch(attempt_id, switches)
+        response["tab_switch_count"] = count
+        if tab_switches.should_terminate(count):
+            response["status"] = "terminated"
+            response["message"] = "You have exceeded the allowed tab switches. Your exam is terminated."
+            # Stop this attempt's background proctoring threads
+            from .views import stop_proctoring
+            stop_proctoring(attempt_id)
+    
+    return JsonResponse(response)
+
+
 @login_required
 def exam_submission_success_new(request):
     """Exam submission success page"""
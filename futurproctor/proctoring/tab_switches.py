@@ -0,0 +1,162 @@
+# tab_switches.py - High-rate tab switch counter per exam attempt
+#
+# Browser blur/visibility events arrive in bursts, so instead of a
+# get_or_create + save() per event the count lives in the cache (atomic incr)
+# and is flushed to the database periodically with F() expressions.
+#
+# A flush claims an attempt's pending count (reads it and takes it off the
+# counter under a short cache lock) before writing it, so two processes
+# flushing the same attempt never write the same switches twice. Which
+# attempts have pending switches is only known to the process that recorded
+# them; its flusher writes them, and submit_exam_new flushes its attempt
+# explicitly, which reads the shared counter whichever process served the
+# switches (with a shared cache backend, see settings.py).
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from . import risk
+from .models import CheatingEvent, EventCode, ProctoringEvent, StudentExamAttempt
+from .worker_threads import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# More switches than this terminates the exam
+TERMINATION_THRESHOLD = 5
+
+# Seconds between two flushes of pending counts to the database
+FLUSH_INTERVAL = 10
+
+# Longest a flush may hold an attempt's claim lock (if the process dies holding it)
+CLAIM_LOCK_TIMEOUT = 30
+
+_dirty_attempts = set()
+_dirty_lock = threading.Lock()
+
+
+def _count_key(attempt_id):
+    return f"tab_switches:{attempt_id}"
+
+
+def _pending_key(attempt_id):
+    return f"tab_switches_pending:{attempt_id}"
+
+
+def _claim_key(attempt_id):
+    return f"tab_switches_claim:{attempt_id}"
+
+
+def record_tab_switch(attempt_id, switches=1):
+    """
+    Count tab switches for the attempt and return the new total.
+    Only reads the database when the counter is not in the cache yet.
+    """
+    key = _count_key(attempt_id)
+    if cache.get(key) is None:
+        stored = StudentExamAttempt.objects.filter(id=attempt_id).values_list('tab_switch_count', flat=True).first()
+        # add() is a no-op if another request seeded the counter first
+        cache.add(key, stored or 0, timeout=None)
+    count = cache.incr(key, switches)
+
+    cache.add(_pending_key(attempt_id), 0, timeout=None)
+    cache.incr(_pending_key(attempt_id), switches)
+
+    _mark_dirty(attempt_id)
+    _flusher.start()
+    return count
+
+
+def current_count(attempt):
+    """Tab switches so far, including ones not flushed yet."""
+    count = cache.get(_count_key(attempt.id))
+    return attempt.tab_switch_count if count is None else count
+
+
+def should_terminate(count):
+    return count > TERMINATION_THRESHOLD
+
+
+def _mark_dirty(attempt_id):
+    with _dirty_lock:
+        _dirty_attempts.add(attempt_id)
+
+
+def _claim(attempt_id):
+    """
+    Take the attempt's pending count off the counter and return it; switches
+    recorded later stay for the next flush. None if another flush holds the
+    claim lock.
+    """
+    if not cache.add(_claim_key(attempt_id), 1, timeout=CLAIM_LOCK_TIMEOUT):
+        return None
+    try:
+        pending = cache.get(_pending_key(attempt_id)) or 0
+        if pending > 0:
+            cache.decr(_pending_key(attempt_id), pending)
+        return pending
+    finally:
+        cache.delete(_claim_key(attempt_id))
+
+
+def flush(attempt_ids=None):
+    """Write pending tab switch counts to the database."""
+    with _dirty_lock:
+        if attempt_ids is None:
+            attempt_ids = set(_dirty_attempts)
+        _dirty_attempts.difference_update(attempt_ids)
+
+    for attempt_id in attempt_ids:
+        pending = _claim(attempt_id)
+        if pending is None:
+            # Being flushed elsewhere; look again next time
+            _mark_dirty(attempt_id)
+            continue
+        if pending <= 0:
+            continue
+        try:
+            with transaction.atomic():
+                _write(attempt_id, pending)
+        except Exception:
+            # Give the claimed switches back for the next flush
+            cache.incr(_pending_key(attempt_id), pending)
+            _mark_dirty(attempt_id)
+            raise
+        risk.add_events(attempt_id, EventCode.TAB_SWITCH, pending)
+        logger.debug(f"Flushed {pending} tab switches for attempt {attempt_id}")
+
+
+def _write(attempt_id, pending):
+    """Add `pending` claimed tab switches to the attempt, its tab switch event and its timeline."""
+    StudentExamAttempt.objects.filter(id=attempt_id).update(
+        tab_switch_count=F('tab_switch_count') + pending
+    )
+
+    # Keep the attempt's tab_switch event (used by the reports) in step
+    updated = CheatingEvent.objects.filter(attempt_id=attempt_id, event_code=EventCode.TAB_SWITCH).update(
+        tab_switch_count=F('tab_switch_count') + pending,
+        cheating_flag=True,
+    )
+    if not updated:
+        student_id, exam_paper_id = StudentExamAttempt.objects.filter(id=attempt_id).values_list(
+            'student_id', 'exam_paper_id'
+        ).first()
+        CheatingEvent.objects.create(
+            student_id=student_id,
+            attempt_id=attempt_id,
+            exam_paper_id=exam_paper_id,
+            event_code=EventCode.TAB_SWITCH,
+            tab_switch_count=pending,
+            cheating_flag=True,
+        )
+
+    # Append to the attempt's timeline, stamped with the flush time
+    ProctoringEvent.objects.bulk_create(
+        [ProctoringEvent(attempt_id=attempt_id, event_code=EventCode.TAB_SWITCH) for _ in range(pending)]
+    )
+
+
+
+_flusher = PeriodicTask(flush, FLUSH_INTERVAL, 'tab switch flush')
@@ -0,0 +1,62 @@
+# telemetry.py - Batched browser integrity events (focus, visibility, fullscreen, clipboard, devtools)
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import TelemetryEvent
+
+# Largest batch accepted in one request; the exam page flushes every few seconds
+MAX_BATCH_SIZE = 200
+
+# Client clocks drift; events further than this from server time are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+MAX_DETAIL_LENGTH = 200
+
+
+class TelemetryError(ValueError):
+    """Raised when a telemetry batch is malformed as a whole"""
+
+
+def parse_batch(payload, attempt_id):
+    """
+    Validate a batch of client events and return unsaved TelemetryEvent rows.
+
+    `payload` is the decoded JSON body: {"events": [{"type": ..., "t": <ms since epoch>, "detail": ...}]}.
+    Individual invalid events are skipped; returns (events, rejected_count).
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('events'), list):
+        raise TelemetryError("Expected an object with an 'events' list.")
+    raw_events = payload['events']
+    if len(raw_events) > MAX_BATCH_SIZE:
+        raise TelemetryError(f"At most {MAX_BATCH_SIZE} events per batch.")
+
+    now = timezone.now()
+    valid_types = {choice for choice, _ in TelemetryEvent.EVENT_TYPES}
+    events = []
+    rejected = 0
+
+    for raw in raw_events:
+        try:
+            event_type = raw['type']
+            client_time = datetime.fromtimestamp(float(raw['t']) / 1000, tz=dt_timezone.utc)
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            rejected += 1
+            continue
+        if event_type not in valid_types or abs(client_time - now) > MAX_CLOCK_SKEW:
+            rejected += 1
+            continue
+
+        events.append(TelemetryEvent(
+            attempt_id=attempt_id,
+            event_type=event_type,
+            client_timestamp=client_time,
+            detail=str(raw.get('detail', ''))[:MAX_DETAIL_LENGTH],
+        ))
+
+    return events, rejected
+
+
+def store_batch(events):
+    """Insert a validated batch in a single query"""
+    return TelemetryEvent.objects.bulk_create(events)
@@ -0,0 +1,21 @@
+# Template helpers for image thumbnails, see proctoring/thumbnails.py
+#
+#   {% load thumbnails %}
+#   <img src="{{ student.photo|thumbnail:'small' }}">
+#   <img src="{{ image|thumbnail:'medium' }}" srcset="{% thumbnail_srcset image %}" sizes="320px">
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(field_file, size='small'):
+    """URL of the thumbnail of an image field ('small' or 'medium')"""
+    return thumbnails.thumbnail_url(field_file, size)
+
+
+@register.simple_tag
+def thumbnail_srcset(field_file):
+    return thumbnails.srcset(field_file)
@@ -1,3 +1,998 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import answers, bulk_onboarding, contact_sheets, paper_snapshots, reports, retention, risk, tab_switches, telemetry, thumbnails, timeline
+from .media_views import _parse_range, serve_media
+from .ml_models.object_tracker import ObjectTracker
+from .overlays import overlay_name
+from .models import (
+    AttemptTimeline, CheatingAudio, CheatingEvent, CheatingImage, EventCode, ExamPaper, ObjectClass, ProctoringEvent, Question, Student,
+    StudentAnswer, StudentExamAttempt,
+)
+from .review_queue import ReviewQueue, format_cursor, parse_cursor, review_queue
+from .thumbnails import thumbnail_name
+
+
+def make_student(email='student@example.com'):
+    user = User.objects.create_user(username=email, email=email, password='secret')
+    student = Student.objects.create(
+        user=user, name='Test Student', email=email,
+        approval_status='approved',
+    )
+    return user, student
+
+
+def make_paper():
+    paper = ExamPaper.objects.create(
+        title='Paper', subject='AI', duration_minutes=30, exam_date=timezone.now(),
+    )
+    mcq = Question.objects.create(
+        exam_paper=paper, question_text='Q1', option_a='a', option_b='b', option_c='c', option_d='d',
+        correct_answer='A', order=1, marks=2,
+    )
+    subjective = Question.objects.create(
+        exam_paper=paper, question_text='Q2', question_type='subjective', order=2, marks=3,
+    )
+    return paper, mcq, subjective
+
+
+class MediaRangeTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = FileSystemStorage(location=self.location)
+        self.storage.save('contact_sheets/sheet.jpg', ContentFile(b'0123456789'))
+        self.storage.save('contact_sheets/empty.jpg', ContentFile(b''))
+        self.staff = User.objects.create_user(username='staff', password='secret', is_staff=True)
+        self.factory = RequestFactory()
+
+    def get(self, name, **headers):
+        request = self.factory.get(f'/media/{name}', headers=headers)
+        request.user = self.staff
+        return serve_media(request, name, storage=self.storage)
+
+    def test_parse_range(self):
+        self.assertEqual(_parse_range('bytes=2-5', 10), (2, 5))
+        self.assertEqual(_parse_range('bytes=7-', 10), (7, 9))
+        self.assertEqual(_parse_range('bytes=-3', 10), (7, 9))
+        self.assertEqual(_parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(_parse_range('bytes=0-1,4-5', 10))
+        self.assertIs(_parse_range('bytes=10-', 10), False)
+        self.assertIs(_parse_range('bytes=-0', 10), False)
+        self.assertIs(_parse_range('bytes=0-', 0), False)
+
+    def test_whole_file_with_etag(self):
+        response = self.get('contact_sheets/sheet.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'])
+
+    def test_not_modified(self):
+        etag = self.get('contact_sheets/sheet.jpg')['ETag']
+        response = self.get('contact_sheets/sheet.jpg', if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_partial_content(self):
+        response = self.get('contact_sheets/sheet.jpg', range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        response = self.get('contact_sheets/sheet.jpg', range='bytes=2-5', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_unsatisfiable_ranges(self):
+        response = self.get('contact_sheets/sheet.jpg', range='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        response = self.get('contact_sheets/empty.jpg', range='bytes=0-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_contact_sheets_are_staff_only(self):
+        request = self.factory.get('/media/contact_sheets/sheet.jpg')
+        request.user = AnonymousUser()
+        response = serve_media(request, 'contact_sheets/sheet.jpg', storage=self.storage)
+        self.assertEqual(response.status_code, 403)
+
+
+class ObjectTrackerTests(TestCase):
+    def test_confirmed_after_min_hits(self):
+        tracker = ObjectTracker(min_hits=3)
+        box = (10, 10, 50, 50)
+        self.assertEqual(tracker.update([('cell phone', 0.9, box)]), [])
+        self.assertEqual(tracker.update([('cell phone', 0.9, (12, 11, 52, 51))]), [])
+        confirmed = tracker.update([('cell phone', 0.9, (13, 12, 53, 52))])
+        self.assertEqual(len(confirmed), 1)
+        self.assertEqual(confirmed[0].hits, 3)
+        self.assertEqual(len(tracker.tracks), 1)
+        # Reported once, not on every later frame
+        self.assertEqual(tracker.update([('cell phone', 0.9, (14, 12, 54, 52))]), [])
+
+    def test_matches_only_within_label(self):
+        tracker = ObjectTracker(min_hits=2)
+        box = (10, 10, 50, 50)
+        tracker.update([('cell phone', 0.9, box)])
+        tracker.update([('book', 0.9, box)])
+        self.assertEqual(sorted(track.label for track in tracker.tracks), ['book', 'cell phone'])
+        self.assertEqual(len({track.id for track in tracker.tracks}), 2)
+        self.assertEqual(tracker.confirmed(), [])
+
+    def test_separate_objects_keep_their_tracks(self):
+        tracker = ObjectTracker(min_hits=2)
+        left, right = (0, 0, 40, 40), (200, 200, 240, 240)
+        tracker.update([('person', 0.9, left), ('person', 0.8, right)])
+        ids = {track.id for track in tracker.tracks}
+        tracker.update([('person', 0.8, right), ('person', 0.9, left)])
+        self.assertEqual({track.id for track in tracker.confirmed('person')}, ids)
+
+    def test_lost_tracks_are_dropped(self):
+        tracker = ObjectTracker(min_hits=1, max_misses=2)
+        tracker.update([('book', 0.9, (10, 10, 50, 50))])
+        for _ in range(3):
+            tracker.update([])
+        self.assertEqual(tracker.tracks, [])
+
+    def test_detector_backs_off_while_stable(self):
+        tracker = ObjectTracker(min_hits=1, max_detect_interval=3)
+        box = (10, 10, 50, 50)
+        tracker.update([('book', 0.9, box)])
+        self.assertTrue(tracker.should_detect())
+        tracker.update([('book', 0.9, box)])
+        tracker.update([('book', 0.9, box)])
+        self.assertFalse(tracker.should_detect())
+        tracker.skip()
+        self.assertFalse(tracker.should_detect())
+        tracker.skip()
+        self.assertTrue(tracker.should_detect())
+
+
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        _, self.student = make_student()
+        self.paper, _, _ = make_paper()
+        submitted_at = timezone.now()
+        risks = [5.0, 1.0, 5.0, 3.0, 0.0, 5.0, 2.0]
+        self.attempts = [
+            StudentExamAttempt.objects.create(
+                student=self.student, exam_paper=self.paper, status='submitted',
+                submitted_at=submitted_at, risk_score=risk,
+            )
+            for risk in risks
+        ]
+        # Ongoing attempts are queued while they run, old submissions are not
+        self.ongoing = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper, risk_score=9.0)
+        self.attempts.append(self.ongoing)
+        StudentExamAttempt.objects.create(
+            student=self.student, exam_paper=self.paper, status='submitted',
+            submitted_at=submitted_at - timedelta(days=1), risk_score=9.0,
+        )
+        self.queue = ReviewQueue()
+        self.queue.flusher.started = True  # No flush thread in tests
+
+    def all_pages(self, limit):
+        items, cursor = self.queue.page(limit)
+        pages = [items]
+        while cursor:
+            cursor = parse_cursor(format_cursor(cursor))
+            items, cursor = self.queue.page(limit, cursor)
+            pages.append(items)
+        return pages
+
+    def test_pages_follow_risk_then_id(self):
+        expected = sorted(((a.id, a.risk_score) for a in self.attempts), key=lambda item: (-item[1], item[0]))
+        for limit in (1, 2, 3, 7, 10):
+            pages = self.all_pages(limit)
+            self.assertEqual([item for page in pages for item in page], expected)
+            self.assertTrue(all(len(page) <= limit for page in pages))
+
+    def test_risk_change_between_pages(self):
+        first, cursor = self.queue.page(3)
+        # An attempt already shown drops below the cursor, one not shown yet rises above it
+        dropped, risen = first[0][0], self.attempts[4].id
+        self.queue.add(dropped, -10.0)
+        self.queue.add(risen, 10.0)
+        rest = []
+        while cursor:
+            items, cursor = self.queue.page(3, cursor)
+            rest.extend(items)
+
+        # The pages resume exactly where the first one stopped, whatever moved meanwhile
+        boundary = (-first[-1][1], first[-1][0])
+        expected = [
+            (attempt_id, -neg_risk) for neg_risk, attempt_id in self.queue.order
+            if (neg_risk, attempt_id) > boundary
+        ]
+        self.assertEqual(rest, expected)
+        self.assertIn(dropped, [attempt_id for attempt_id, _ in rest])
+        self.assertNotIn(risen, [attempt_id for attempt_id, _ in rest])
+        unmoved = [attempt_id for attempt_id, _ in first[1:]]
+        self.assertFalse(set(unmoved) & {attempt_id for attempt_id, _ in rest})
+
+    def test_increments_survive_reload(self):
+        attempt = self.attempts[1]
+        self.queue.add(attempt.id, 2.5)
+        self.queue.load()
+        self.assertEqual(self.queue.risks[attempt.id], 3.5)
+        self.queue.flush()
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.risk_score, 3.5)
+        self.assertEqual(self.queue.risks[attempt.id], 3.5)
+
+    def test_ongoing_attempts_update_live(self):
+        self.queue.add(self.ongoing.id, 1.5)
+        self.assertEqual(self.queue.page(1)[0], [(self.ongoing.id, 10.5)])
+
+        # Started after the queue was loaded: queued on its first increment
+        started = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper, risk_score=1.0)
+        self.queue.add(started.id, 20.0)
+        self.assertEqual(self.queue.page(1)[0], [(started.id, 21.0)])
+        self.assertEqual(len(self.queue), len(self.attempts) + 1)
+
+    def test_parse_cursor(self):
+        self.assertEqual(parse_cursor('2.5_17'), (2.5, 17))
+        self.assertEqual(parse_cursor(format_cursor((2.5, 17))), (2.5, 17))
+        self.assertIsNone(parse_cursor('garbage'))
+        self.assertIsNone(parse_cursor(None))
+
+
+class CheatingEventSummaryTests(TestCase):
+    def test_summary(self):
+        _, student = make_student()
+        CheatingEvent.objects.create(
+            student=student, event_code=EventCode.OBJECT_DETECTED,
+            objects_mask=ObjectClass.CELL_PHONE, cheating_flag=True,
+        )
+        CheatingEvent.objects.create(
+            student=student, event_code=EventCode.OBJECT_DETECTED,
+            objects_mask=ObjectClass.CELL_PHONE | ObjectClass.BOOK, cheating_flag=True,
+        )
+        CheatingEvent.objects.create(student=student, event_code=EventCode.TAB_SWITCH, tab_switch_count=4)
+        CheatingEvent.objects.create(student=student, event_code=EventCode.GAZE_DETECTED)
+
+        summary = CheatingEvent.objects.filter(student=student).summary()
+        self.assertEqual(summary, {
+            'objects_mask': ObjectClass.CELL_PHONE | ObjectClass.BOOK,
+            'events': 4,
+            'flagged': 3,
+            'tab_switch_count': 4,
+        })
+        self.assertEqual(
+            CheatingEvent.objects.filter(student=student).objects_mask(),
+            ObjectClass.CELL_PHONE | ObjectClass.BOOK,
+        )
+
+    def test_summary_without_events(self):
+        self.assertEqual(CheatingEvent.objects.none().summary()['objects_mask'], 0)
+        summary = CheatingEvent.objects.filter(student__isnull=True).summary()
+        self.assertEqual(summary, {'objects_mask': 0, 'events': 0, 'flagged': 0, 'tab_switch_count': 0})
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        self.user, self.student = make_student()
+        self.staff = User.objects.create_user(username='staff', password='secret', is_staff=True)
+        self.paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper)
+
+    def test_reports_are_staff_only(self):
+        urls = [
+            f'/report_page/{self.student.id}/',
+            f'/download_report/{self.student.id}/',
+            f'/download_report/{self.student.id}/status/',
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 302, url)
+        self.client.force_login(self.user)
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 302, url)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(urls[0]).status_code, 200)
+
+    def test_version_changes_with_events_and_evidence(self):
+        versions = [reports.report_version(self.student.id, self.attempt.id)]
+        event = CheatingEvent.objects.create(
+            student=self.student, attempt=self.attempt, exam_paper=self.paper,
+            event_code=EventCode.AUDIO_DETECTED,
+        )
+        versions.append(reports.report_version(self.student.id, self.attempt.id))
+        CheatingAudio.objects.create(event=event, attempt=self.attempt, audio='cheating_audios/test.wav')
+        versions.append(reports.report_version(self.student.id, self.attempt.id))
+        StudentExamAttempt.objects.filter(id=self.attempt.id).update(total_marks_obtained=2.0, percentage=40.0)
+        versions.append(reports.report_version(self.student.id, self.attempt.id))
+
+        self.assertEqual(len(set(versions)), len(versions))
+        # Unchanged data gives the same version, whichever way it is computed
+        self.assertEqual(reports.report_version(self.student.id, self.attempt.id), versions[-1])
+        self.assertEqual(
+            reports.report_versions(StudentExamAttempt.objects.filter(id=self.attempt.id)),
+            {self.attempt.id: versions[-1]},
+        )
+
+
+class AnswerTests(TestCase):
+    def setUp(self):
+        self.user, self.student = make_student()
+        self.paper, self.mcq, self.subjective = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper)
+        self.snapshot = paper_snapshots.compile_paper(self.paper.id, 1)
+
+    def test_upsert_keeps_one_row_per_question(self):
+        answers.save_answers(self.attempt.id, {self.mcq.id: 'B', self.subjective.id: 'draft'}, self.snapshot)
+        answers.save_answers(self.attempt.id, {self.mcq.id: 'A'}, self.snapshot)
+        answers.save_answers(self.attempt.id, {self.subjective.id: 'final'}, self.snapshot)
+
+        self.assertEqual(StudentAnswer.objects.filter(attempt=self.attempt).count(), 2)
+        self.assertEqual(answers.saved_answers(self.attempt.id), {self.mcq.id: 'A', self.subjective.id: 'final'})
+        mcq_answer = StudentAnswer.objects.get(attempt=self.attempt, question=self.mcq)
+        self.assertTrue(mcq_answer.is_correct)
+        self.assertEqual(mcq_answer.marks_obtained, 2)
+
+    def test_parse_batch(self):
+        payload = {'answers': [
+            {'question': self.mcq.id, 'answer': 'b'},
+            {'question': self.mcq.id, 'answer': 'c'},
+            {'question': 999999, 'answer': 'A'},
+        ]}
+        self.assertEqual(answers.parse_batch(payload, self.snapshot), ({self.mcq.id: 'C'}, 1))
+        with self.assertRaises(answers.AnswerError):
+            answers.parse_batch({'answers': 'A'}, self.snapshot)
+
+    def test_finalize_fills_blanks(self):
+        answers.save_answers(self.attempt.id, {self.mcq.id: 'A'}, self.snapshot)
+        self.assertEqual(answers.finalize(self.attempt.id, self.snapshot), 2)
+        blank = StudentAnswer.objects.get(attempt=self.attempt, question=self.subjective)
+        self.assertEqual(blank.answer_text, '')
+
+    def test_finalize_regrades_against_current_key(self):
+        answers.save_answers(self.attempt.id, {self.mcq.id: 'B'}, self.snapshot)
+        # The answer key is corrected after the snapshot was taken
+        Question.objects.filter(id=self.mcq.id).update(correct_answer='B')
+
+        self.assertEqual(answers.finalize(self.attempt.id, self.snapshot), 2)
+        mcq_answer = StudentAnswer.objects.get(attempt=self.attempt, question=self.mcq)
+        self.assertTrue(mcq_answer.is_correct)
+        self.assertEqual(mcq_answer.marks_obtained, 2)
+
+    def test_second_submit_changes_nothing(self):
+        self.client.force_login(self.user)
+        url = reverse('submit_exam_new', args=[self.attempt.id])
+        with mock.patch.object(timeline.compaction_queue, 'submit') as compaction:
+            first = self.client.post(url, {f'answer_{self.mcq.id}': 'A'})
+            Question.objects.filter(id=self.mcq.id).update(correct_answer='B')
+            second = self.client.post(url, {f'answer_{self.mcq.id}': 'B'})
+
+        self.assertRedirects(first, reverse('exam_submission_success_new'), fetch_redirect_response=False)
+        self.assertRedirects(second, reverse('student_results'), fetch_redirect_response=False)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'submitted')
+        self.assertEqual(self.attempt.total_marks_obtained, 2)
+        self.assertEqual(StudentAnswer.objects.get(attempt=self.attempt, question=self.mcq).selected_option, 'A')
+        compaction.assert_called_once_with(self.attempt.id)
+
+
+class TelemetryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tab_switches._flusher.started = True  # No flush thread in tests
+        self.user, self.student = make_student()
+        self.paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper)
+
+    def event(self, event_type='blur', offset=timedelta(0)):
+        return {'type': event_type, 't': (timezone.now() + offset).timestamp() * 1000, 'detail': 'x'}
+
+    def test_parse_batch_rejects_bad_events(self):
+        payload = {'events': [
+            self.event('focus'),
+            self.event('visibility_hidden', timedelta(minutes=-1)),
+            self.event('keylogger'),
+            self.event('blur', telemetry.MAX_CLOCK_SKEW + timedelta(minutes=1)),
+            self.event('blur', -telemetry.MAX_CLOCK_SKEW - timedelta(minutes=1)),
+            {'type': 'copy', 't': 'yesterday'},
+            {'type': 'copy'},
+            'not an event',
+        ]}
+        events, rejected = telemetry.parse_batch(payload, self.attempt.id)
+        self.assertEqual([event.event_type for event in events], ['focus', 'visibility_hidden'])
+        self.assertEqual(rejected, 6)
+        self.assertTrue(all(event.attempt_id == self.attempt.id for event in events))
+
+    def test_parse_batch_rejects_malformed_batches(self):
+        with self.assertRaises(telemetry.TelemetryError):
+            telemetry.parse_batch({'events': [self.event()] * (telemetry.MAX_BATCH_SIZE + 1)}, self.attempt.id)
+        with self.assertRaises(telemetry.TelemetryError):
+            telemetry.parse_batch({'events': 'blur'}, self.attempt.id)
+        with self.assertRaises(telemetry.TelemetryError):
+            telemetry.parse_batch([self.event()], self.attempt.id)
+
+    def test_hidden_page_terminates_and_stops_proctoring(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['active_attempt_id'] = self.attempt.id
+        session.save()
+        url = reverse('record_telemetry', args=[self.attempt.id])
+        events = [self.event('visibility_hidden')] * (tab_switches.TERMINATION_THRESHOLD + 1)
+
+        with mock.patch('proctoring.views.stop_proctoring') as stop_proctoring:
+            response = self.client.post(url, {'events': events}, content_type='application/json')
+
+        self.assertEqual(response.json()['status'], 'terminated')
+        self.assertEqual(response.json()['stored'], len(events))
+        stop_proctoring.assert_called_once_with(self.attempt.id)
+
+
+class TabSwitchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tab_switches._flusher.started = True  # No flush threads in tests
+        review_queue.flusher.started = True
+        self.user, self.student = make_student()
+        self.paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper)
+
+    def assertStored(self, switches):
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.tab_switch_count, switches)
+        events = CheatingEvent.objects.filter(attempt=self.attempt, event_code=EventCode.TAB_SWITCH)
+        self.assertEqual(list(events.values_list('tab_switch_count', flat=True)), [switches] if switches else [])
+        self.assertEqual(ProctoringEvent.objects.filter(attempt=self.attempt).count(), switches)
+
+    def test_burst_interleaved_with_flushes(self):
+        for i in range(1, 501):
+            count = tab_switches.record_tab_switch(self.attempt.id, 1 + i % 3)
+            if i % 37 == 0:
+                tab_switches.flush()
+            if i % 101 == 0:
+                # Flushing twice in a row writes nothing the second time
+                tab_switches.flush([self.attempt.id])
+        tab_switches.flush()
+        expected = sum(1 + i % 3 for i in range(1, 501))
+        self.assertEqual(count, expected)
+        self.assertStored(expected)
+        self.assertEqual(tab_switches.current_count(self.attempt), expected)
+        tab_switches.flush([self.attempt.id])
+        self.assertStored(expected)
+
+    def test_flush_skips_claimed_attempt(self):
+        tab_switches.record_tab_switch(self.attempt.id, 3)
+        # Another process is flushing this attempt
+        cache.add(tab_switches._claim_key(self.attempt.id), 1)
+        tab_switches.flush()
+        self.assertStored(0)
+        self.assertIn(self.attempt.id, tab_switches._dirty_attempts)
+
+        cache.delete(tab_switches._claim_key(self.attempt.id))
+        tab_switches.flush()
+        self.assertStored(3)
+
+    def test_failed_write_returns_switches(self):
+        tab_switches.record_tab_switch(self.attempt.id, 4)
+        with mock.patch.object(tab_switches, '_write', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                tab_switches.flush()
+        self.assertIn(self.attempt.id, tab_switches._dirty_attempts)
+        self.assertEqual(cache.get(tab_switches._pending_key(self.attempt.id)), 4)
+
+        tab_switches.record_tab_switch(self.attempt.id, 1)
+        tab_switches.flush()
+        self.assertStored(5)
+
+    def test_legacy_page_keeps_one_event(self):
+        self.client.force_login(self.user)
+        for expected in (1, 2, 3):
+            response = self.client.post(reverse('record_tab_switch'))
+            self.assertEqual(response.json()['count'], expected)
+        events = CheatingEvent.objects.filter(student=self.student, event_code=EventCode.TAB_SWITCH)
+        self.assertEqual(list(events.values_list('tab_switch_count', flat=True)), [3])
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        _, self.student = make_student()
+        self.paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper)
+        self.start = timezone.now().replace(microsecond=0)
+
+    def record(self, seconds, code=EventCode.GAZE_DETECTED, confidence=0.5):
+        timeline.record(self.attempt.id, code, confidence, self.start + timedelta(seconds=seconds))
+
+    def times(self, arrays):
+        return [int(ms - self.start.timestamp() * 1000) // 1000 for ms in arrays['time']]
+
+    def test_compact(self):
+        self.record(10, EventCode.OBJECT_DETECTED, 0.9)
+        self.record(0)
+        self.record(5, EventCode.TAB_SWITCH, 1.0)
+        compacted = timeline.compact(self.attempt.id)
+
+        self.assertEqual(compacted.event_count, 3)
+        self.assertEqual(compacted.first_event_at, self.start)
+        self.assertEqual(compacted.last_event_at, self.start + timedelta(seconds=10))
+        self.assertFalse(ProctoringEvent.objects.filter(attempt=self.attempt).exists())
+        arrays = timeline.from_blob(AttemptTimeline.objects.get(attempt=self.attempt).data)
+        self.assertEqual(self.times(arrays), [0, 5, 10])
+        self.assertEqual(arrays['code'].tolist(), [EventCode.GAZE_DETECTED, EventCode.TAB_SWITCH, EventCode.OBJECT_DETECTED])
+        self.assertAlmostEqual(float(arrays['confidence'][2]), 0.9, places=5)
+
+    def test_recompaction_merges_into_blob(self):
+        self.record(0)
+        self.record(20)
+        timeline.compact(self.attempt.id)
+        # Late events, one older than the newest compacted one
+        self.record(10)
+        self.record(30)
+        compacted = timeline.compact(self.attempt.id)
+
+        self.assertEqual(AttemptTimeline.objects.filter(attempt=self.attempt).count(), 1)
+        self.assertEqual(compacted.event_count, 4)
+        self.assertEqual(self.times(timeline.load(self.attempt.id)), [0, 10, 20, 30])
+        self.assertFalse(ProctoringEvent.objects.filter(attempt=self.attempt).exists())
+        # Nothing new: the timeline is left as it is
+        self.assertEqual(timeline.compact(self.attempt.id).event_count, 4)
+
+    def test_load_combines_blob_and_raw_rows(self):
+        self.assertEqual(timeline.load(self.attempt.id)['time'].tolist(), [])
+        self.record(0)
+        self.record(20)
+        timeline.compact(self.attempt.id)
+        self.record(10, EventCode.AUDIO_DETECTED)
+        self.record(40)
+
+        arrays = timeline.load(self.attempt.id)
+        self.assertEqual(self.times(arrays), [0, 10, 20, 40])
+        self.assertEqual(arrays['code'][1], EventCode.AUDIO_DETECTED)
+        self.assertEqual(ProctoringEvent.objects.filter(attempt=self.attempt).count(), 2)
+
+    def test_compact_finished_skips_ongoing(self):
+        self.record(0)
+        self.assertEqual(timeline.compact_finished(), 0)
+        StudentExamAttempt.objects.filter(id=self.attempt.id).update(status='submitted')
+        self.assertEqual(timeline.compact_finished(), 1)
+        self.assertEqual(AttemptTimeline.objects.get(attempt=self.attempt).event_count, 1)
+
+    def test_queued_compaction(self):
+        self.record(0)
+        queue = timeline.CompactionQueue()
+        queue.started = True  # Run the job here instead of on a thread
+        with mock.patch.object(timeline, 'COMPACT_DELAY', 0):
+            self.assertTrue(queue.submit(self.attempt.id))
+            self.assertFalse(queue.submit(self.attempt.id))
+        _, job = queue.queue.get_nowait()
+        queue.handler(job)
+        self.assertEqual(AttemptTimeline.objects.get(attempt=self.attempt).event_count, 1)
+
+
+class RiskScoreTests(TestCase):
+    # (seconds from the start, event code, confidence)
+    EVENTS = [
+        (0, EventCode.GAZE_DETECTED, 0.8),
+        (2, EventCode.GAZE_DETECTED, 0.9),
+        (4.5, EventCode.AUDIO_DETECTED, 0.6),
+        (5, EventCode.GAZE_DETECTED, 0.7),
+        (6, EventCode.TAB_SWITCH, 1.0),
+        (7, EventCode.TAB_SWITCH, 1.0),
+        (12, EventCode.AUDIO_DETECTED, 0.75),
+        (30, EventCode.GAZE_DETECTED, 1.0),
+        (31.25, EventCode.OBJECT_DETECTED, 0.95),
+        (38, EventCode.GAZE_DETECTED, 0.5),
+        (60, EventCode.AUDIO_DETECTED, 0.5),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        review_queue.flusher.started = True  # No flush thread in tests
+        _, self.student = make_student()
+        self.paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper)
+
+    def test_incremental_score_matches_backfill(self):
+        start = timezone.now()
+        incremental = 0.0
+        for seconds, code, confidence in self.EVENTS:
+            when = start + timedelta(seconds=seconds)
+            timeline.record(self.attempt.id, code, confidence, when)
+            incremental += risk.add_event(self.attempt.id, code, confidence, when)
+
+        backfilled = risk.score_arrays(timeline.load(self.attempt.id))
+        self.assertAlmostEqual(incremental, backfilled, places=4)
+        # Continued episodes add less than their full weight
+        full = sum(risk.EVENT_WEIGHTS[code] * confidence for _, code, confidence in self.EVENTS)
+        self.assertLess(backfilled, full)
+
+        # Compaction does not change the score
+        timeline.compact(self.attempt.id)
+        self.assertAlmostEqual(risk.score_attempt(self.attempt), backfilled, places=4)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        _, self.student = make_student()
+        self.paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(
+            student=self.student, exam_paper=self.paper, status='submitted', submitted_at=timezone.now(),
+        )
+        self.event = CheatingEvent.objects.create(
+            student=self.student, attempt=self.attempt, event_code=EventCode.OBJECT_DETECTED,
+        )
+
+    def store(self, name, data=b'data', age=timedelta(days=2)):
+        name = default_storage.save(name, ContentFile(data))
+        when = time.time() - age.total_seconds()
+        os.utime(default_storage.path(name), (when, when))
+        return name
+
+    def test_sweep_keeps_referenced_and_derived_files(self):
+        kept = self.store('cheating_images/2026/10/kept.jpg')
+        derived = [self.store(thumbnail_name(kept, 'small')), self.store(overlay_name(kept))]
+        CheatingImage.objects.create(event=self.event, attempt=self.attempt, image=kept)
+        orphan = self.store('cheating_images/2026/10/orphan.jpg')
+        orphan_thumbnail = self.store(thumbnail_name(orphan, 'small'))
+        young = self.store('cheating_images/2026/10/young.jpg', age=timedelta(hours=1))
+
+        totals = retention.sweep_orphans(dry_run=True)
+        self.assertEqual(totals['cheating_images'], (6, 2))
+        self.assertTrue(default_storage.exists(orphan))
+
+        totals = retention.sweep_orphans()
+        self.assertEqual(totals['cheating_images'], (6, 2))
+        for name in [kept, young] + derived:
+            self.assertTrue(default_storage.exists(name), name)
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(orphan_thumbnail))
+
+    def test_archive_attempt(self):
+        image = self.store('cheating_images/2026/10/frame.jpg', b'jpeg')
+        audio = self.store('cheating_audios/2026/10/clip.wav', b'wave')
+        CheatingImage.objects.create(event=self.event, attempt=self.attempt, image=image)
+        CheatingImage.objects.create(event=self.event, attempt=self.attempt, image='cheating_images/2026/10/gone.jpg')
+        CheatingAudio.objects.create(event=self.event, attempt=self.attempt, audio=audio)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            name = retention.archive_attempt(self.attempt)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.evidence_archive.name, name)
+        with default_storage.open(name, 'rb') as f, zipfile.ZipFile(f) as archive:
+            manifest = json.loads(archive.read('manifest.json'))
+            members = {entry['original_name']: entry for entry in manifest['files']}
+            self.assertEqual(archive.read(members[image]['member']), b'jpeg')
+            self.assertEqual(archive.read(members[audio]['member']), b'wave')
+        self.assertTrue(members['cheating_images/2026/10/gone.jpg']['missing'])
+        self.assertFalse(CheatingImage.objects.filter(attempt=self.attempt).exists())
+        self.assertFalse(CheatingAudio.objects.filter(attempt=self.attempt).exists())
+        self.assertFalse(default_storage.exists(image))
+        self.assertFalse(default_storage.exists(audio))
+
+    def test_failed_archive_keeps_evidence(self):
+        image = self.store('cheating_images/2026/10/frame.jpg', b'jpeg')
+        CheatingImage.objects.create(event=self.event, attempt=self.attempt, image=image)
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, storage.location)
+
+        with mock.patch.object(storage, 'save', side_effect=OSError('disk full')):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(OSError):
+                    retention.archive_attempt(self.attempt, storage)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.evidence_archive.name, '')
+        self.assertTrue(CheatingImage.objects.filter(attempt=self.attempt).exists())
+        self.assertTrue(default_storage.exists(image))
+
+
+class PaperSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        paper_snapshots._local.clear()
+        _, self.student = make_student()
+        self.paper, self.mcq, self.subjective = make_paper()
+
+    def test_question_changes_retire_the_snapshot(self):
+        first = paper_snapshots.get(self.paper.id)
+        self.assertEqual([q['id'] for q in first['questions']], [self.mcq.id, self.subjective.id])
+        self.assertIs(paper_snapshots.get(self.paper.id), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mcq.question_text = 'Q1 (corrected)'
+            self.mcq.save()
+        edited = paper_snapshots.get(self.paper.id)
+        self.assertNotEqual(edited['version'], first['version'])
+        self.assertEqual(edited['questions'][0]['text'], 'Q1 (corrected)')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subjective.delete()
+        self.assertEqual([q['id'] for q in paper_snapshots.get(self.paper.id)['questions']], [self.mcq.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(exam_paper=self.paper, question_text='Q3', question_type='subjective', order=3)
+        self.assertEqual(len(paper_snapshots.get(self.paper.id)['questions']), 2)
+
+    def test_shuffle_is_seeded_per_attempt(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for order in range(3, 9):
+                Question.objects.create(
+                    exam_paper=self.paper, question_text=f'Q{order}', order=order, correct_answer='B',
+                    option_a='a', option_b='b', option_c='c', option_d='d',
+                )
+            self.paper.shuffle_questions = self.paper.shuffle_options = True
+            self.paper.save()
+
+        attempts = [
+            StudentExamAttempt.objects.create(student=self.student, exam_paper=self.paper) for _ in range(4)
+        ]
+        shown = [paper_snapshots.for_attempt(attempt) for attempt in attempts]
+        # A reload shows the same order
+        self.assertEqual(paper_snapshots.for_attempt(attempts[0]), shown[0])
+        self.assertGreater(len({tuple(q['id'] for q in questions) for questions in shown}), 1)
+
+        for questions in shown:
+            self.assertEqual(sorted(q['id'] for q in questions), sorted(self.paper.questions.values_list('id', flat=True)))
+            for question in questions:
+                self.assertNotIn('correct_answer', question)
+                if question['type'] == 'mcq':
+                    # Relabelled in the order shown, graded on the original letters
+                    self.assertEqual([option['label'] for option in question['options']], ['A', 'B', 'C', 'D'])
+                    self.assertEqual(
+                        {option['value']: option['text'] for option in question['options']},
+                        {'A': 'a', 'B': 'b', 'C': 'c', 'D': 'd'},
+                    )
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        _, student = make_student()
+        event = CheatingEvent.objects.create(student=student, event_code=EventCode.OBJECT_DETECTED)
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), 'red').save(buffer, format='JPEG')
+        name = default_storage.save('cheating_images/2026/10/frame.jpg', ContentFile(buffer.getvalue()))
+        self.image = CheatingImage.objects.create(event=event, image=name)
+
+    def test_pages_do_not_ask_the_storage(self):
+        image = self.image.image
+        with mock.patch.object(thumbnails.thumbnail_queue, 'submit') as submit, \
+                mock.patch.object(FileSystemStorage, 'exists') as exists:
+            self.assertEqual(thumbnails.thumbnail_url(image, 'medium'), image.url)
+            self.assertEqual(thumbnails.srcset(image), '')
+        self.assertEqual(submit.call_count, 2)
+        exists.assert_not_called()
+
+        thumbnails._generate_job((image.storage, image.name))
+        for size in thumbnails.SIZES:
+            self.assertTrue(default_storage.exists(thumbnails.thumbnail_name(image.name, size)))
+
+        image = CheatingImage.objects.get(id=self.image.id).image
+        with mock.patch.object(thumbnails.thumbnail_queue, 'submit') as submit, \
+                mock.patch.object(FileSystemStorage, 'exists') as exists:
+            medium = thumbnails.thumbnail_url(image, 'medium')
+            srcset = thumbnails.srcset(image)
+        submit.assert_not_called()
+        exists.assert_not_called()
+        self.assertEqual(medium, default_storage.url(thumbnails.thumbnail_name(image.name, 'medium')))
+        self.assertEqual(srcset.count('w, '), len(thumbnails.SIZES) - 1)
+
+    def test_new_image_name_needs_new_thumbnails(self):
+        thumbnails.mark_generated(self.image.image.name)
+        self.image.refresh_from_db()
+        self.assertTrue(thumbnails.has_thumbnails(self.image.image))
+        self.image.image.name = 'cheating_images/2026/10/other.jpg'
+        self.assertFalse(thumbnails.has_thumbnails(self.image.image))
+
+
+class ObjectStorage:
+    """A storage without local paths, like an S3 bucket (files kept in a FileSystemStorage underneath)."""
+
+    def __init__(self, location):
+        self.files = FileSystemStorage(location=location)
+
+    def path(self, name):
+        raise NotImplementedError
+
+    def __getattr__(self, name):
+        return getattr(self.files, name)
+
+
+class ContactSheetTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        _, student = make_student()
+        paper, _, _ = make_paper()
+        self.attempt = StudentExamAttempt.objects.create(student=student, exam_paper=paper)
+        self.event = CheatingEvent.objects.create(
+            student=student, attempt=self.attempt, event_code=EventCode.OBJECT_DETECTED,
+        )
+
+    def add_image(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (320, 240), color).save(buffer, format='JPEG')
+        name = default_storage.save('cheating_images/2026/10/frame.jpg', ContentFile(buffer.getvalue()))
+        return CheatingImage.objects.create(event=self.event, attempt=self.attempt, image=name)
+
+    def test_update_adds_new_tiles(self):
+        images = [self.add_image(color) for color in ('red', 'green', 'blue')]
+        index = contact_sheets.update(self.attempt.id)
+        self.assertEqual([frame['id'] for frame in index['frames']], [image.id for image in images])
+        self.assertEqual(index['sheets'], [{'count': 3}])
+        self.assertFalse(contact_sheets.is_stale(self.attempt.id, index))
+
+        latest = self.add_image('white')
+        self.assertTrue(contact_sheets.is_stale(self.attempt.id, index))
+        index = contact_sheets.update(self.attempt.id)
+        self.assertEqual(index['frames'][-1]['id'], latest.id)
+        self.assertEqual(index['frames'][-1]['x'], 3 * contact_sheets.TILE_WIDTH)
+        self.assertEqual(contact_sheets.load_index(self.attempt.id), index)
+        with default_storage.open(contact_sheets.sheet_name(self.attempt.id, 0), 'rb') as f:
+            self.assertEqual(Image.open(f).size, (contact_sheets.COLUMNS * contact_sheets.TILE_WIDTH, contact_sheets.TILE_HEIGHT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            contact_sheets.reset(self.attempt.id)
+        self.assertIsNone(contact_sheets.load_index(self.attempt.id))
+        self.assertFalse(default_storage.exists(contact_sheets.sheet_name(self.attempt.id, 0)))
+
+    def test_replace_keeps_the_name(self):
+        for storage in (FileSystemStorage(location=tempfile.mkdtemp()), ObjectStorage(tempfile.mkdtemp())):
+            self.addCleanup(shutil.rmtree, storage.location)
+            contact_sheets._replace(storage, 'contact_sheets/attempt_1.json', b'old')
+            contact_sheets._replace(storage, 'contact_sheets/attempt_1.json', b'new')
+            self.assertEqual(storage.listdir('contact_sheets'), ([], ['attempt_1.json']))
+            with storage.open('contact_sheets/attempt_1.json', 'rb') as f:
+                self.assertEqual(f.read(), b'new')
+
+    def test_attempts_are_locked_separately(self):
+        other_done = threading.Event()
+
+        def update_other():
+            with contact_sheets._attempt_lock(2):
+                other_done.set()
+
+        with contact_sheets._attempt_lock(1):
+            thread = threading.Thread(target=update_other)
+            thread.start()
+            self.assertTrue(other_done.wait(5))
+            thread.join()
+        self.assertEqual(contact_sheets._update_locks, {})
+
+
+def _prepare_without_faces(photo_bytes, password):
+    # Stands in for the face encoder, which needs dlib and a real face
+    if photo_bytes == b'no face':
+        return None, None, "No face detected in photo"
+    return [0.0] * 128, make_password(password or None), None
+
+
+@mock.patch.object(bulk_onboarding, '_prepare_record', _prepare_without_faces)
+@mock.patch.object(bulk_onboarding, 'process_pool', lambda workers: ThreadPoolExecutor(1))
+@mock.patch.object(thumbnails.thumbnail_queue, 'submit')
+class BulkOnboardingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.csv_path = os.path.join(directory, 'students.csv')
+        self.archive_path = os.path.join(directory, 'photos.zip')
+        with zipfile.ZipFile(self.archive_path, 'w') as archive:
+            for name in ('a.jpg', 'b.jpg', 'c.jpg', 'd.jpg'):
+                archive.writestr(name, f'photo {name}')
+            archive.writestr('blank.jpg', b'no face')
+
+    def write_csv(self, text):
+        with open(self.csv_path, 'w') as f:
+            f.write(text)
+
+    def stored_photos(self):
+        return [name for _, _, files in os.walk(self.media_root) for name in files]
+
+    def test_rows_are_validated(self, submit):
+        User.objects.create_user(username='taken@example.com', email='taken@example.com')
+        self.write_csv(
+            "name,email,photo,password\n"
+            "Ann Lee,ann@example.com,a.jpg,secret\n"
+            ",nameless@example.com,b.jpg,\n"
+            "Ann Again,ANN@example.com,c.jpg,\n"
+            "Taken,taken@example.com,c.jpg,\n"
+            "Lost,lost@example.com,missing.jpg,\n"
+            "Blank,blank@example.com,blank.jpg,\n"
+            "Bo Ray,bo@example.com,d.jpg,\n"
+        )
+        report = bulk_onboarding.import_students(self.csv_path, self.archive_path, auto_approve=True, batch_size=3)
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual([(failure.row, failure.reason) for failure in report.failures], [
+            (3, "Missing name, email or photo"),
+            (4, "Duplicate email in CSV"),
+            (5, "Email already exists"),
+            (6, "Photo 'missing.jpg' not found in archive"),
+            (7, "No face detected in photo"),
+        ])
+        ann = Student.objects.get(email='ann@example.com')
+        self.assertEqual(ann.approval_status, 'approved')
+        self.assertTrue(ann.user.check_password('secret'))
+        self.assertFalse(Student.objects.get(email='bo@example.com').user.has_usable_password())
+        self.assertEqual(len(self.stored_photos()), 2)
+        self.assertEqual(submit.call_count, 2)
+
+    def test_missing_columns(self, submit):
+        self.write_csv("name,email\nAnn,ann@example.com\n")
+        with self.assertRaises(ValueError):
+            bulk_onboarding.import_students(self.csv_path, self.archive_path)
+
+    def test_csv_file_is_closed(self, submit):
+        self.write_csv("name,email,photo\nAnn,ann@example.com,a.jpg\nBo,bo@example.com,b.jpg\n")
+        opened = []
+
+        def tracking_open(*args, **kwargs):
+            opened.append(open(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch.object(bulk_onboarding, 'open', tracking_open, create=True):
+            rows = bulk_onboarding._read_rows(self.csv_path)
+            self.assertEqual(next(rows)[1]['email'], 'ann@example.com')
+            rows.close()
+            self.assertEqual(len(list(bulk_onboarding._read_rows(self.csv_path))), 2)
+        self.assertEqual(len(opened), 2)
+        self.assertTrue(all(f.closed for f in opened))
+
+    def test_failed_batch_deletes_its_photos(self, submit):
+        self.write_csv("name,email,photo\nAnn,ann@example.com,a.jpg\nBo,bo@example.com,b.jpg\n")
+
+        def fail_student_insert(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "proctoring_student"'):
+                raise RuntimeError('insert failed')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(fail_student_insert):
+            report = bulk_onboarding.import_students(self.csv_path, self.archive_path)
+
+        self.assertEqual(report.created, 0)
+        self.assertEqual([failure.row for failure in report.failures], [2, 3])
+        self.assertIn('insert failed', report.failures[0].reason)
+        self.assertFalse(User.objects.filter(email__in=['ann@example.com', 'bo@example.com']).exists())
+        self.assertEqual(self.stored_photos(), [])
+        submit.assert_not_called()
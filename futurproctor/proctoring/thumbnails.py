@@ -0,0 +1,128 @@
+# thumbnails.py - Downscaled WebP copies of student photos and evidence images
+#
+# Pages that list many images (student approval, reports, the Django admin)
+# show a small thumbnail instead of the original upload. Thumbnails are made
+# by a background thread after an image is saved and stored next to the
+# original as <name>_<px>.webp. Until they exist the original is served and
+# the thumbnails are queued, so a page never waits for them.
+#
+# Once made, the image's row records it (thumbnail_source holds the name they
+# were made from), so rendering a page of images never asks the storage
+# whether each thumbnail exists: with an object store that would be one HEAD
+# request per image.
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import CheatingImage, Student
+from .worker_threads import WorkerQueue
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each thumbnail size
+SIZES = {
+    'small': 96,    # lists and the admin
+    'medium': 320,  # report pages
+}
+
+WEBP_QUALITY = 80
+
+# Models with thumbnails, and the field holding their image
+THUMBNAILED_FIELDS = [(Student, 'photo'), (CheatingImage, 'image')]
+
+
+def thumbnail_name(name, size):
+    """Storage name of the `size` thumbnail of the file stored as `name`."""
+    root, _ = os.path.splitext(name)
+    return f"{root}_{SIZES[size]}.webp"
+
+
+def is_thumbnail(name):
+    return any(name.endswith(f"_{px}.webp") for px in SIZES.values())
+
+
+def generate(storage, name, force=False):
+    """Create the missing thumbnails of one stored image. Returns how many were written."""
+    targets = {size: thumbnail_name(name, size) for size in SIZES}
+    if not force:
+        targets = {size: target for size, target in targets.items() if not storage.exists(target)}
+    if not targets:
+        return 0
+
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    for size, target in targets.items():
+        thumb = image.copy()
+        thumb.thumbnail((SIZES[size], SIZES[size]))
+        buffer = io.BytesIO()
+        thumb.save(buffer, format='WEBP', quality=WEBP_QUALITY)
+        # Replace rather than let the storage pick another name
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buffer.getvalue()))
+    return len(targets)
+
+
+def mark_generated(name):
+    """Record on the rows storing `name` that its thumbnails exist."""
+    for model, field in THUMBNAILED_FIELDS:
+        model.objects.filter(**{field: name}).update(thumbnail_source=name)
+
+
+def has_thumbnails(field_file):
+    """True when the thumbnails of the file were made (read from its row, not the storage)."""
+    return bool(field_file) and getattr(field_file.instance, 'thumbnail_source', None) == field_file.name
+
+
+def _generate_job(job):
+    storage, name = job
+    try:
+        generate(storage, name)
+        mark_generated(name)
+    except Exception as e:
+        logger.warning(f"Error creating thumbnails of {name}: {e}")
+
+
+class ThumbnailQueue(WorkerQueue):
+    """Images waiting for thumbnails, processed by one daemon thread."""
+
+    def __init__(self):
+        super().__init__(_generate_job, 'thumbnail queue', key=lambda job: (id(job[0]), job[1]))
+
+    def submit(self, field_file):
+        """Queue thumbnails for a saved ImageField/FileField value (ignored when empty or already queued)."""
+        if not field_file or is_thumbnail(field_file.name):
+            return False
+        return super().submit((field_file.storage, field_file.name))
+
+
+thumbnail_queue = ThumbnailQueue()
+
+
+def thumbnail_url(field_file, size='small'):
+    """URL of the `size` thumbnail, or of the original while the thumbnail is not made yet."""
+    if not field_file:
+        return ''
+    if has_thumbnails(field_file):
+        return field_file.storage.url(thumbnail_name(field_file.name, size))
+    thumbnail_queue.submit(field_file)
+    return field_file.url
+
+
+def srcset(field_file):
+    """srcset attribute value listing every thumbnail, for the browser to choose from ('' until they are made)."""
+    if not field_file:
+        return ''
+    if not has_thumbnails(field_file):
+        thumbnail_queue.submit(field_file)
+        return ''
+    return ', '.join(
+        f"{field_file.storage.url(thumbnail_name(field_file.name, size))} {px}w" for size, px in SIZES.items()
+    )
@@ -0,0 +1,190 @@
+# timeline.py - Append-only proctoring event log and per-attempt compaction
+#
+# While an attempt runs, every detection is appended as a ProctoringEvent row.
+# Once the attempt is finished its rows are folded into one AttemptTimeline:
+# three NumPy arrays (time, EventCode, confidence) saved as a single blob, so
+# reports and analytics read one object per attempt instead of many rows.
+#
+# submit_exam_new queues the compaction on a background thread, COMPACT_DELAY
+# seconds after submission. Like every worker_threads queue it is lost when
+# the process exits, so the compact_timelines management command must also
+# run from cron to pick up attempts whose compaction never ran.
+import io
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+
+from .models import AttemptTimeline, EventCode, ProctoringEvent, StudentExamAttempt
+from .worker_threads import WorkerQueue
+
+logger = logging.getLogger(__name__)
+
+# Attempts in these states no longer receive events and can be compacted
+FINISHED_STATUSES = ['submitted', 'evaluated', 'cancelled']
+
+# Seconds to wait after submission before compacting, so the proctoring
+# threads can finish their last frame
+COMPACT_DELAY = 30
+
+
+def record(attempt_id, event_code, confidence=1.0, timestamp=None):
+    """Append one event to the attempt's log (no-op for the legacy exam page)."""
+    if attempt_id is None:
+        return
+    event = ProctoringEvent(attempt_id=attempt_id, event_code=event_code, confidence=confidence)
+    if timestamp is not None:
+        event.timestamp = timestamp
+    event.save()
+
+
+def empty_arrays():
+    return {
+        'time': np.zeros(0, dtype=np.int64),
+        'code': np.zeros(0, dtype=np.uint8),
+        'confidence': np.zeros(0, dtype=np.float32),
+    }
+
+
+def _rows_to_arrays(rows):
+    """Convert (event_code, timestamp, confidence) rows to timeline arrays."""
+    if not rows:
+        return empty_arrays()
+    event_codes, timestamps, confidences = zip(*rows)
+    return {
+        # Milliseconds since the epoch
+        'time': np.array([int(ts.timestamp() * 1000) for ts in timestamps], dtype=np.int64),
+        'code': np.array(event_codes, dtype=np.uint8),
+        'confidence': np.array(confidences, dtype=np.float32),
+    }
+
+
+def _merge(a, b):
+    """Concatenate two timelines and keep them sorted by time."""
+    merged = {key: np.concatenate([a[key], b[key]]) for key in a}
+    order = np.argsort(merged['time'], kind='stable')
+    return {key: values[order] for key, values in merged.items()}
+
+
+def to_blob(arrays):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def from_blob(data):
+    with np.load(io.BytesIO(bytes(data))) as blob:
+        return {key: blob[key] for key in ('time', 'code', 'confidence')}
+
+
+def _to_datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def compact(attempt_id):
+    """
+    Fold the attempt's raw events into its timeline blob and delete them.
+    Safe to run again: events appended after a compaction are merged in.
+    Returns the AttemptTimeline, or None when there is nothing to compact.
+    """
+    with transaction.atomic():
+        rows = list(
+            ProctoringEvent.objects.filter(attempt_id=attempt_id)
+            .order_by('timestamp', 'id')
+            .values_list('id', 'event_code', 'timestamp', 'confidence')
+        )
+        timeline = AttemptTimeline.objects.select_for_update().filter(attempt_id=attempt_id).first()
+        if not rows:
+            return timeline
+
+        arrays = _rows_to_arrays([row[1:] for row in rows])
+        if timeline is not None:
+            arrays = _merge(from_blob(timeline.data), arrays)
+        else:
+            timeline = AttemptTimeline(attempt_id=attempt_id)
+
+        timeline.data = to_blob(arrays)
+        timeline.event_count = len(arrays['time'])
+        timeline.first_event_at = _to_datetime(arrays['time'][0])
+        timeline.last_event_at = _to_datetime(arrays['time'][-1])
+        timeline.save()
+
+        # Only the rows read above; anything appended meanwhile waits for the next run
+        ProctoringEvent.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+    logger.info(f"Compacted {len(rows)} events for attempt {attempt_id}")
+    return timeline
+
+
+def compact_finished(limit=None):
+    """Compact every finished attempt that still has raw events. Returns how many were compacted."""
+    attempt_ids = (
+        StudentExamAttempt.objects.filter(status__in=FINISHED_STATUSES, proctoring_events__isnull=False)
+        .values_list('id', flat=True)
+        .distinct()
+    )
+    if limit:
+        attempt_ids = attempt_ids[:limit]
+
+    compacted = 0
+    for attempt_id in list(attempt_ids):
+        try:
+            compact(attempt_id)
+            compacted += 1
+        except Exception as e:
+            logger.error(f"Error compacting timeline of attempt {attempt_id}: {e}")
+    return compacted
+
+
+def _compact_job(job):
+    attempt_id, due = job
+    # Jobs are queued in submission order, so each waits at most COMPACT_DELAY
+    time.sleep(max(0.0, due - time.monotonic()))
+    compact(attempt_id)
+
+
+class CompactionQueue(WorkerQueue):
+    """Submitted attempts waiting to be compacted, processed by one daemon thread."""
+
+    def __init__(self):
+        super().__init__(_compact_job, 'timeline compaction queue', key=lambda job: job[0])
+
+    def submit(self, attempt_id):
+        """Compact the attempt COMPACT_DELAY seconds from now (ignored when already queued)."""
+        return super().submit((attempt_id, time.monotonic() + COMPACT_DELAY))
+
+
+compaction_queue = CompactionQueue()
+
+
+def load(attempt_id):
+    """The attempt's full timeline as arrays: the compacted blob plus any raw events not compacted yet."""
+    timeline = AttemptTimeline.objects.filter(attempt_id=attempt_id).only('data').first()
+    arrays = from_blob(timeline.data) if timeline is not None else empty_arrays()
+
+    rows = list(
+        ProctoringEvent.objects.filter(attempt_id=attempt_id)
+        .order_by('timestamp', 'id')
+        .values_list('event_code', 'timestamp', 'confidence')
+    )
+    if rows:
+        arrays = _merge(arrays, _rows_to_arrays(rows))
+    return arrays
+
+
+def summary(arrays):
+    """Per event type: count, first/last time and mean confidence, for reports."""
+    result = []
+    for code in np.unique(arrays['code']):
+        mask = arrays['code'] == code
+        times = arrays['time'][mask]
+        result.append({
+            'event_type': EventCode(code).label if code in EventCode.values else EventCode.OTHER.label,
+            'count': int(mask.sum()),
+            'first': _to_datetime(times.min()),
+            'last': _to_datetime(times.max()),
+            'mean_confidence': round(float(arrays['confidence'][mask].mean()), 2),
+        })
+    return result
@@ -59,12 +59,12 @@
 
 
 
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 from . import admin_views
+from . import media_views
 from . import student_exam_views
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     # Original URLs
@@ -85,12 +85,16 @@ urlpatterns = [
     path('report_page/<int:student_id>/', views.report_page, name='report_page'),
     path('logout/', views.logout, name='logout'),
     path('download_report/<int:student_id>/', views.download_report, name='download_report'),
+    path('download_report/<int:student_id>/status/', views.report_status, name='report_status'),
     
     # ========== NEW ADMIN URLS ==========
     path('admin/dashboard-enhanced/', admin_views.admin_dashboard_enhanced, name='admin_dashboard_enhanced'),
+    path('admin/dashboard-enhanced/stats/', admin_views.admin_dashboard_stats, name='admin_dashboard_stats'),
     
     # Student Approval URLs
     path('admin/students/approval/', admin_views.student_approval_list, name='student_approval_list'),
+    path('admin/students/import/', admin_views.bulk_student_import, name='bulk_student_import'),
+    path('admin/students/import/status/', admin_views.bulk_student_import_status, name='bulk_student_import_status'),
     path('admin/students/<int:student_id>/approve/', admin_views.approve_student, name='approve_student'),
     path('admin/students/<int:student_id>/reject/', admin_views.reject_student, name='reject_student'),
     
@@ -99,12 +103,22 @@ urlpatterns = [
     path('admin/exams/create/', admin_views.exam_paper_create, name='exam_paper_create'),
     path('admin/exams/<int:exam_id>/', admin_views.exam_paper_detail, name='exam_paper_detail'),
     path('admin/exams/<int:exam_id>/edit/', admin_views.exam_paper_edit, name='exam_paper_edit'),
+    path('admin/exams/<int:exam_id>/reports/export/', admin_views.exam_paper_export_reports, name='exam_paper_export_reports'),
+    path('admin/exams/<int:exam_id>/reports/export/status/', admin_views.exam_paper_export_status, name='exam_paper_export_status'),
+    path('admin/exams/<int:exam_id>/reports/export/download/', admin_views.exam_paper_export_download, name='exam_paper_export_download'),
     
     # Question Management URLs
     path('admin/exams/<int:exam_id>/questions/create/', admin_views.question_create, name='question_create'),
     path('admin/questions/<int:question_id>/edit/', admin_views.question_edit, name='question_edit'),
     path('admin/questions/<int:question_id>/delete/', admin_views.question_delete, name='question_delete'),
     
+    # Proctor Review Queue
+    path('admin/review-queue/', admin_views.proctor_review_queue, name='proctor_review_queue'),
+    path('admin/review-queue/data/', admin_views.proctor_review_queue_data, name='proctor_review_queue_data'),
+    path('admin/attempts/<int:attempt_id>/evidence/', admin_views.attempt_evidence, name='attempt_evidence'),
+    path('admin/attempts/<int:attempt_id>/evidence/index/', admin_views.attempt_evidence_index, name='attempt_evidence_index'),
+    path('admin/evidence/<int:image_id>/overlay/', admin_views.evidence_overlay, name='evidence_overlay'),
+    
     # Evaluation & Results URLs
     path('admin/evaluations/pending/', admin_views.pending_evaluations_list, name='pending_evaluations_list'),
     path('admin/evaluations/<int:attempt_id>/evaluate/', admin_views.evaluate_subjective_answers, name='evaluate_subjective_answers'),
@@ -117,9 +131,12 @@ urlpatterns = [
     path('student/exams/<int:exam_id>/start/', student_exam_views.start_exam, name='start_exam'),
     path('student/exams/attempt/<int:attempt_id>/', student_exam_views.take_exam, name='take_exam'),
     path('student/exams/attempt/<int:attempt_id>/submit/', student_exam_views.submit_exam_new, name='submit_exam_new'),
+    path('student/exams/attempt/<int:attempt_id>/answers/', student_exam_views.autosave_answers, name='autosave_answers'),
+    path('student/exams/attempt/<int:attempt_id>/telemetry/', student_exam_views.record_telemetry, name='record_telemetry'),
     path('student/exams/submission-success/', student_exam_views.exam_submission_success_new, name='exam_submission_success_new'),
     path('student/results/', student_exam_views.student_results, name='student_results'),
     path('student/results/<int:result_id>/', student_exam_views.result_detail, name='result_detail'),
     
-    
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Uploaded media, with permission checks, caching headers and byte ranges
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), media_views.serve_media, name='serve_media'),
+]
\ No newline at end of file
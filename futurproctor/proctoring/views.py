@@ -1,6 +1,8 @@
 # Django Core Imports
 from django.shortcuts import render, redirect, get_object_or_404  # Rendering templates, redirecting, and fetching objects
-from django.http import JsonResponse, StreamingHttpResponse, HttpResponse, HttpResponseRedirect  # Handling HTTP responses
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponse, HttpResponseRedirect, FileResponse  # Handling HTTP responses
+from django.utils.cache import get_conditional_response  # Answering If-None-Match / If-Modified-Since
+from django.utils.http import http_date, quote_etag  # ETag and Last-Modified headers
 from django.contrib import messages  # Displaying success/error messages
 from django.contrib.auth.decorators import login_required, user_passes_test  # Restricting views to logged-in users
 from django.contrib.auth.models import User  # Accessing Django's built-in User model
@@ -16,6 +18,10 @@ from PIL import Image
 
 # Models
 from .models import Student, Exam, CheatingEvent, CheatingImage, CheatingAudio  # Importing custom models
+from .models import EventCode, encode_objects
+from . import examinee_list, reports, risk, tab_switches, timeline  # Admin dashboard cache, PDF reports, risk scores, tab switch counters, event log
+from .overlays import frame_overlays  # Detection boxes stored with the evidence
+from django.db.models import F  # Atomic field updates
 
 # External Library Imports
 import os  # Operating system utilities (e.g., file handling)
@@ -33,7 +39,10 @@ import io  # Handling in-memory file operations
 try:
     from .ml_models.object_detection import detectObject  # Detecting objects in the exam environment
     from .ml_models.audio_detection import audio_detection  # Detecting external sounds for cheating detection
-    from .ml_models.gaze_tracking import gaze_tracking # Tracking eye gaze to detect focus and distractions
+    from .ml_models.gaze_tracking import FaceCascades, gaze_tracking # Tracking eye gaze to detect focus and distractions
+    from .ml_models.identity_verification import IdentityVerifier  # Re-checking the candidate's identity during the exam
+    from .ml_models.object_tracker import ObjectTracker  # Tracking detections across frames
+    from .ml_models.quality_ladder import QUALITY_LEVELS, load_shedder  # Degrading ML stages under load
 except ImportError as e:
     print(f"Warning: ML models import failed - {e}. Proctoring features may not work.")
 
@@ -337,58 +346,136 @@ warning = None
 last_audio_detected_time = time.time()
 stop_event = threading.Event()  # To stop background threads
 
+# Proctoring threads of the exam-paper flow: {attempt_id: stop event}. Each
+# attempt gets its own event, so submitting one exam stops only its threads.
+# The threads run in the process that served take_exam; the registry is per process.
+proctoring_sessions = {}
+proctoring_sessions_lock = threading.Lock()
+
+
+def start_proctoring(request, attempt):
+    """Start the video and audio threads of an attempt unless they are already running (a reload, a second tab)."""
+    with proctoring_sessions_lock:
+        if attempt.id in proctoring_sessions:
+            return False
+        stop = proctoring_sessions[attempt.id] = threading.Event()
+    threading.Thread(target=background_processing, args=(request, attempt, stop), daemon=True).start()
+    threading.Thread(target=process_audio, args=(request, attempt, stop), daemon=True).start()
+    return True
+
+
+def stop_proctoring(attempt_id, stop=None):
+    """Stop the threads of an attempt. With `stop`, only if that is still the attempt's event."""
+    with proctoring_sessions_lock:
+        current = proctoring_sessions.get(attempt_id)
+        if current is None or (stop is not None and current is not stop):
+            return
+        del proctoring_sessions[attempt_id]
+    current.set()
+
 # Function to process each frame
-def process_frame(frame, request):
-    """Process a single frame for cheating detection."""
+def process_frame(frame, request, verifier=None, tracker=None, level=None, attempt=None, cascades=None):
+    """
+    Process a single frame for cheating detection.
+    `level` is the quality ladder rung to run at (full quality by default).
+    Events are attached to `attempt` when the exam-paper flow is used.
+    `tracker` and `cascades` carry the session's object tracks and face box
+    from frame to frame.
+    Returns the number of cheating events raised.
+    """
     global warning
-    labels, processed_frame, person_count, detected_objects = detectObject(frame)
+    # Without a session tracker every detection counts immediately (one-frame tracks)
+    tracker = tracker or ObjectTracker(min_hits=1)
+    cascades = cascades or FaceCascades()
+    level = level or QUALITY_LEVELS[0]
     cheating_event = None
-
-    # Extract object names
-    detected_labels = [label for label, _ in labels]
-    # Check for cheating conditions
-    if any(label in ["cell phone", "book"] for label in detected_labels):
-        warning = f"ALERT: {', '.join(detected_labels)} detected!"  # Corrected formatting
-        cheating_event, _ = CheatingEvent.objects.get_or_create(
-            student=request.user.student,
-            cheating_flag=True,
-            event_type="object_detected"
+    events_raised = 0
+
+    if not level.detect_objects:
+        # Object detection is shed at this level
+        new_tracks = []
+    elif tracker.should_detect():
+        _, _, _, _, detections = detectObject(
+            frame, resize_width=level.resize_width, model_name=level.model_name
         )
-        save_cheating_event(frame, request, cheating_event, detected_objects)
-
-    if person_count > 1:
+        new_tracks = tracker.update(detections)
+    else:
+        # Tracks are stable: predict them forward instead of running the detector
+        tracker.skip()
+        new_tracks = []
+
+    # Objects currently held by confirmed tracks
+    tracks = [track for track in tracker.confirmed() if track.label in ["person", "cell phone", "book"]]
+    detected_objects = [track.label for track in tracks]
+    # Boxes are stored with the evidence and only drawn when a reviewer opens it
+    overlays = frame_overlays(frame.shape, tracks)
+
+    # Only a track that has just been confirmed raises an event
+    new_objects = [track for track in new_tracks if track.label in ["cell phone", "book"]]
+    if new_objects:
+        warning = f"ALERT: {', '.join(track.label for track in new_objects)} detected!"
+        confidence = max(track.score for track in new_objects)
+        cheating_event = get_cheating_event(request, EventCode.OBJECT_DETECTED, attempt, confidence)
+        save_cheating_event(frame, request, cheating_event, detected_objects, overlays=overlays)
+        events_raised += 1
+
+    person_count = len(tracker.confirmed("person"))
+    if person_count > 1 and any(track.label == "person" for track in new_tracks):
         warning = "ALERT: Multiple persons detected!"
-        cheating_event, _ = CheatingEvent.objects.get_or_create(
-            student=request.user.student,
-            cheating_flag=True,
-            event_type="multiple_persons"
-        )
-        save_cheating_event(frame, request, cheating_event, detected_objects)
+        cheating_event = get_cheating_event(request, EventCode.MULTIPLE_PERSONS, attempt)
+        save_cheating_event(frame, request, cheating_event, detected_objects, overlays=overlays)
+        events_raised += 1
+
+    if not level.track_face:
+        # Heartbeat only: nothing else runs at this level
+        return events_raised
 
-    gaze = gaze_tracking(frame)
+    gaze = gaze_tracking(frame, cascades.get(level.refine_landmarks))
+    if gaze["face_box"] is not None:
+        overlays = frame_overlays(frame.shape, tracks, gaze["face_box"], gaze["landmarks"])
     if gaze["gaze"] != "center":
         warning = "ALERT: Candidate not looking at the screen!"
-        cheating_event, _ = CheatingEvent.objects.get_or_create(
-            student=request.user.student,
-            cheating_flag=True,
-            event_type="gaze_detected"
-        )
-        save_cheating_event(frame, request, cheating_event, detected_objects)
+        cheating_event = get_cheating_event(request, EventCode.GAZE_DETECTED, attempt)
+        save_cheating_event(frame, request, cheating_event, detected_objects, overlays=overlays)
+        events_raised += 1
+
+    # Re-verify identity using the face box from the landmark stage
+    if verifier is not None and verifier.check(frame, gaze.get("face_box")):
+        warning = "ALERT: Candidate identity could not be verified!"
+        cheating_event = get_cheating_event(request, EventCode.IDENTITY_MISMATCH, attempt)
+        save_cheating_event(frame, request, cheating_event, overlays=overlays)
+        events_raised += 1
+
+    return events_raised
+
+def get_cheating_event(request, event_code, attempt=None, confidence=1.0):
+    """
+    Get or create the flagged event with this EventCode for the student's attempt,
+    append the detection to the attempt's timeline and add it to its risk score.
+    """
+    if attempt is not None:
+        timeline.record(attempt.id, event_code, confidence)
+        risk.add_event(attempt.id, event_code, confidence)
+    cheating_event, _ = CheatingEvent.objects.get_or_create(
+        student=request.user.student,
+        attempt=attempt,
+        cheating_flag=True,
+        event_code=event_code,
+        defaults={'exam_paper_id': attempt.exam_paper_id if attempt else None},
+    )
+    return cheating_event
 
 # Function to process audio
-def process_audio(request):
-    """Continuously process audio for cheating detection."""
+def process_audio(request, attempt=None, stop=None):
+    """Continuously process audio for cheating detection until `stop` (the global stop_event by default) is set."""
     global last_audio_detected_time, warning
+    stop = stop or stop_event
 
-    while not stop_event.is_set():  # Check if stop_event is triggered
+    while not stop.is_set():  # Check if stop_event is triggered
         audio = audio_detection()
         if audio["audio_detected"]:
             warning = "ALERT: Suspicious audio detected!"
-            cheating_event, _ = CheatingEvent.objects.get_or_create(
-                student=request.user.student,
-                cheating_flag=True,
-                event_type="audio_detected"
-            )
+            cheating_event = get_cheating_event(request, EventCode.AUDIO_DETECTED, attempt)
             save_cheating_event(None, request, cheating_event, audio_data=audio["audio_data"])
             last_audio_detected_time = time.time()
 
@@ -402,23 +489,62 @@ def process_audio(request):
 
 
 # Background processing for video
-def background_processing(request):
-    """Runs video processing in the background."""
+def background_processing(request, attempt=None, stop=None):
+    """
+    Runs video processing in the background until `stop` (the global
+    stop_event by default) is set.
+    The session reports its frame processing time to the node-wide load
+    shedder, which picks the quality level it runs at; level changes are
+    recorded on the exam attempt.
+    """
     cap = cv2.VideoCapture(0)
     frame_count = 0
 
-    while not stop_event.is_set():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if frame_count % 2 == 0:
-            process_frame(frame, request)
-        
-        frame_count += 1
-        time.sleep(0.5)
-    
-    cap.release()
+    # One verifier per proctoring session, seeded with the encoding stored at registration
+    stored_encoding = request.user.student.face_encoding
+    verifier = IdentityVerifier(stored_encoding) if stored_encoding else None
+    tracker = ObjectTracker()
+    cascades = FaceCascades()
+    session = load_shedder.register()
+    level = session.level
+    stop = stop or stop_event
+
+    try:
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            
+            if frame_count % 2 == 0:
+                started = time.time()
+                session.risk += process_frame(frame, request, verifier, tracker, level, attempt, cascades)
+                new_level = load_shedder.report(session, time.time() - started)
+                if new_level != level:
+                    record_quality_change(attempt, new_level, load_shedder.load_summary())
+                    level = new_level
+            
+            frame_count += 1
+            time.sleep(0.5)
+    finally:
+        load_shedder.unregister(session)
+        cap.release()
+        if attempt is not None:
+            # Camera lost: stop the audio thread too, so a reload can start both again
+            stop_proctoring(attempt.id, stop)
+
+
+def record_quality_change(attempt, level, reason):
+    """Store a quality level change on the attempt so reviewers know the coverage."""
+    logger.info(f"Proctoring quality changed to {level.name} ({reason})")
+    if attempt is None:
+        return
+    attempt.quality_level = level.name
+    attempt.quality_log.append({
+        'timestamp': timezone.now().isoformat(),
+        'level': level.name,
+        'reason': reason,
+    })
+    attempt.save(update_fields=['quality_level', 'quality_log'])
 
 
 # Helper function to create a WAV file from raw audio bytes
@@ -444,14 +570,18 @@ def create_wav_bytes(raw_audio, channels=1, sampwidth=2, framerate=48000):
     return wav_buffer.getvalue()
 
 ## Function to save cheating event
-def save_cheating_event(frame, request, cheating_event, detected_objects=None, audio_data=None):
-    """Save cheating event along with images and audio in the database."""
+def save_cheating_event(frame, request, cheating_event, detected_objects=None, audio_data=None, overlays=None):
+    """
+    Save cheating event along with images and audio in the database.
+    The frame is saved as captured; `overlays` (see overlays.frame_overlays)
+    keeps what was detected in it for drawing at review time.
+    """
     try:
         
-        # Save detected objects
+        # Add the detected objects to the event's bitmask
         if detected_objects:
-            cheating_event.detected_objects = detected_objects  # Save as JSON
-            cheating_event.save()
+            cheating_event.objects_mask |= encode_objects(detected_objects)
+            cheating_event.save(update_fields=['objects_mask'])
         # Save up to 10 sample images per event
         if frame is not None and cheating_event.cheating_images.count() < 10:
             try:
@@ -460,9 +590,12 @@ def save_cheating_event(frame, request, cheating_event, detected_objects=None, a
                 image_pil.save(image_io, format="JPEG", quality=85)
                 image_content = image_io.getvalue()
                 
-                cheating_image = CheatingImage(event=cheating_event)
+                cheating_image = CheatingImage(
+                    event=cheating_event, attempt_id=cheating_event.attempt_id, overlays=overlays or {}
+                )
+                # The stored name is chosen by media_layout (sharded by date and attempt)
                 cheating_image.image.save(
-                    f"cheating_{time.time()}.jpg", 
+                    "cheating.jpg",
                     ContentFile(image_content), 
                     save=True
                 )
@@ -474,9 +607,9 @@ def save_cheating_event(frame, request, cheating_event, detected_objects=None, a
             try:
                 # Convert raw audio bytes to a proper WAV file bytes.
                 wav_data = create_wav_bytes(audio_data, channels=1, sampwidth=2, framerate=48000)
-                cheating_audio = CheatingAudio(event=cheating_event)
+                cheating_audio = CheatingAudio(event=cheating_event, attempt_id=cheating_event.attempt_id)
                 cheating_audio.audio.save(
-                    f"cheating_audio_{time.time()}.wav", 
+                    "cheating_audio.wav",
                     ContentFile(wav_data), 
                     save=True
                 )
@@ -581,46 +714,35 @@ logger = logging.getLogger(__name__)
 @login_required
 def record_tab_switch(request):
     if request.method == "POST":
-        # Get the current student
-        student = request.user.student
-        logger.info(f"Student: {student}")
-
-        # # Get the active exam for the student
-        # active_exam = Exam.objects.filter(student=student, status='ongoing').first()
-        # if not active_exam:
-        #     logger.error("No active exam found for the student")
-        #     return JsonResponse({"error": "No active exam found for the student"}, status=400)
-
-        # logger.info(f"Active Exam: {active_exam}")
-
-        # Get or create a CheatingEvent for the student and exam
-        cheating_event, created = CheatingEvent.objects.get_or_create(
-            student=student,
-            # exam=active_exam,
-            event_type='tab_switch',  # Specify the event type
-            defaults={
-                'cheating_flag': False,
-                'tab_switch_count': 0,
-            }
-        )
-
-        logger.info(f"Cheating Event: {cheating_event}, Created: {created}")
-
-        # Increment the tab switch count
-        cheating_event.tab_switch_count += 1
-        logger.info(f"Updated Tab Switch Count: {cheating_event.tab_switch_count}")
-
-        # Set cheating_flag based on tab_switch_count
-        cheating_event.cheating_flag = cheating_event.tab_switch_count >= 1
-        logger.info(f"Cheating Flag: {cheating_event.cheating_flag}")
+        # Exam-paper attempts are counted in the cache and flushed periodically
+        attempt_id = request.session.get('active_attempt_id')
+        if attempt_id:
+            count = tab_switches.record_tab_switch(attempt_id)
+        else:
+            # Legacy exam page (no attempt): single atomic UPDATE on the student's tab_switch event
+            student = request.user.student
+            try:
+                event, _ = CheatingEvent.objects.get_or_create(
+                    student=student, event_code=EventCode.TAB_SWITCH, defaults={'cheating_flag': True},
+                )
+            except CheatingEvent.MultipleObjectsReturned:
+                # Duplicates left by concurrent first switches: count on the oldest
+                event = CheatingEvent.objects.filter(student=student, event_code=EventCode.TAB_SWITCH).order_by('id').first()
+            CheatingEvent.objects.filter(id=event.id).update(
+                tab_switch_count=F('tab_switch_count') + 1,
+                cheating_flag=True,
+            )
+            count = CheatingEvent.objects.filter(id=event.id).values_list('tab_switch_count', flat=True).first()
 
-        # Save the updated CheatingEvent
-        cheating_event.save()
-        logger.info("Cheating Event saved successfully")
+        logger.debug(f"Tab switch recorded for user {request.user.id}: {count}")
 
-        # If tab switches exceed 5, take action
-        if cheating_event.tab_switch_count > 5:
-            stop_event.set()  # Stop background threads (ensure stop_event is defined)
+        # If tab switches exceed the limit, take action
+        if tab_switches.should_terminate(count):
+            # Stop background threads
+            if attempt_id:
+                stop_proctoring(attempt_id)
+            else:
+                stop_event.set()
             logger.info("Tab switches exceeded 5, terminated from the exam")
             return JsonResponse({
                 "status": "terminated",
@@ -629,9 +751,9 @@ def record_tab_switch(request):
         # Return a JSON response with the updated count and flag
         return JsonResponse({
             "status": "updated",
-            "count": cheating_event.tab_switch_count,
-            "cheating_flag": cheating_event.cheating_flag,
-            "message": f"Tab switch detected! Total switches: {cheating_event.tab_switch_count}"
+            "count": count,
+            "cheating_flag": count >= 1,
+            "message": f"Tab switch detected! Total switches: {count}"
         }, status=200)
 
     return JsonResponse({"error": "Invalid request"}, status=400)
@@ -676,10 +798,18 @@ def get_warning(request):
 
 # Streaming notifications to the proctor
 def proctor_notifications(request):
-    """Stream real-time cheating events to the proctor."""
+    """
+    Stream real-time cheating events to the proctor.
+    Pass ?exam_paper=<id> to follow a single exam (served by the exam_paper/timestamp index).
+    """
+    exam_paper_id = request.GET.get('exam_paper')
+
     def event_stream():
         while True:
-            events = CheatingEvent.objects.filter(cheating_flag=True).order_by('-timestamp')[:5]
+            events = CheatingEvent.objects.filter(cheating_flag=True)
+            if exam_paper_id:
+                events = events.filter(exam_paper_id=exam_paper_id)
+            events = events.order_by('-timestamp')[:5]
             if events:
                 yield f"data: {json.dumps([str(event) for event in events])}\n\n"
             time.sleep(5)
@@ -700,25 +830,15 @@ from django.contrib.admin.views.decorators import staff_member_required
 from .models import Student, Exam, CheatingEvent, CheatingImage, CheatingAudio
 @staff_member_required(login_url='/admin/login/')
 def admin_dashboard(request):
-    # Fetch students with counts for exams and cheating events
-    students = Student.objects.annotate(
-        exam_count=Count('exams'),
-        cheating_event_count=Count('cheating_events')
-    ).prefetch_related('exams', 'cheating_events')
-    
-    # Calculate trust score and exam scores for each student
-    for student in students:
-        # Example: Trust score decreases 10 points per cheating event (with a floor of 0)
-        student.trust_score = max(0, 100 - (student.cheating_event_count * 10))
-        
-        for exam in student.exams.all():
-            if exam.total_questions and exam.total_questions > 0 and exam.percentage_score is None:
-                exam.percentage_score = calculate_exam_score(exam)
-                exam.save()
-    
-    context = {
-        'students': students,
-    }
+    """Paginated examinee list, served from one aggregate query per page (cached)."""
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+    search = request.GET.get('q', '').strip()
+
+    context = examinee_list.examinee_page(page_number, search)
+    context['search'] = search
     return render(request, 'admin_dashboard.html', context)
 
 ## exam score
@@ -729,136 +849,71 @@ def calculate_exam_score(exam):
     return 0.0
 
 
-## Helper Function for aggregated detected objects
-import json
-def get_detected_objects_string(cheating_events):
-    """Aggregate and convert the detected objects from all events into a list."""
-    detected_objects_set = set()
-    for event in cheating_events:
-        # If detected_objects is not already a list, try converting it.
-        objs = event.detected_objects
-        if isinstance(objs, str):
-            try:
-                objs = json.loads(objs)
-            except json.JSONDecodeError:
-                objs = []
-        # Now, objs should be a list so add each one to our set.
-        if isinstance(objs, list):
-            detected_objects_set.update(objs)
-    return list(detected_objects_set)
-
 ### Report view
+@staff_member_required(login_url='/admin/login/')
 def report_page(request, student_id):
     student = get_object_or_404(Student, id=student_id)
-    exam = student.exams.first()  # Or however you want to choose the exam
-    cheating_events = CheatingEvent.objects.filter(student=student)
-
-    # Aggregate detected objects as a list
-    detected_objects_list = get_detected_objects_string(cheating_events)
-    detected_objects_str = ", ".join(detected_objects_list) if detected_objects_list else "No objects detected"
-
-    # Sum up tab switch count from events
-    total_tab_switch_count = cheating_events.aggregate(total=Sum('tab_switch_count'))['total'] or 0
-
-    # Audio files: if you're using a FileField, Django automatically converts the stored file path
-    # into a URL via the `.url` attribute once media is configured correctly.
-    cheating_audios = CheatingAudio.objects.filter(event__student=student)
-    audio_urls = [audio.audio.url for audio in cheating_audios if audio.audio]
-
-    context = {
-        'student': student,
-        'exam': exam,
-        'detected_objects': detected_objects_str,
-        'total_tab_switch_count': total_tab_switch_count,
-        # You can also add correct answer attempt and total questions:
-        'correct_answers': exam.correct_answers,
-        'total_questions': exam.total_questions,
-        'cheating_status': any(
-            event.event_type in ['object_detected', 'multiple_faces_detected', 'tab_switch']
-            for event in cheating_events
-        ),
-        'cheating_images': [
-            {
-                'url': img.image.url,
-                'event_type': img.event.event_type,
-                'timestamp': img.timestamp
-            }
-            for img in CheatingImage.objects.filter(event__student=student)
-        ],
-        'audio_urls': audio_urls,
-        'cheating_events': cheating_events,  # if you need to list them
-    }
+    context = reports.build_report_context(student, _report_attempt_id(request))
     return render(request, 'report_page.html', context)
 
 
+def _report_attempt_id(request):
+    """Optional ?attempt=<id> restricting a report to one exam attempt."""
+    try:
+        return int(request.GET['attempt'])
+    except (KeyError, ValueError):
+        return None
 
 
-from django.template.loader import get_template
-try:
-    from xhtml2pdf import pisa
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-    print("Warning: xhtml2pdf not installed. PDF download feature will be disabled.")
-
+@staff_member_required(login_url='/admin/login/')
 def download_report(request, student_id):
-    # Retrieve student and related data
-    student = get_object_or_404(Student, id=student_id)
-    exam = student.exams.first()  # Adjust as necessary
-    cheating_events = CheatingEvent.objects.filter(student=student)
-    
-    # Process detected objects (assuming you have a helper function)
-    detected_objects_list = get_detected_objects_string(cheating_events)
-    detected_objects_str = ", ".join(detected_objects_list) if detected_objects_list else "No objects detected"
+    """
+    Serve the PDF report from the on-disk cache. When the current version is
+    not rendered yet it is queued and a page polling report_status is shown.
+    """
+    if not reports.PDF_AVAILABLE:
+        return HttpResponse('PDF generation is not available on this server', status=503)
 
-    # Sum up tab switch counts
-    total_tab_switch_count = cheating_events.aggregate(total=Sum('tab_switch_count'))['total'] or 0
+    student = get_object_or_404(Student, id=student_id)
+    attempt_id = _report_attempt_id(request)
+    version = reports.report_version(student.id, attempt_id)
+    path = reports.report_path(student.id, attempt_id, version)
 
-    # Audio URLs (xhtml2pdf might need absolute paths for images and other media,
-    # but for simple cases it often works fine)
-    cheating_audios = CheatingAudio.objects.filter(event__student=student)
-    audio_urls = [audio.audio.url for audio in cheating_audios if audio.audio]
+    try:
+        pdf = open(path, 'rb')
+    except FileNotFoundError:
+        status = reports.report_jobs.submit(student.id, attempt_id, version)
+        context = {'student': student, 'attempt_id': attempt_id, 'status': status}
+        return render(request, 'report_pending.html', context, status=202)
+
+    etag = quote_etag(version)
+    last_modified = int(os.fstat(pdf.fileno()).st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(pdf, as_attachment=True, filename=f"report_{student.id}.pdf",
+                                content_type='application/pdf')
+    else:
+        pdf.close()  # 304 Not Modified
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # The browser may keep the PDF but must revalidate it (new events change the ETag)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-    # Prepare context for the template
-    context = {
-        'student': student,
-        'exam': exam,
-        'detected_objects': detected_objects_str,
-        'total_tab_switch_count': total_tab_switch_count,
-        'correct_answers': exam.correct_answers,
-        'total_questions': exam.total_questions,
-        'cheating_status': any(
-            event.event_type in ['object_detected', 'multiple_faces_detected', 'tab_switch']
-            for event in cheating_events
-        ),
-        'cheating_images': [
-            {
-                'url': img.image.url,
-                'event_type': img.event.event_type,
-                'timestamp': img.timestamp
-            }
-            for img in CheatingImage.objects.filter(event__student=student)
-        ],
-        'audio_urls': audio_urls,
-        'cheating_events': cheating_events,
-    }
-    
-    # Render the HTML template with context
-    template = get_template('report_page.html')
-    html = template.render(context)
 
-    # Create a HttpResponse with PDF headers
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="report_{student.id}.pdf"'
-    
-    # Create PDF using xhtml2pdf (pisa)
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    
-    # Check for errors
-    if pisa_status.err:
-        return HttpResponse('We had some errors while generating the PDF', status=500)
-    
-    return response
+@staff_member_required(login_url='/admin/login/')
+def report_status(request, student_id):
+    """Status of the student's current PDF report: queued, running, ready or failed."""
+    attempt_id = _report_attempt_id(request)
+    version = reports.report_version(student_id, attempt_id)
+    status = reports.report_status(student_id, attempt_id, version)
+    if status is None and reports.PDF_AVAILABLE:
+        status = reports.report_jobs.submit(student_id, attempt_id, version)
+
+    download_url = reverse('download_report', args=[student_id])
+    if attempt_id:
+        download_url += f"?attempt={attempt_id}"
+    return JsonResponse({'status': status, 'download_url': download_url})
 
 
 def add_question(request):
@@ -0,0 +1,99 @@
+# worker_threads.py - Daemon threads for background jobs and periodic flushes
+#
+# Work that must not hold up a request (thumbnails, contact sheets, PDF
+# reports) is handed to a WorkerQueue, and in-memory counters are written to
+# the database by a PeriodicTask. Their threads start the first time they
+# are needed. Queued jobs are lost when the process exits; each user of this
+# module redoes them on demand (thumbnails and sheets are rebuilt on next
+# use, reports queued again on the next download).
+import logging
+import queue
+import threading
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerQueue:
+    """
+    Jobs passed to `handler` by `workers` daemon threads, in the order they
+    were submitted. With a `key` function a job is dropped while another job
+    with the same key is waiting; the key is released just before the job
+    runs, so a job submitted during the run is queued again.
+    """
+
+    def __init__(self, handler, name, workers=1, key=None):
+        self.handler = handler
+        self.name = name
+        self.workers = workers
+        self.key = key
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.started = False
+
+    def submit(self, job):
+        """Queue a job. Returns False if the same job is already waiting."""
+        key = self.key(job) if self.key else None
+        if key is not None:
+            with self.lock:
+                if key in self.pending:
+                    return False
+                self.pending.add(key)
+        self.queue.put((key, job))
+        self._start()
+        return True
+
+    def _run(self):
+        while True:
+            key, job = self.queue.get()
+            if key is not None:
+                with self.lock:
+                    self.pending.discard(key)
+            try:
+                self.handler(job)
+            except Exception as e:
+                logger.error(f"Error in {self.name}: {e}")
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+    def _start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for _ in range(self.workers):
+            threading.Thread(target=self._run, daemon=True).start()
+
+
+class PeriodicTask:
+    """`function` called every `interval` seconds by one daemon thread, from the first start() on."""
+
+    def __init__(self, function, interval, name):
+        self.function = function
+        self.interval = interval
+        self.name = name
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.function()
+            except Exception as e:
+                logger.error(f"Error in {self.name}: {e}")
+            finally:
+                close_old_connections()